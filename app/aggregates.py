@@ -0,0 +1,242 @@
+"""
+Agrégats de TVA par client, mois de création et taux (table receipt_aggregates).
+
+Ils sont tenus à jour de façon incrémentale, dans la transaction qui modifie
+les reçus :
+
+- flush de toute session ORM : un reçu inséré ajoute sa contribution ; un
+  reçu modifié (colonnes de TRACKED) ou supprimé retire celle de ses valeurs
+  en base, relues en une requête SELECT ... FOR UPDATE avant l'UPDATE /
+  DELETE, et un reçu modifié ajoute après le flush (clés étrangères
+  renseignées) ces valeurs complétées des colonnes modifiées ;
+- record_bulk_update pour les écritures qui contournent l'ORM
+  (bulk_update_mappings du worker OCR).
+
+Les variations sont appliquées par un upsert additif (INSERT ... ON CONFLICT
+DO UPDATE SET col = col + excluded.col) : deux transactions qui touchent le
+même mois ne s'écrasent pas. Les écritures SQL directes sur receipts ne sont
+pas suivies ; la reconstruction recalcule tout à partir des reçus (backfill,
+dérive des sommes en virgule flottante) :
+
+    python -m app.aggregates [--client-id 3]
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, event, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import UNKNOWN_VAT_RATE, Receipt, ReceiptAggregate
+from app.replica import note_writes
+
+# Colonnes des reçus dont dépendent les agrégats
+TRACKED = ("client_id", "created_at", "vat_rate", "price_ttc", "price_ht", "vat_amount",
+           "email_sent", "invoice_received")
+COUNTERS = ("receipt_count", "pending_count", "reminded_count", "total_ttc", "total_ht", "total_vat",
+            "recoverable_vat", "pending_vat")
+
+Key = Tuple[int, str, float]
+
+
+def _number(value: Any) -> Optional[float]:
+    """Montant ou taux en flottant ; l'OCR les fournit sous forme de chaînes ("12.00")."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def contribution(values: Mapping[str, Any]) -> Tuple[Key, Dict[str, float]]:
+    """Ligne d'agrégat touchée par un reçu et montants qu'il y apporte."""
+    created_at = values["created_at"] or datetime.utcnow()
+    rate = _number(values["vat_rate"])
+    vat = _number(values["vat_amount"]) or 0.0
+    received = bool(values["invoice_received"])
+    return (values["client_id"], created_at.strftime("%Y-%m"), UNKNOWN_VAT_RATE if rate is None else rate), {
+        "receipt_count": 1,
+        "pending_count": 0 if received else 1,
+        "reminded_count": 1 if values["email_sent"] and not received else 0,
+        "total_ttc": _number(values["price_ttc"]) or 0.0,
+        "total_ht": _number(values["price_ht"]) or 0.0,
+        "total_vat": vat,
+        "recoverable_vat": vat if received else 0.0,
+        "pending_vat": 0.0 if received else vat,
+    }
+
+
+class Deltas:
+    """Variations des compteurs, par ligne d'agrégat."""
+
+    def __init__(self):
+        self.by_key: Dict[Key, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    def add(self, values: Mapping[str, Any], sign: int = 1) -> None:
+        key, counters = contribution(values)
+        totals = self.by_key[key]
+        for name, value in counters.items():
+            totals[name] += sign * value
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [{"client_id": key[0], "period": key[1], "vat_rate": key[2], **counters}
+                for key, counters in self.by_key.items() if any(counters.values())]
+
+
+def apply(connection, deltas: Deltas) -> int:
+    """Ajoute les variations aux agrégats ; renvoie le nombre de lignes touchées."""
+    rows = deltas.rows()
+    if not rows:
+        return 0
+
+    table = ReceiptAggregate.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["client_id", "period", "vat_rate"],
+            set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS},
+        )
+        connection.execute(statement, rows)
+        return len(rows)
+
+    for row in rows:
+        key = (table.c.client_id == row["client_id"]) & (table.c.period == row["period"]) \
+            & (table.c.vat_rate == row["vat_rate"])
+        values = {name: table.c[name] + row[name] for name in COUNTERS}
+        if not connection.execute(update(table).where(key).values(values)).rowcount:
+            connection.execute(table.insert().values(row))
+    return len(rows)
+
+
+def select_stored(ids: Iterable[int]):
+    """
+    Relecture des colonnes suivies avant leur modification. FOR UPDATE verrouille
+    les lignes jusqu'au commit : une transaction concurrente qui modifie le même
+    reçu attend, puis relit la valeur commitée, et sa contribution retirée est
+    la bonne. SQLAlchemy omet la clause sur les dialectes sans verrou de ligne
+    (SQLite, dont les écritures sont de toute façon sérialisées).
+    """
+    table = Receipt.__table__
+    return select(table.c.id, *(table.c[name] for name in TRACKED)).where(table.c.id.in_(list(ids))) \
+        .with_for_update()
+
+
+def _stored(connection, ids: Iterable[int]) -> Dict[int, Mapping[str, Any]]:
+    """Valeurs en base des colonnes suivies, par identifiant de reçu, lignes verrouillées."""
+    ids = list(ids)
+    if not ids:
+        return {}
+    return {row.id: row._mapping for row in connection.execute(select_stored(ids))}
+
+
+def _current(receipt: Receipt) -> Dict[str, Any]:
+    return {name: getattr(receipt, name) for name in TRACKED}
+
+
+def _tracked_changes(receipt: Receipt) -> List[str]:
+    """Colonnes suivies modifiées en mémoire (client_id si la relation `client` change)."""
+    attrs = inspect(receipt).attrs
+    changed = [name for name in TRACKED if attrs[name].history.has_changes()]
+    if attrs["client"].history.has_changes() and "client_id" not in changed:
+        changed.append("client_id")
+    return changed
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session: Session, flush_context, instances) -> None:
+    changes = {r: _tracked_changes(r) for r in session.dirty if isinstance(r, Receipt)}
+    modified = [(r, changed) for r, changed in changes.items() if changed]
+    deleted = [r for r in session.deleted if isinstance(r, Receipt)]
+    deltas = Deltas()
+    stored_rows = {}
+    if modified or deleted:
+        stored_rows = _stored(session.connection(), [r.id for r, _ in modified] + [r.id for r in deleted])
+        for values in stored_rows.values():
+            deltas.add(values, -1)
+    # L'UPDATE n'écrit que les colonnes modifiées : les autres gardent leur valeur
+    # en base, qu'une transaction concurrente a pu changer depuis le chargement
+    session.info["receipt_aggregates"] = (deltas, [(r, stored_rows[r.id], changed) for r, changed in modified
+                                                   if r.id in stored_rows])
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    deltas, modified = session.info.pop("receipt_aggregates", (Deltas(), []))
+    for receipt in session.new:
+        if isinstance(receipt, Receipt):
+            deltas.add(_current(receipt))
+    for receipt, stored, changed in modified:
+        deltas.add({**stored, **{name: getattr(receipt, name) for name in changed}})
+    apply(session.connection(), deltas)
+
+
+def record_bulk_update(session: Session, mappings: List[Dict[str, Any]]) -> None:
+    """
+    Reporte sur les agrégats un bulk_update_mappings(Receipt, mappings), qui ne
+    déclenche pas d'événement de flush, et note les clients écrits (app.replica).
+    À appeler avant lui, dans la même transaction : les lignes relues restent
+    verrouillées jusqu'au commit.
+    """
+    deltas = Deltas()
+    by_id = {mapping["id"]: mapping for mapping in mappings}
+    stored_rows = _stored(session.connection(), by_id)
+    for receipt_id, stored in stored_rows.items():
+        mapping = by_id[receipt_id]
+        changes = {name: mapping[name] for name in TRACKED if name in mapping and mapping[name] != stored[name]}
+        if changes:
+            deltas.add(stored, -1)
+            deltas.add({**stored, **changes})
+    apply(session.connection(), deltas)
+    note_writes(session, (stored["client_id"] for stored in stored_rows.values()))
+
+
+def rebuild(session: Session, client_id: Optional[int] = None, batch_size: int = 1000) -> int:
+    """
+    Recalcule les agrégats (d'un client ou de tous) à partir des reçus, lus par
+    lots. Le commit est laissé à l'appelant. Returns: nombre de lignes d'agrégat écrites.
+    """
+    table = Receipt.__table__
+    aggregates = delete(ReceiptAggregate)
+    receipts = select(*(table.c[name] for name in TRACKED))
+    if client_id is not None:
+        aggregates = aggregates.where(ReceiptAggregate.client_id == client_id)
+        receipts = receipts.where(table.c.client_id == client_id)
+
+    connection = session.connection()
+    connection.execute(aggregates)
+    deltas = Deltas()
+    for row in connection.execute(receipts.execution_options(yield_per=batch_size)):
+        deltas.add(row._mapping)
+    return apply(connection, deltas)
+
+
+def select_stats(client_id: int, period_from: Optional[str] = None, period_to: Optional[str] = None):
+    """Lignes d'agrégat d'un client, par mois puis taux ; bornes "YYYY-MM" incluses."""
+    statement = select(ReceiptAggregate).where(ReceiptAggregate.client_id == client_id,
+                                               ReceiptAggregate.receipt_count > 0)
+    if period_from:
+        statement = statement.where(ReceiptAggregate.period >= period_from)
+    if period_to:
+        statement = statement.where(ReceiptAggregate.period <= period_to)
+    return statement.order_by(ReceiptAggregate.period, ReceiptAggregate.vat_rate)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconstruit les agrégats de TVA à partir des reçus")
+    parser.add_argument("--client-id", type=int, help="Client à reconstruire (défaut : tous)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Reçus lus par lot")
+    args = parser.parse_args()
+
+    from app.database import configure_role, session_scope
+
+    configure_role("scheduler")
+    with session_scope() as session:
+        rows = rebuild(session, args.client_id, args.batch_size)
+    logger.info(f"📊 Rebuilt {rows} aggregate rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,44 @@
 from typing import List
 
 from fastapi import APIRouter, UploadFile, File, Header, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 
-from app.schemas import ReceiptOut
+from app.schemas import ReceiptOut, ReceiptPage
 from app.models import Receipt
 from app.ocr_engine import OCREngine
 from app.config import get_settings
-from app.dependencies import get_current_user
-from app.init_db import get_db_session
+from app.dependencies import get_current_user, page_params, receipt_fields, receipt_filters
+from app.pagination import InvalidCursor, paginate_async
+from app.replica import replica_session
 
 api_router = APIRouter()
 
-@api_router.get("/receipts", response_model=List[ReceiptOut])
-def list_receipts(current_user=Depends(get_current_user), db: Session = Depends(get_db_session)):
-    receipts = db.query(Receipt).filter_by(user_id=current_user.id).all()
-    return receipts
+# Lectures sur le réplica, sauf juste après une écriture du client
+read_db = replica_session(get_current_user)
+
+@api_router.get("/receipts", response_model=ReceiptPage, response_model_exclude_unset=True)
+async def list_receipts(
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(read_db),
+    page: dict = Depends(page_params),
+    filters: dict = Depends(receipt_filters),
+    fields: List[str] = Depends(receipt_fields),
+):
+    statement = Receipt.select_for_user(current_user.id, fields, **filters)
+    try:
+        return await paginate_async(db, statement, Receipt, **page)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/receipts/{receipt_id}", response_model=ReceiptOut)
+async def get_receipt(receipt_id: int, current_user=Depends(get_current_user),
+                      db: AsyncSession = Depends(read_db)):
+    statement = Receipt.select_for_user(current_user.id).where(Receipt.id == receipt_id)
+    receipt = await db.scalar(statement.options(undefer(Receipt.ocr_text)))
+    if receipt is None:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return receipt
 
 @api_router.get("/ping")
 def health_check():
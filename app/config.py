@@ -1,5 +1,6 @@
 import os
 from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings
 import redis.asyncio as redis
 
@@ -9,6 +10,16 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./test.db"  # Remplace par ta vraie URL si besoin
+    ASYNC_DATABASE_URL: Optional[str] = None  # défaut : DATABASE_URL avec asyncpg / aiosqlite
+    DATABASE_REPLICA_URL: Optional[str] = None  # réplica en lecture (listes, exports, statistiques)
+    ASYNC_DATABASE_REPLICA_URL: Optional[str] = None  # défaut : DATABASE_REPLICA_URL avec asyncpg / aiosqlite
+    REPLICA_LAG_WINDOW: float = 5.0  # après une écriture, lectures du client sur le primaire (secondes)
+    DB_ROLE: str = "api"  # profil de pool : "api", "worker" ou "scheduler" (voir app.database)
+    DB_POOL_SIZE: Optional[int] = None  # défaut : selon DB_ROLE
+    DB_MAX_OVERFLOW: Optional[int] = None  # défaut : selon DB_ROLE
+    DB_POOL_TIMEOUT: int = 10  # attente max d'une connexion libre, en secondes
+    DB_POOL_RECYCLE: int = 1800  # durée de vie d'une connexion, en secondes
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None  # défaut : selon DB_ROLE (0 : pas de limite)
 
     # Auth / Security
     SECRET_KEY: str = "super-secret-key"
@@ -20,6 +31,23 @@ class Settings(BaseSettings):
     IMAP_SERVER: str = "imap.gmail.com"
     REDIS_URL: str = "redis://localhost:6379"
 
+    # Task queue
+    QUEUE_BACKEND: str = "redis"  # "redis" (listes) ou "redis_streams"
+    QUEUE_STREAM_GROUP: str = "workers"
+    QUEUE_VISIBILITY_TIMEOUT: int = 300  # bail d'une tâche réclamée, en secondes
+    QUEUE_MAX_LEASE_EXPIRIES: int = 3  # au-delà : dead-letter
+    QUEUE_MAX_ATTEMPTS: int = 3  # essais avant dead-letter après fail_task
+    QUEUE_RETRY_BASE_DELAY: float = 5  # backoff : base * 2^(essai-1), avec jitter
+    QUEUE_RETRY_MAX_DELAY: float = 600
+    QUEUE_STREAM_MAXLEN: int = 0  # 0 = pas de limite
+    QUEUE_COMPLETED_TTL: int = 24 * 3600  # conservation des tâches terminées, 0 = indéfinie
+    QUEUE_FAILED_TTL: int = 7 * 24 * 3600  # conservation des tâches en échec (dead-letters)
+    QUEUE_COMPRESS_THRESHOLD: int = 1024  # octets de JSON au-delà desquels data/result sont compressés
+    QUEUE_BLOB_THRESHOLD: int = 64 * 1024  # octets compressés au-delà desquels le payload part en blob, 0 = jamais
+    QUEUE_BLOB_DIR: str = "./data/task_blobs"  # partagé entre l'API et les workers
+    QUEUE_DEDUP_TTL: int = 24 * 3600  # validité des clés d'idempotence de enqueue
+    OCR_BATCH_SIZE: int = 50  # reçus OCR réclamés et écrits par transaction, 1 = pas de lot
+
     # Email
     SMTP_HOST: str = "smtp.example.com"
     SMTP_PORT: int = 465
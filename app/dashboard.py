@@ -1,29 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+from enum import Enum
+from typing import List, Optional
 
-from app.models import Receipt, User
-from app.schemas import ReceiptOut, UserResponse
-from app.database import get_db_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from app.models import UNKNOWN_VAT_RATE, Receipt, User
+from app.schemas import (ReceiptOut, ReceiptPage, ReceiptSearchResults, ReceiptStats, UserResponse, VatPeriodStats,
+                         VatTotals)
 from app.auth import get_current_user
+from app.dependencies import page_params, receipt_fields, receipt_filters
+from app.pagination import MAX_PAGE_SIZE, InvalidCursor, paginate_async
+from app.export import MEDIA_TYPES, quarter_bounds, stream_export
+from app.aggregates import COUNTERS, select_stats
+from app.replica import replica_bind, replica_session
+from app.search import select_search
 
 dashboard_router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+# Endpoints en lecture seule : réplica, sauf juste après une écriture du client
+read_db = replica_session(get_current_user)
+read_bind = replica_bind(get_current_user)
+
 
 @dashboard_router.get("/me", response_model=UserResponse)
-def get_my_profile(current_user: User = Depends(get_current_user)) -> User:
+async def get_my_profile(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-@dashboard_router.get("/receipts", response_model=List[ReceiptOut])
-def get_receipts_for_user(
+@dashboard_router.get("/receipts", response_model=ReceiptPage, response_model_exclude_unset=True)
+async def get_receipts_for_user(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(read_db),
+    page: dict = Depends(page_params),
+    filters: dict = Depends(receipt_filters),
+    fields: List[str] = Depends(receipt_fields),
+):
+    statement = Receipt.select_for_client(current_user.client_id, fields, **filters)
+    try:
+        return await paginate_async(db, statement, Receipt, **page)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@dashboard_router.get("/stats", response_model=ReceiptStats)
+async def get_receipt_stats(
+    period_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    period_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(read_db),
+):
+    """Totaux de TVA du client par mois et taux, lus dans les agrégats (une ligne par mois et taux)."""
+    items, totals = [], VatTotals()
+    rows = await db.scalars(select_stats(current_user.client_id, period_from, period_to))
+    for row in rows:
+        counters = {name: getattr(row, name) for name in COUNTERS}
+        rate = None if row.vat_rate == UNKNOWN_VAT_RATE else row.vat_rate
+        items.append(VatPeriodStats(period=row.period, vat_rate=rate, **counters))
+        for name, value in counters.items():
+            setattr(totals, name, getattr(totals, name) + value)
+    return ReceiptStats(items=items, totals=totals)
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+
+
+# Déclarées avant /receipts/{receipt_id}, qui capturerait "export" et "search"
+@dashboard_router.get("/receipts/export", response_class=StreamingResponse)
+def export_receipts(
+    format: ExportFormat = ExportFormat.csv,
+    quarter: Optional[str] = None,
+    gzip: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db_session),
+    bind=Depends(read_bind),
+    filters: dict = Depends(receipt_filters),
 ):
-    receipts = (
-        db.query(Receipt)
-        .filter(Receipt.client_id == current_user.client_id)
-        .order_by(Receipt.created_at.desc())
-        .all()
+    """Export en flux des reçus du client (trimestre "2026-Q1" ou plage created_from / created_to)."""
+    if quarter:
+        if filters["created_from"] or filters["created_to"]:
+            raise HTTPException(status_code=400, detail="quarter excludes created_from / created_to")
+        try:
+            filters["created_from"], filters["created_to"] = quarter_bounds(quarter)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"receipts-{current_user.client_id}-{quarter or 'all'}.{format.value}"
+    media_type = MEDIA_TYPES[format.value]
+    if gzip:
+        filename, media_type = f"{filename}.gz", "application/gzip"
+
+    return StreamingResponse(
+        stream_export(bind, current_user.client_id, fmt=format.value, compress=gzip, **filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    return receipts
+
+
+@dashboard_router.get("/receipts/search", response_model=ReceiptSearchResults, response_model_exclude_unset=True)
+async def search_receipts(
+    q: str = Query(..., min_length=1, max_length=200, description="Mots cherchés (préfixes)"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(read_db),
+    fields: List[str] = Depends(receipt_fields),
+):
+    """Recherche plein texte dans les reçus du client, par pertinence (voir app.search)."""
+    statement = select_search(db.get_bind().dialect.name, current_user.client_id, q, fields)
+    if statement is None:
+        raise HTTPException(status_code=400, detail="Search query has no searchable words")
+    rows = await db.execute(statement.limit(limit).offset(offset))
+    return {"items": [dict(row._mapping) for row in rows]}
+
+
+@dashboard_router.get("/receipts/{receipt_id}", response_model=ReceiptOut)
+async def get_receipt_for_user(
+    receipt_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(read_db),
+):
+    statement = Receipt.select_for_client(current_user.client_id).where(Receipt.id == receipt_id)
+    receipt = await db.scalar(statement.options(undefer(Receipt.ocr_text)))
+    if receipt is None:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return receipt
@@ -1,36 +1,274 @@
+"""
+Moteurs et sessions SQLAlchemy du processus.
+
+Un processus n'a qu'un moteur synchrone et qu'un moteur async par base
+(registre get_engine / get_async_engine), dimensionnés selon son rôle
+(DB_ROLE, ou configure_role au démarrage) :
+
+    rôle        pool_size + max_overflow   statement_timeout
+    api         5 + 5 par moteur            15 s
+    worker      4 + 4                       120 s
+    scheduler   1 + 1                       aucun (CLI, tâches planifiées)
+
+Connexions Postgres au pic : 4 workers uvicorn × 2 moteurs × 10 = 80, plus
+8 par processus worker (les processus OCR forkés n'ouvrent pas de connexion) ;
+à garder sous max_connections. DB_POOL_SIZE, DB_MAX_OVERFLOW et
+DB_STATEMENT_TIMEOUT_MS remplacent les valeurs du rôle.
+
+Les connexions sont testées avant emprunt (pool_pre_ping), recyclées après
+DB_POOL_RECYCLE secondes, et l'attente d'une connexion libre est bornée par
+DB_POOL_TIMEOUT. L'état des pools est publié par app.metrics.db_metrics.
+
+Avec DATABASE_REPLICA_URL, les sessions marquées par read_from_replica
+lisent sur le réplica (voir app.replica pour le délai de réplication).
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
 from app.config import get_settings
+from app.metrics.db_metrics import instrument_engine, timed_pool_class
 from loguru import logger
 
 settings = get_settings()
 
 DATABASE_URL = settings.DATABASE_URL or "sqlite:///./test.db"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+
+@dataclass(frozen=True)
+class PoolProfile:
+    pool_size: int
+    max_overflow: int
+    statement_timeout_ms: int  # 0 : pas de limite
+
+
+POOL_PROFILES = {
+    "api": PoolProfile(pool_size=5, max_overflow=5, statement_timeout_ms=15_000),
+    "worker": PoolProfile(pool_size=4, max_overflow=4, statement_timeout_ms=120_000),
+    "scheduler": PoolProfile(pool_size=1, max_overflow=1, statement_timeout_ms=0),
+}
+
+
+def pool_profile(role: str) -> PoolProfile:
+    """Profil du rôle, avec les surcharges DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_STATEMENT_TIMEOUT_MS."""
+    if role not in POOL_PROFILES:
+        raise ValueError(f"Unknown database role: {role} (expected one of {', '.join(POOL_PROFILES)})")
+    overrides = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+    }
+    return replace(POOL_PROFILES[role], **{name: value for name, value in overrides.items() if value is not None})
+
+
+def engine_options(url: str, role: str) -> Dict[str, Any]:
+    """Arguments de create_engine / create_async_engine pour `url` dans le rôle `role`."""
+    parsed = make_url(url)
+    profile = pool_profile(role)
+    options: Dict[str, Any] = {
+        "poolclass": timed_pool_class(parsed.get_dialect().get_pool_class(parsed)),
+    }
+
+    if parsed.get_backend_name() == "sqlite":
+        # Pas de serveur : pool par défaut du dialecte, ni ping ni timeout
+        if parsed.get_driver_name() == "pysqlite":
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+    if parsed.get_backend_name() == "postgresql":
+        name = f"{settings.APP_NAME.lower()}-{role}"
+        if parsed.get_driver_name() == "asyncpg":
+            server_settings = {"application_name": name}
+            if profile.statement_timeout_ms:
+                server_settings["statement_timeout"] = str(profile.statement_timeout_ms)
+            options["connect_args"] = {"server_settings": server_settings}
+        else:
+            connect_args = {"application_name": name}
+            if profile.statement_timeout_ms:
+                connect_args["options"] = f"-c statement_timeout={profile.statement_timeout_ms}"
+            options["connect_args"] = connect_args
+    return options
+
+
+# Pilotes asynchrones des dialectes synchrones
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def to_async_url(url: str) -> str:
+    """URL du moteur asynchrone équivalent : postgresql:// -> postgresql+asyncpg://, sqlite -> aiosqlite."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+# Chemin des requêtes API : les dépendances et endpoints async attendent la
+# base sans occuper un thread du threadpool pendant l'aller-retour
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+
+# Réplica en lecture (optionnel) : listes, exports et statistiques du tableau de bord
+REPLICA_URL = settings.DATABASE_REPLICA_URL or None
+ASYNC_REPLICA_URL = settings.ASYNC_DATABASE_REPLICA_URL or (to_async_url(REPLICA_URL) if REPLICA_URL else None)
+
+ROLE = settings.DB_ROLE
+
+# (url, rôle) -> moteur ; un seul par couple pour tout le processus
+_engines: Dict[Tuple[str, str], Engine] = {}
+_async_engines: Dict[Tuple[str, str], AsyncEngine] = {}
+
+
+def get_engine(role: Optional[str] = None, url: Optional[str] = None) -> Engine:
+    """Moteur synchrone du rôle (défaut : celui du processus), créé au premier appel."""
+    key = (url or DATABASE_URL, role or ROLE)
+    if key not in _engines:
+        _engines[key] = create_engine(key[0], **engine_options(*key))
+        instrument_engine(_engines[key], key[1], "sync_replica" if key[0] == REPLICA_URL else "sync")
+    return _engines[key]
+
+
+def get_async_engine(role: Optional[str] = None, url: Optional[str] = None) -> AsyncEngine:
+    """Moteur async du rôle (défaut : celui du processus), créé au premier appel."""
+    key = (url or ASYNC_DATABASE_URL, role or ROLE)
+    if key not in _async_engines:
+        _async_engines[key] = create_async_engine(key[0], **engine_options(*key))
+        instrument_engine(_async_engines[key].sync_engine, key[1],
+                          "async_replica" if key[0] == ASYNC_REPLICA_URL else "async")
+    return _async_engines[key]
+
+
+def get_replica_engine(role: Optional[str] = None) -> Optional[Engine]:
+    """Moteur synchrone du réplica, ou None sans DATABASE_REPLICA_URL."""
+    return get_engine(role, REPLICA_URL) if REPLICA_URL else None
+
+
+def get_async_replica_engine(role: Optional[str] = None) -> Optional[AsyncEngine]:
+    """Moteur async du réplica, ou None sans DATABASE_REPLICA_URL."""
+    return get_async_engine(role, ASYNC_REPLICA_URL) if ASYNC_REPLICA_URL else None
+
+
+class RoutingSession(Session):
+    """
+    Session qui envoie ses lectures au réplica une fois marquée par
+    read_from_replica. Sa première écriture (flush, INSERT / UPDATE / DELETE)
+    la ramène sur le primaire pour le reste de sa vie : elle relit ce qu'elle
+    a écrit. Les requêtes text() sont considérées comme des lectures.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None:
+            if not self._flushing and not getattr(clause, "is_dml", False):
+                return replica
+            del self.info["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+    def close(self) -> None:
+        # SessionLocal réutilise la session du thread : la marque ne lui survit pas
+        self.info.pop("replica", None)
+        super().close()
+
+
+def read_from_replica(session):
+    """
+    Marque une session (synchrone ou async) en lecture seule : ses lectures
+    iront au réplica s'il est configuré. Renvoie la session.
+    """
+    if isinstance(session, AsyncSession):
+        replica = get_async_replica_engine()
+        target = session.sync_session
+    else:
+        replica = get_replica_engine()
+        target = session
+    if replica is not None:
+        target.info["replica"] = getattr(replica, "sync_engine", replica)
+    return session
+
+
+engine = get_engine()
+async_engine = get_async_engine()
 
 SessionLocal = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
 )
 
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, sync_session_class=RoutingSession)
+
 Base = declarative_base()
 
+
+def configure_role(role: str) -> None:
+    """
+    Fixe le rôle du processus (api, worker, scheduler) : SessionLocal et
+    AsyncSessionLocal passent sur les moteurs de ce rôle. À appeler au
+    démarrage, avant d'ouvrir des sessions.
+    """
+    global ROLE, engine, async_engine
+    pool_profile(role)
+    if role == ROLE:
+        return
+
+    previous = ROLE
+    ROLE = role
+    engine, async_engine = get_engine(), get_async_engine()
+    SessionLocal.remove()
+    SessionLocal.configure(bind=engine)
+    AsyncSessionLocal.configure(bind=async_engine)
+
+    # Les moteurs de l'ancien rôle n'ont encore servi qu'aux imports
+    for key in [key for key in _engines if key[1] == previous]:
+        _engines.pop(key).dispose()
+    for key in [key for key in _async_engines if key[1] == previous]:
+        _async_engines.pop(key).sync_engine.dispose()
+    logger.info(f"🗄️ Database role: {role} ({pool_profile(role)})")
+
+
+def dispose_after_fork() -> None:
+    """
+    Initialiseur des processus forkés : oublie les connexions héritées du
+    parent sans les fermer (elles restent à lui) ; l'enfant ouvre les siennes.
+    """
+    for sync_engine in [*_engines.values(), *(e.sync_engine for e in _async_engines.values())]:
+        sync_engine.dispose(close=False)
+
+
 def get_db_session():
-    """Used for manual or scheduled access to the DB."""
+    """Dépendance FastAPI : session synchrone fermée en fin de requête."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def get_db():
-    """Used in FastAPI dependencies."""
+
+async def get_async_db_session():
+    """Session asynchrone des dépendances et endpoints async."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@contextmanager
+def session_scope():
+    """Session des scripts et tâches planifiées : commit en fin de bloc, rollback sur erreur."""
     db = SessionLocal()
     try:
         yield db
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Erreur transactionnelle : {e}")
+        raise
     finally:
-        db.close()
+        SessionLocal.remove()
@@ -1,16 +1,22 @@
-from fastapi import Depends, HTTPException, status
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models
-from app.database import get_db
+from app.database import get_async_db_session
 from app.config import get_settings
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.schemas import ReceiptSummary
 
 settings = get_settings()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+async def get_current_user(token: str = Depends(oauth2_scheme),
+                           db: AsyncSession = Depends(get_async_db_session)) -> models.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,8 +31,49 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.id == int(user_id)).first()
+    user = await db.get(models.User, int(user_id))
     if user is None:
         raise credentials_exception
 
     return user
+
+
+def receipt_filters(
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    invoice_received: Optional[bool] = None,
+    email_sent: Optional[bool] = None,
+) -> dict:
+    """Filtres communs des listes de reçus (voir Receipt.filter_listing)."""
+    return {
+        "created_from": created_from,
+        "created_to": created_to,
+        "invoice_received": invoice_received,
+        "email_sent": email_sent,
+    }
+
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+) -> dict:
+    """Taille de page et curseur opaque renvoyé par la page précédente."""
+    return {"limit": limit, "cursor": cursor}
+
+
+def receipt_fields(
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules"),
+) -> List[str]:
+    """
+    Colonnes sélectionnées pour une liste de reçus (toutes celles de
+    ReceiptSummary par défaut). id et created_at, qui forment le curseur,
+    sont toujours inclus.
+    """
+    if not fields:
+        return list(ReceiptSummary.model_fields)
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in ReceiptSummary.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", "created_at", *requested]))
@@ -0,0 +1,175 @@
+"""
+Export en flux des reçus d'un client (CSV ou JSONL, gzip optionnel).
+
+Les lignes sont lues par lots avec yield_per (curseur côté serveur sur
+Postgres), converties au fil de l'eau et émises par blocs d'environ
+CHUNK_SIZE caractères : la mémoire consommée ne dépend pas du nombre de reçus.
+
+Usage :
+    python -m app.export --client-id 3 --quarter 2026-Q1 [--format jsonl] [--gzip] [-o receipts.csv.gz]
+"""
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Receipt
+from app.schemas import ReceiptSummary
+
+# Colonnes exportées : celles des listes (ocr_text exclu)
+EXPORT_FIELDS = list(ReceiptSummary.model_fields)
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def quarter_bounds(quarter: str) -> Tuple[datetime, datetime]:
+    """Bornes [début, fin[ d'un trimestre noté "2026-Q1"."""
+    match = re.fullmatch(r"(\d{4})-?Q([1-4])", quarter.strip(), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid quarter: {quarter} (expected YYYY-Qn)")
+    year, number = int(match[1]), int(match[2])
+    start = datetime(year, 3 * number - 2, 1)
+    end = datetime(year + 1, 1, 1) if number == 4 else datetime(year, 3 * number + 1, 1)
+    return start, end
+
+
+def iter_rows(session: Session, client_id: int, batch_size: int = DEFAULT_BATCH_SIZE,
+              **filters) -> Iterator[Mapping[str, Any]]:
+    """Reçus d'un client par date croissante, lus par lots de `batch_size` (ix_receipts_client_keyset)."""
+    statement = select(*(getattr(Receipt, name) for name in EXPORT_FIELDS)).where(Receipt.client_id == client_id)
+    statement = Receipt.filter_listing(statement, **filters).order_by(Receipt.created_at, Receipt.id)
+    for row in session.execute(statement.execution_options(yield_per=batch_size)):
+        yield row._mapping
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    data = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def iter_csv(rows: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow([row[name].isoformat() if isinstance(row[name], datetime) else row[name]
+                         for name in EXPORT_FIELDS])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield _drain(buffer)
+    data = _drain(buffer)
+    if data:
+        yield data
+
+
+def iter_jsonl(rows: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(json.dumps(dict(row), default=_json_default, ensure_ascii=False))
+        buffer.write("\n")
+        if buffer.tell() >= CHUNK_SIZE:
+            yield _drain(buffer)
+    data = _drain(buffer)
+    if data:
+        yield data
+
+
+FORMATS: Dict[str, Callable[[Iterable[Mapping[str, Any]]], Iterator[bytes]]] = {
+    "csv": iter_csv,
+    "jsonl": iter_jsonl,
+}
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compresse un flux de blocs au format gzip, sans le matérialiser."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_receipts(session: Session, client_id: int, fmt: str = "csv", compress: bool = False,
+                    batch_size: int = DEFAULT_BATCH_SIZE, **filters) -> Iterator[bytes]:
+    """
+    Flux d'octets de l'export des reçus d'un client.
+
+    Args:
+        session: Session utilisée pendant toute la consommation du flux
+        client_id: Client exporté
+        fmt: "csv" ou "jsonl"
+        compress: Compresse le flux en gzip
+        batch_size: Lignes lues par aller-retour avec la base
+        **filters: Filtres de Receipt.filter_listing (created_from, created_to, ...)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    chunks = FORMATS[fmt](iter_rows(session, client_id, batch_size, **filters))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def stream_export(bind, client_id: int, **options) -> Iterator[bytes]:
+    """
+    Comme export_receipts, avec sa propre session sur `bind` : une réponse en
+    flux est consommée après la fin de la requête qui l'a créée.
+    """
+    with Session(bind=bind) as session:
+        yield from export_receipts(session, client_id, **options)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Exporte les reçus d'un client")
+    parser.add_argument("--client-id", type=int, required=True)
+    parser.add_argument("--quarter", help="Trimestre exporté, ex. 2026-Q1 (défaut : tout)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--gzip", action="store_true", help="Compresse la sortie")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Lignes lues par lot")
+    parser.add_argument("-o", "--output", help="Fichier de sortie (défaut : sortie standard)")
+    args = parser.parse_args()
+
+    filters = {}
+    if args.quarter:
+        try:
+            filters["created_from"], filters["created_to"] = quarter_bounds(args.quarter)
+        except ValueError as e:
+            parser.error(str(e))
+
+    from app.database import SessionLocal, configure_role
+
+    configure_role("scheduler")
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in export_receipts(SessionLocal(), args.client_id, args.format, args.gzip,
+                                     args.batch_size, **filters):
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        SessionLocal.remove()
+        if args.output:
+            output.close()
+    logger.info(f"📦 Exported receipts of client {args.client_id}: {written} bytes")
+
+
+if __name__ == "__main__":
+    main()
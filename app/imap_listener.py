@@ -73,7 +73,7 @@ class EmailProcessor:
     def match_receipt(self, receipt):
         session: Session = SessionLocal()
         try:
-            receipts = session.query(Receipt).filter_by(invoice_received=False).all()
+            receipts = Receipt.query_awaiting_invoice(session).all()
             matches = []
             for r in receipts:
                 if r.price_ttc and str(r.price_ttc) in receipt["ocr_text"]:
@@ -4,13 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from fastapi_limiter import FastAPILimiter
 from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import redis.asyncio as redis
 import os
 
 from app.logger_setup import setup_logger
 from app.config import settings, get_settings
-from app.database import get_db_session
+from app.database import get_async_db_session
 from app.auth import auth_router, get_current_user
 from app.dashboard import dashboard_router
 from app.reminder import reminder_router
@@ -63,7 +64,9 @@ async def startup():
 @app.on_event("shutdown")
 async def shutdown():
     from loguru import logger
+    from app.queue.async_redis_queue import close_connection_pools
     logger.info("Shutting down...")
+    await close_connection_pools()
 
 # --- ROOT ---
 @app.get("/")
@@ -75,7 +78,7 @@ async def root():
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 
 # --- DASHBOARD (HTML, protégé OAuth2) ---
-app.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
+app.include_router(dashboard_router)
 
 # --- REMINDER (CRON, etc.) ---
 app.include_router(reminder_router, prefix="/reminder", tags=["reminder"])
@@ -86,17 +89,17 @@ app.include_router(receipts_router, prefix="/receipts", tags=["receipts"])
 # --- API pour clients (X-API-Token) ---
 api = APIRouter(prefix="/api", tags=["client-api"])
 
-def get_current_client(
+async def get_current_client(
     x_api_token: str = Header(..., alias="X-API-Token"),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> User:
     """
     Authentifie un client via son token envoyé en header X-API-Token.
     """
-    client = db.query(User).filter(
+    client = await db.scalar(select(User).where(
         User.api_token == x_api_token,
         User.is_active == True
-    ).first()
+    ))
     if not client:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid API token")
     return client
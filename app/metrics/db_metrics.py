@@ -0,0 +1,92 @@
+import time
+from typing import Dict, Tuple, Type
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+DB_POOL_SIZE = Gauge(
+    'db_pool_size',
+    'Connexions permanentes du pool (pool_size)',
+    ['role', 'engine'],
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out',
+    'Connexions empruntées au pool',
+    ['role', 'engine'],
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow',
+    'Connexions ouvertes au-delà de pool_size',
+    ['role', 'engine'],
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds',
+    "Durée d'obtention d'une connexion du pool (attente et ouverture comprises)",
+    ['role', 'engine'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+DB_POOL_WAITS = Counter(
+    'db_pool_waits_total',
+    'Emprunts qui ont dû attendre une connexion libre (pool saturé)',
+    ['role', 'engine'],
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Emprunts abandonnés après pool_timeout',
+    ['role', 'engine'],
+)
+
+
+class _TimedCheckout:
+    """Mesure chaque emprunt de connexion d'un QueuePool (attente comprise)."""
+
+    metric_labels: Tuple[str, str] = ("unknown", "sync")
+
+    def _do_get(self):
+        labels = self.metric_labels
+        if self.checkedin() == 0 and -1 < self._max_overflow <= self.overflow():
+            DB_POOL_WAITS.labels(*labels).inc()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(*labels).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+
+    def recreate(self):
+        # engine.dispose() remplace le pool : les libellés suivent
+        pool = super().recreate()
+        pool.metric_labels = self.metric_labels
+        return pool
+
+
+_timed_classes: Dict[type, type] = {}
+
+
+def timed_pool_class(pool_class: Type[Pool]) -> Type[Pool]:
+    """Variante instrumentée d'une classe de pool (QueuePool et dérivées ; les autres sont renvoyées telles quelles)."""
+    if not issubclass(pool_class, QueuePool):
+        return pool_class
+    if pool_class not in _timed_classes:
+        _timed_classes[pool_class] = type(f"Timed{pool_class.__name__}", (_TimedCheckout, pool_class), {})
+    return _timed_classes[pool_class]
+
+
+def instrument_engine(engine, role: str, kind: str) -> None:
+    """Publie l'état du pool d'un moteur synchrone (pour un moteur async : engine.sync_engine)."""
+    if not isinstance(engine.pool, QueuePool):
+        return
+    labels = (role, kind)
+    engine.pool.metric_labels = labels
+    # Lecture à la collecte, sur le pool courant (remplacé par engine.dispose())
+    DB_POOL_SIZE.labels(*labels).set_function(lambda: engine.pool.size())
+    DB_POOL_CHECKED_OUT.labels(*labels).set_function(lambda: engine.pool.checkedout())
+    DB_POOL_OVERFLOW.labels(*labels).set_function(lambda: max(engine.pool.overflow(), 0))
@@ -0,0 +1,28 @@
+"""
+Exposition des métriques d'un processus sans application ASGI (worker).
+
+L'API publie ses métriques sur /metrics (prometheus_middleware). Le worker
+n'a pas de serveur web : start_metrics_server lance le serveur HTTP de
+prometheus_client sur un port dédié (WORKER_METRICS_PORT), pour les métriques
+de readiness, de baux expirés, d'autoscaling et de pool de connexions.
+
+Mode multiprocessus : si PROMETHEUS_MULTIPROC_DIR est défini (répertoire vide
+au démarrage du worker, ex. un tmpfs), chaque processus du pool CPU y écrit
+ses métriques et le serveur les agrège avec celles du processus principal.
+"""
+import os
+
+from loguru import logger
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> None:
+    """Expose /metrics du processus (et de ses enfants en mode multiprocessus) sur `port`."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, addr=addr, registry=registry)
+        logger.info(f"📈 Metrics of worker processes exposed on {addr}:{port}/metrics")
+    else:
+        start_http_server(port, addr=addr)
+        logger.info(f"📈 Worker metrics exposed on {addr}:{port}/metrics")
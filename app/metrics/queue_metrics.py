@@ -0,0 +1,62 @@
+from typing import Dict, Set
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LEASE_EXPIRED = Counter(
+    'queue_lease_expired_total',
+    'Tâches dont le bail a expiré (worker mort ou bloqué)',
+    ['queue', 'action'],
+)
+
+QUEUE_WAIT = Histogram(
+    'queue_wait_seconds',
+    "Attente d'une tâche entre sa mise en file et sa prise en charge",
+    ['queue', 'priority'],
+)
+
+QUEUE_CLIENT_DEPTH = Gauge(
+    'queue_client_depth',
+    'Tâches prêtes par client',
+    ['queue', 'client'],
+)
+
+QUEUE_CLIENT_OLDEST_WAIT = Gauge(
+    'queue_client_oldest_wait_seconds',
+    'Attente de la plus ancienne tâche prête par client',
+    ['queue', 'client'],
+)
+
+
+QUEUE_RECOMMENDED_CONCURRENCY = Gauge(
+    'queue_recommended_concurrency',
+    "Tâches simultanées nécessaires pour vider la file dans le délai cible (tous workers confondus)",
+    ['queue'],
+)
+
+WORKER_CONCURRENCY = Gauge(
+    'worker_concurrency',
+    'Limite de tâches simultanées appliquée par ce worker',
+    ['queue'],
+)
+
+QUEUE_SERVICE_TIME = Gauge(
+    'queue_service_time_seconds',
+    "Durée moyenne de traitement d'une tâche, estimée par l'autoscaler",
+    ['queue'],
+)
+
+
+# Clients publiés par file, pour retirer ceux qui n'ont plus de tâches prêtes
+_published_clients: Dict[str, Set[str]] = {}
+
+
+def record_queue_stats(queue_name: str, stats: dict) -> None:
+    """Publie les statistiques de RedisQueue.get_queue_stats() par client."""
+    clients = stats.get("clients", {})
+    for client in _published_clients.get(queue_name, set()) - set(clients):
+        QUEUE_CLIENT_DEPTH.remove(queue_name, client)
+        QUEUE_CLIENT_OLDEST_WAIT.remove(queue_name, client)
+    for client, client_stats in clients.items():
+        QUEUE_CLIENT_DEPTH.labels(queue_name, client).set(client_stats["depth"])
+        QUEUE_CLIENT_OLDEST_WAIT.labels(queue_name, client).set(client_stats["oldest_wait"])
+    _published_clients[queue_name] = set(clients)
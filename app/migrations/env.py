@@ -8,13 +8,16 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from app.models import Base  # 📦 tes modèles SQLAlchemy
-from app.init_db import DATABASE_URL  # 🔌 ta connexion
+from app.config import get_settings  # 🔌 même URL que app.database
+
+DATABASE_URL = os.getenv("DATABASE_URL") or get_settings().DATABASE_URL
 
 # Config Alembic
 config = context.config
 
-# 🔧 Injecte l'URL de la base
-config.set_main_option("sqlalchemy.url", DATABASE_URL)
+# 🔧 Injecte l'URL de la base (l'appelant peut la fixer via config.attributes, ex. les tests)
+url = config.attributes.get("sqlalchemy.url", DATABASE_URL)
+config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
 
 # Logging
 if config.config_file_name is not None:
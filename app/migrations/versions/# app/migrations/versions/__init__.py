@@ -1,6 +0,0 @@
-# app/migrations/versions/__init__.py
-
-"""
-Ce dossier contient les fichiers de migration générés par Alembic.
-Chaque fichier correspond à une version du schéma de la base.
-"""
@@ -0,0 +1,78 @@
+"""Schéma initial : clients, users, receipts
+
+Les tables déjà présentes (bases créées par Base.metadata.create_all) sont
+laissées telles quelles : la migration sert alors de point de départ.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2025-06-06 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "clients" not in existing:
+        op.create_table(
+            "clients",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False, unique=True),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("ix_clients_id", "clients", ["id"])
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+            sa.Column("api_token", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("is_admin", sa.Boolean()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_api_token", "users", ["api_token"], unique=True)
+
+    if "receipts" not in existing:
+        op.create_table(
+            "receipts",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("file", sa.String(), nullable=False),
+            sa.Column("email_sent_to", sa.String(), nullable=False),
+            sa.Column("date", sa.String()),
+            sa.Column("company_name", sa.String()),
+            sa.Column("vat_number", sa.String()),
+            sa.Column("price_ttc", sa.Float()),
+            sa.Column("price_ht", sa.Float()),
+            sa.Column("vat_amount", sa.Float()),
+            sa.Column("vat_rate", sa.Float()),
+            sa.Column("email_sent", sa.Boolean()),
+            sa.Column("invoice_received", sa.Boolean()),
+            sa.Column("ocr_text", sa.String()),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("ix_receipts_id", "receipts", ["id"])
+
+
+def downgrade():
+    op.drop_table("receipts")
+    op.drop_table("users")
+    op.drop_table("clients")
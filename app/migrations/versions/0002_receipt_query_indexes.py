@@ -0,0 +1,67 @@
+"""Index composites et partiels des requêtes fréquentes sur receipts
+
+- ix_receipts_reminder : relances (send_reminder, get_pending_receipts)
+- ix_receipts_client_created : dashboard trié par date décroissante
+- ix_receipts_user_id : list_receipts
+- ix_receipts_awaiting_invoice : rapprochement des factures (match_receipt),
+  partiel sur les reçus en attente
+
+Sur Postgres, les index sont construits avec CREATE INDEX CONCURRENTLY, hors
+transaction : les écritures ne sont pas bloquées pendant la construction. Si
+elle est interrompue, l'index reste INVALID : le supprimer puis relancer la
+migration.
+
+Revision ID: 0002_receipt_query_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_receipt_query_indexes"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_receipts_reminder", ["email_sent", "invoice_received", "created_at"], {}),
+    ("ix_receipts_client_created", ["client_id", "created_at"], {}),
+    ("ix_receipts_user_id", ["user_id"], {}),
+    ("ix_receipts_awaiting_invoice", ["price_ttc"], {
+        "postgresql_where": sa.text("invoice_received = false"),
+        "sqlite_where": sa.text("invoice_received = 0"),
+    }),
+]
+
+
+def _existing_indexes():
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("receipts")}
+
+
+def upgrade():
+    # Index déjà présents si la base a été créée par create_all avec les modèles à jour
+    existing = _existing_indexes()
+    missing = [index for index in INDEXES if index[0] not in existing]
+
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, columns, options in missing:
+                op.create_index(name, "receipts", columns, postgresql_concurrently=True, **options)
+    else:
+        for name, columns, options in missing:
+            op.create_index(name, "receipts", columns, **options)
+
+
+def downgrade():
+    existing = _existing_indexes()
+    names = [name for name, _, _ in INDEXES if name in existing]
+
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name in names:
+                op.drop_index(name, table_name="receipts", postgresql_concurrently=True)
+    else:
+        for name in names:
+            op.drop_index(name, table_name="receipts")
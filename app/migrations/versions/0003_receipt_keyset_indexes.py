@@ -0,0 +1,63 @@
+"""Index keyset (…, created_at, id) des listes de reçus paginées
+
+- ix_receipts_client_keyset remplace ix_receipts_client_created : dashboard
+  et relances d'un client
+- ix_receipts_user_keyset remplace ix_receipts_user_id : list_receipts
+
+Le curseur d'une page porte sur (created_at, id) : avec id en dernière colonne,
+la page suivante est une simple recherche dans l'index, même quand plusieurs
+reçus partagent le même created_at. Les nouveaux index sont créés avant la
+suppression des anciens, pour que les requêtes ne restent jamais sans index.
+
+Revision ID: 0003_receipt_keyset_indexes
+Revises: 0002_receipt_query_indexes
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_receipt_keyset_indexes"
+down_revision = "0002_receipt_query_indexes"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = [
+    ("ix_receipts_client_keyset", ["client_id", "created_at", "id"]),
+    ("ix_receipts_user_keyset", ["user_id", "created_at", "id"]),
+]
+OLD_INDEXES = [
+    ("ix_receipts_client_created", ["client_id", "created_at"]),
+    ("ix_receipts_user_id", ["user_id"]),
+]
+
+
+def _existing_indexes():
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("receipts")}
+
+
+def _replace(create, drop):
+    existing = _existing_indexes()
+    create = [(name, columns) for name, columns in create if name not in existing]
+    drop = [name for name, _ in drop if name in existing]
+
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, columns in create:
+                op.create_index(name, "receipts", columns, postgresql_concurrently=True)
+            for name in drop:
+                op.drop_index(name, table_name="receipts", postgresql_concurrently=True)
+    else:
+        for name, columns in create:
+            op.create_index(name, "receipts", columns)
+        for name in drop:
+            op.drop_index(name, table_name="receipts")
+
+
+def upgrade():
+    _replace(NEW_INDEXES, OLD_INDEXES)
+
+
+def downgrade():
+    _replace(OLD_INDEXES, NEW_INDEXES)
@@ -0,0 +1,45 @@
+"""Agrégats de TVA par client, mois et taux (receipt_aggregates)
+
+La table est ensuite tenue à jour par app.aggregates à chaque écriture de
+reçu. Pour une base existante, la remplir une fois le code qui l'alimente
+déployé (les reçus écrits entre-temps sont ainsi comptés) :
+
+    python -m app.aggregates
+
+Revision ID: 0004_receipt_aggregates
+Revises: 0003_receipt_keyset_indexes
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_receipt_aggregates"
+down_revision = "0003_receipt_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "receipt_aggregates" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "receipt_aggregates",
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), primary_key=True),
+        sa.Column("period", sa.String(7), primary_key=True),
+        sa.Column("vat_rate", sa.Float(), primary_key=True),
+        sa.Column("receipt_count", sa.Integer(), nullable=False),
+        sa.Column("pending_count", sa.Integer(), nullable=False),
+        sa.Column("reminded_count", sa.Integer(), nullable=False),
+        sa.Column("total_ttc", sa.Float(), nullable=False),
+        sa.Column("total_ht", sa.Float(), nullable=False),
+        sa.Column("total_vat", sa.Float(), nullable=False),
+        sa.Column("recoverable_vat", sa.Float(), nullable=False),
+        sa.Column("pending_vat", sa.Float(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("receipt_aggregates")
@@ -0,0 +1,97 @@
+"""Index plein texte des reçus (fournisseur et texte OCR), voir app.search
+
+- Postgres : configuration de recherche receipts_search (simple + unaccent),
+  colonne générée receipts.search_vector et index GIN
+  (client_id, search_vector), avec l'extension btree_gin. L'ajout de la
+  colonne réécrit la table sous verrou exclusif : à passer hors des heures
+  d'import. L'index est ensuite construit avec CREATE INDEX CONCURRENTLY.
+- SQLite : table FTS5 receipts_fts, ses triggers, puis remplissage à partir
+  des reçus existants.
+
+Revision ID: 0005_receipt_search
+Revises: 0004_receipt_aggregates
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_receipt_search"
+down_revision = "0004_receipt_aggregates"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('receipts_search', coalesce(company_name, '')), 'A') || "
+    "setweight(to_tsvector('receipts_search', coalesce(ocr_text, '')), 'B')"
+)
+
+# Accents ignorés comme par le tokenizer FTS5 remove_diacritics de SQLite
+CREATE_TEXT_SEARCH_CONFIG = """DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'receipts_search') THEN
+        CREATE TEXT SEARCH CONFIGURATION receipts_search (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION receipts_search
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    END IF;
+END $$"""
+
+SQLITE_TRIGGERS = {
+    "receipts_fts_insert": """CREATE TRIGGER receipts_fts_insert AFTER INSERT ON receipts BEGIN
+        INSERT INTO receipts_fts(rowid, company_name, ocr_text) VALUES (new.id, new.company_name, new.ocr_text);
+    END""",
+    "receipts_fts_delete": """CREATE TRIGGER receipts_fts_delete AFTER DELETE ON receipts BEGIN
+        INSERT INTO receipts_fts(receipts_fts, rowid, company_name, ocr_text)
+        VALUES ('delete', old.id, old.company_name, old.ocr_text);
+    END""",
+    "receipts_fts_update": """CREATE TRIGGER receipts_fts_update AFTER UPDATE OF company_name, ocr_text ON receipts BEGIN
+        INSERT INTO receipts_fts(receipts_fts, rowid, company_name, ocr_text)
+        VALUES ('delete', old.id, old.company_name, old.ocr_text);
+        INSERT INTO receipts_fts(rowid, company_name, ocr_text) VALUES (new.id, new.company_name, new.ocr_text);
+    END""",
+}
+
+
+def _upgrade_postgresql(bind):
+    inspector = sa.inspect(bind)
+    if "search_vector" not in {column["name"] for column in inspector.get_columns("receipts")}:
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+        op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        op.execute(CREATE_TEXT_SEARCH_CONFIG)
+        op.execute(f"ALTER TABLE receipts ADD COLUMN search_vector tsvector "
+                   f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED")
+    if "ix_receipts_search" not in {index["name"] for index in inspector.get_indexes("receipts")}:
+        with op.get_context().autocommit_block():
+            op.execute("CREATE INDEX CONCURRENTLY ix_receipts_search ON receipts "
+                       "USING gin (client_id, search_vector)")
+
+
+def _upgrade_sqlite(bind):
+    # Base créée par create_all : table et triggers déjà présents (app.search)
+    if "receipts_fts" in sa.inspect(bind).get_table_names():
+        return
+    op.execute("CREATE VIRTUAL TABLE receipts_fts USING fts5(company_name, ocr_text, content='receipts', "
+               "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    for statement in SQLITE_TRIGGERS.values():
+        op.execute(statement)
+    op.execute("INSERT INTO receipts_fts(receipts_fts) VALUES ('rebuild')")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        _upgrade_postgresql(bind)
+    elif bind.dialect.name == "sqlite":
+        _upgrade_sqlite(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_receipts_search")
+        op.execute("ALTER TABLE receipts DROP COLUMN IF EXISTS search_vector")
+        op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS receipts_search")
+    elif bind.dialect.name == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS receipts_fts")
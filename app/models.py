@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, select, text
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from secrets import token_urlsafe
@@ -60,6 +60,17 @@ class Client(Base):
 
 class Receipt(Base):
     __tablename__ = "receipts"
+    # Index des requêtes fréquentes (migration 0002_receipt_query_indexes)
+    __table_args__ = (
+        # Relances : email envoyé, facture non reçue, plus ancien que le délai
+        Index("ix_receipts_reminder", "email_sent", "invoice_received", "created_at"),
+        # Listes paginées par curseur (created_at, id) et relances d'un client
+        Index("ix_receipts_client_keyset", "client_id", "created_at", "id"),
+        Index("ix_receipts_user_keyset", "user_id", "created_at", "id"),
+        # Rapprochement des factures entrantes : seuls les reçus en attente
+        Index("ix_receipts_awaiting_invoice", "price_ttc",
+              postgresql_where=text("invoice_received = false"), sqlite_where=text("invoice_received = 0")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     file = Column(String, nullable=False)
@@ -73,7 +84,8 @@ class Receipt(Base):
     vat_rate = Column(Float, nullable=True)
     email_sent = Column(Boolean, default=False)
     invoice_received = Column(Boolean, default=False)
-    ocr_text = Column(String, nullable=True)
+    # Texte OCR complet (plusieurs Ko) : chargé seulement à la première lecture
+    ocr_text = deferred(Column(String, nullable=True))
 
     # Foreign keys
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -90,11 +102,95 @@ class Receipt(Base):
     def get_pending_receipts(cls, session, days: int = 5) -> List["Receipt"]:
         """Get receipts waiting for invoice for more than X days"""
         cutoff = datetime.utcnow() - timedelta(days=days)
-        return session.query(cls).filter(
-            cls.invoice_received == False,
+        return cls.query_pending(session, cutoff).all()
+
+    @classmethod
+    def query_pending(cls, session, cutoff: datetime, client_id: Optional[int] = None, inclusive: bool = False):
+        """Reçus relancés dont la facture n'est pas arrivée, créés avant `cutoff` (ix_receipts_reminder)."""
+        query = session.query(cls).filter(
             cls.email_sent == True,
-            cls.created_at < cutoff
-        ).all()
+            cls.invoice_received == False,
+            cls.created_at <= cutoff if inclusive else cls.created_at < cutoff,
+        )
+        if client_id:
+            query = query.filter(cls.client_id == client_id)
+        return query
+
+    @classmethod
+    def query_for_client(cls, session, client_id: int, **filters):
+        """Reçus d'un client, du plus récent au plus ancien (ix_receipts_client_keyset)."""
+        query = cls.filter_listing(session.query(cls).filter(cls.client_id == client_id), **filters)
+        return query.order_by(cls.created_at.desc(), cls.id.desc())
+
+    @classmethod
+    def query_for_user(cls, session, user_id: int, **filters):
+        """Reçus d'un utilisateur, du plus récent au plus ancien (ix_receipts_user_keyset)."""
+        query = cls.filter_listing(session.query(cls).filter(cls.user_id == user_id), **filters)
+        return query.order_by(cls.created_at.desc(), cls.id.desc())
+
+    @classmethod
+    def select_for_client(cls, client_id: int, fields: Optional[List[str]] = None, **filters):
+        """Comme query_for_client, en instruction select() (sessions async), restreinte aux colonnes `fields`."""
+        statement = cls.filter_listing(select(*cls._columns(fields)).where(cls.client_id == client_id), **filters)
+        return statement.order_by(cls.created_at.desc(), cls.id.desc())
+
+    @classmethod
+    def select_for_user(cls, user_id: int, fields: Optional[List[str]] = None, **filters):
+        """Comme query_for_user, en instruction select() (sessions async), restreinte aux colonnes `fields`."""
+        statement = cls.filter_listing(select(*cls._columns(fields)).where(cls.user_id == user_id), **filters)
+        return statement.order_by(cls.created_at.desc(), cls.id.desc())
+
+    @classmethod
+    def _columns(cls, fields: Optional[List[str]]):
+        return [getattr(cls, name) for name in fields] if fields else [cls]
+
+    @classmethod
+    def filter_listing(cls, query, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                       invoice_received: Optional[bool] = None, email_sent: Optional[bool] = None):
+        """Filtres des listes de reçus ; la plage de dates borne le parcours de l'index keyset."""
+        if created_from is not None:
+            query = query.filter(cls.created_at >= created_from)
+        if created_to is not None:
+            query = query.filter(cls.created_at < created_to)
+        if invoice_received is not None:
+            query = query.filter(cls.invoice_received == invoice_received)
+        if email_sent is not None:
+            query = query.filter(cls.email_sent == email_sent)
+        return query
+
+    @classmethod
+    def query_awaiting_invoice(cls, session):
+        """Reçus en attente de facture, candidats au rapprochement (ix_receipts_awaiting_invoice)."""
+        return session.query(cls).filter(cls.invoice_received == False)
 
     def __repr__(self):
         return f"<Receipt file={self.file} user_id={self.user_id} client_id={self.client_id}>"
+
+
+# Taux de TVA des reçus dont le taux n'a pas (encore) été extrait
+UNKNOWN_VAT_RATE = -1.0
+
+
+class ReceiptAggregate(Base):
+    """Totaux des reçus par client, mois de création et taux de TVA, tenus à jour par app.aggregates."""
+    __tablename__ = "receipt_aggregates"
+
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    period = Column(String(7), primary_key=True)  # "2026-01"
+    vat_rate = Column(Float, primary_key=True)  # UNKNOWN_VAT_RATE si inconnu
+    receipt_count = Column(Integer, nullable=False, default=0)
+    pending_count = Column(Integer, nullable=False, default=0)  # facture non reçue
+    reminded_count = Column(Integer, nullable=False, default=0)  # facture non reçue, relance envoyée
+    total_ttc = Column(Float, nullable=False, default=0.0)
+    total_ht = Column(Float, nullable=False, default=0.0)
+    total_vat = Column(Float, nullable=False, default=0.0)
+    recoverable_vat = Column(Float, nullable=False, default=0.0)  # TVA des reçus avec facture
+    pending_vat = Column(Float, nullable=False, default=0.0)  # TVA en attente de facture
+
+    def __repr__(self):
+        return f"<ReceiptAggregate client_id={self.client_id} period={self.period} vat_rate={self.vat_rate}>"
+
+
+# Enregistre la mise à jour incrémentale des agrégats (événement before_flush)
+# et l'index plein texte des bases créées par create_all
+from app import aggregates, search  # noqa: E402,F401
@@ -0,0 +1,121 @@
+"""
+Pagination par curseur (keyset) sur (created_at, id), du plus récent au plus ancien.
+
+Une page est lue par une recherche d'index à partir de la dernière ligne de la
+page précédente, au lieu d'un OFFSET qui relit toutes les lignes sautées : le
+temps de réponse ne dépend pas de la page demandée.
+
+Les curseurs sont opaques pour le client (JSON encodé en base64 URL-safe) et
+indiquent leur sens : "next" (plus anciens) ou "prev" (plus récents).
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Union
+
+from sqlalchemy import Row, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+
+NEXT = "next"
+PREV = "prev"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou falsifié."""
+
+
+def encode_cursor(created_at: datetime, row_id: int, direction: str) -> str:
+    payload = json.dumps({"t": created_at.isoformat(), "id": row_id, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        direction = payload["d"]
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["t"]), int(payload["id"]), direction
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def keyset(query: Union[Query, Select], model, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[Union[Query, Select], str]:
+    """
+    Restreint `query` à la page qui suit (ou précède) `cursor`, en lisant une
+    ligne de plus que `limit`. Le tri existant est remplacé par (created_at, id).
+
+    Raises:
+        InvalidCursor: curseur illisible
+    """
+    direction = NEXT
+    query = query.order_by(None)
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        key, position = tuple_(model.created_at, model.id), tuple_(created_at, row_id)
+        query = query.filter(key < position if direction == NEXT else key > position)
+
+    if direction == NEXT:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+    return query.limit(limit + 1), direction
+
+
+def paginate(query: Query, model, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page:
+    """
+    Renvoie une page de `query` triée par (created_at, id) décroissants.
+    `query` porte sur `model` ou sur des colonnes incluant created_at et id.
+
+    Les filtres de `query` doivent être couverts par un index se terminant par
+    (created_at, id) pour que le coût d'une page ne dépende pas de sa position.
+
+    Raises:
+        InvalidCursor: curseur illisible
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query, direction = keyset(query, model, limit, cursor)
+    return _page(query.all(), limit, direction, cursor)
+
+
+async def paginate_async(session: AsyncSession, statement: Select, model, limit: int = DEFAULT_PAGE_SIZE,
+                         cursor: Optional[str] = None) -> Page:
+    """Comme paginate, pour une instruction select() exécutée par une session async."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    statement, direction = keyset(statement, model, limit, cursor)
+    result = await session.execute(statement)
+    rows = result.scalars().all() if statement.column_descriptions[0]["expr"] is model else result.all()
+    return _page(rows, limit, direction, cursor)
+
+
+def _page(rows: List[Any], limit: int, direction: str, cursor: Optional[str]) -> Page:
+    # La ligne en plus indique s'il reste une page dans ce sens
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if direction == PREV:
+        rows.reverse()
+
+    # Requête sur des colonnes : lignes converties en dictionnaires
+    page = Page(items=[dict(row._mapping) if isinstance(row, Row) else row for row in rows])
+    if rows:
+        first, last = rows[0], rows[-1]
+        # La page d'où vient le curseur existe toujours, dans le sens opposé
+        older = has_more if direction == NEXT else True
+        newer = has_more if direction == PREV else cursor is not None
+        if older:
+            page.next_cursor = encode_cursor(last.created_at, last.id, NEXT)
+        if newer:
+            page.prev_cursor = encode_cursor(first.created_at, first.id, PREV)
+    return page
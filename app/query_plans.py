@@ -0,0 +1,86 @@
+"""
+Vérification des plans d'exécution des requêtes fréquentes sur receipts.
+
+Chaque requête est construite par les mêmes méthodes que le code applicatif
+(Receipt.query_*, Receipt.select_*) puis passée à EXPLAIN. Une requête qui
+parcourt toute la table au lieu d'utiliser un index est signalée :
+
+- SQLite : ligne "SCAN receipts" sans index ;
+- Postgres : nœud "Seq Scan on receipts", avec enable_seqscan désactivé pour
+  que le plan ne dépende pas de la taille de la table.
+
+Utilisable en CI contre une base migrée :
+
+    DATABASE_URL=postgresql://... python -m app.query_plans
+"""
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Union
+
+from loguru import logger
+from sqlalchemy import Select
+from sqlalchemy.orm import Query, Session
+
+from app.models import Receipt
+from app.pagination import NEXT, encode_cursor, keyset
+from app.search import select_search
+
+HOT_QUERIES: Dict[str, Callable[[Session], Union[Query, Select]]] = {
+    "reminder": lambda session: Receipt.query_pending(session, datetime.utcnow(), inclusive=True),
+    "reminder_by_client": lambda session: Receipt.query_pending(session, datetime.utcnow(), client_id=1),
+    "dashboard": lambda session: Receipt.query_for_client(session, 1),
+    "dashboard_next_page": lambda session: keyset(
+        Receipt.select_for_client(1, ["id", "created_at", "price_ttc"], invoice_received=False), Receipt,
+        cursor=encode_cursor(datetime.utcnow(), 1000, NEXT))[0],
+    "list_receipts": lambda session: Receipt.query_for_user(session, 1),
+    "match_receipt": Receipt.query_awaiting_invoice,
+    "search": lambda session: select_search(session.get_bind().dialect.name, 1, "boulangerie paul"),
+}
+
+
+def explain(session: Session, query: Union[Query, Select]) -> List[str]:
+    """Plan d'exécution de la requête (Query ou select()), une ligne par nœud."""
+    dialect = session.get_bind().dialect
+    compiled = getattr(query, "statement", query).compile(dialect=dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    connection = session.connection()
+    if dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params)
+        return [row[0] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return [row[-1] for row in rows]
+
+
+def is_sequential_scan(line: str, table: str = "receipts") -> bool:
+    if line.lstrip(" ->").startswith(f"Seq Scan on {table}"):
+        return True
+    return line.startswith(f"SCAN {table}") and "INDEX" not in line
+
+
+def sequential_scans(session: Session) -> Dict[str, List[str]]:
+    """Requêtes fréquentes qui parcourent toute la table, avec leur plan."""
+    regressions = {}
+    try:
+        for name, build in HOT_QUERIES.items():
+            plan = explain(session, build(session))
+            if any(is_sequential_scan(line) for line in plan):
+                regressions[name] = plan
+    finally:
+        session.rollback()
+    return regressions
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    with Session(get_engine("scheduler")) as session:
+        regressions = sequential_scans(session)
+    for name, plan in regressions.items():
+        logger.error(f"❌ {name} uses a sequential scan:\n" + "\n".join(plan))
+    if not regressions:
+        logger.info(f"✅ {len(HOT_QUERIES)} hot queries use an index")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,389 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from loguru import logger
+
+from app.metrics.queue_metrics import LEASE_EXPIRED
+from app.queue.codec import BLOB_PREFIX, COMPRESSED_PREFIX
+from app.queue.redis_queue import (
+    BaseRedisQueue, DEFAULT_PRIORITY, PROMOTE_BATCH_SIZE, REAP_BATCH_SIZE,
+)
+
+# Un pool de connexions par URL, partagé par toutes les AsyncRedisQueue du processus
+_pools: Dict[str, aioredis.ConnectionPool] = {}
+
+
+def get_connection_pool(url: str) -> aioredis.ConnectionPool:
+    if url not in _pools:
+        _pools[url] = aioredis.ConnectionPool.from_url(url, decode_responses=True)
+    return _pools[url]
+
+
+async def close_connection_pools() -> None:
+    """Ferme les pools partagés (arrêt de l'application)."""
+    while _pools:
+        _, pool = _pools.popitem()
+        await pool.disconnect()
+
+
+class AsyncRedisQueue(BaseRedisQueue):
+    """
+    Version asyncio de RedisQueue (backend listes), sur redis.asyncio.
+
+    Mêmes clés, mêmes scripts Lua et même encodage : une tâche enfilée par
+    l'API via cette classe est traitée par un worker RedisQueue et inversement.
+    L'attente bloquante (BLPOP) est annulable : l'annulation de la coroutine
+    ferme la connexion utilisée, au pire un jeton `ready` est perdu et la
+    tâche correspondante est servie au prochain dequeue.
+    """
+
+    def __init__(self, client: aioredis.Redis, **options):
+        # options : voir BaseRedisQueue
+        super().__init__(**options)
+        self.redis = client
+        self._register_scripts()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "AsyncRedisQueue":
+        """Crée la file sur le pool de connexions partagé de `url`."""
+        return cls(client=aioredis.Redis(connection_pool=get_connection_pool(url)), **kwargs)
+
+    async def _off_loop(self, func, *args):
+        """
+        Prépare un appel de script hors de la boucle d'événements si l'encodage
+        peut écrire un blob sur disque (payload au-delà de `blob_threshold`).
+        """
+        if self.codec.blob_store is None:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def _decode_tasks(self, raw_tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Décode data/result des tâches, hors de la boucle d'événements si l'un
+        d'eux est compressé (zlib) ou déporté en blob (lecture sur disque).
+        """
+        if any(str(task.get(field, "")).startswith((COMPRESSED_PREFIX, BLOB_PREFIX))
+               for task in raw_tasks for field in ("data", "result")):
+            return await asyncio.to_thread(lambda: [self._decode_task(task) for task in raw_tasks])
+        return [self._decode_task(task) for task in raw_tasks]
+
+    async def _to_tasks(self, raw_replies: List[List[str]]) -> List[Dict[str, Any]]:
+        """Réponses HGETALL de scripts Lua -> tâches décodées (voir _decode_tasks)."""
+        return await self._decode_tasks([dict(zip(raw[::2], raw[1::2])) for raw in raw_replies if raw])
+
+    async def enqueue(self, queue_name: str, data: Dict[str, Any], delay: Optional[int] = None,
+                      priority: str = DEFAULT_PRIORITY, client_id: Optional[Any] = None,
+                      dedup_key: Optional[str] = None) -> str:
+        """Enfile une tâche ; voir RedisQueue.enqueue."""
+        try:
+            proposed_id, keys, args = await self._off_loop(
+                self._add_task_call, queue_name, data, delay, priority, client_id, dedup_key)
+            task_id = await self._add_task_script(keys=keys, args=args)
+
+            if task_id != proposed_id:
+                logger.info(f"♻️ Duplicate of task {task_id} in {queue_name}, not enqueued")
+            elif delay:
+                logger.info(f"🕒 Task {task_id} enqueued to {queue_name} with {delay}s delay")
+            else:
+                logger.info(f"📩 Task {task_id} enqueued to {queue_name}")
+            return task_id
+        except Exception as e:
+            logger.error(f"❌ Error enqueueing task to {queue_name}: {e}")
+            raise
+
+    async def enqueue_many(self, queue_name: str, payloads: List[Dict[str, Any]], delay: Optional[int] = None,
+                           priority: str = DEFAULT_PRIORITY, client_id: Optional[Any] = None,
+                           dedup_keys: Optional[List[Optional[str]]] = None) -> List[str]:
+        """Enfile plusieurs tâches en un seul aller-retour (pipeline MULTI/EXEC)."""
+        if not payloads:
+            return []
+        if dedup_keys is not None and len(dedup_keys) != len(payloads):
+            raise ValueError("dedup_keys must match payloads")
+
+        def add_task_calls():
+            return [self._add_task_call(queue_name, data, delay, priority, client_id,
+                                        dedup_keys[i] if dedup_keys else None)
+                    for i, data in enumerate(payloads)]
+
+        try:
+            calls = await self._off_loop(add_task_calls)
+            async with self.redis.pipeline() as pipe:
+                for _, keys, args in calls:
+                    await self._add_task_script(keys=keys, args=args, client=pipe)
+                task_ids = await pipe.execute()
+
+            created = sum(1 for (proposed, _, _), task_id in zip(calls, task_ids) if proposed == task_id)
+            logger.info(f"📩 {created} tasks enqueued to {queue_name}"
+                        + (f" ({len(task_ids) - created} duplicates)" if created < len(task_ids) else ""))
+            return task_ids
+        except Exception as e:
+            logger.error(f"❌ Error enqueueing {len(payloads)} tasks to {queue_name}: {e}")
+            raise
+
+    async def promote_delayed(self, queue_name: str, limit: int = PROMOTE_BATCH_SIZE) -> Tuple[int, Optional[float]]:
+        moved, next_due = await self._promote_script(
+            keys=[f"delayed:{queue_name}"],
+            args=[time.time(), limit, queue_name, "task:"],
+        )
+        if moved:
+            logger.info(f"🔁 Moved {moved} delayed tasks to {queue_name}")
+        return moved, float(next_due) if next_due else None
+
+    async def _run_dequeue(self, queue_name: str, max_n: int, tokens_consumed: int = 0,
+                           task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        now = time.time()
+        keys, args = self._dequeue_call(queue_name, max_n, now, tokens_consumed, task_types)
+        tasks = await self._to_tasks(await self._dequeue_script(keys=keys, args=args))
+        self._observe_wait(queue_name, tasks, now)
+        return tasks
+
+    async def _claim(self, queue_name: str, max_n: int, wait: bool, timeout: float,
+                     task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        tasks = await self._run_dequeue(queue_name, max_n, task_types=task_types)
+        if tasks or not wait:
+            return tasks
+
+        # timeout=0 : attente illimitée, interrompue par l'annulation de la coroutine
+        if not await self.redis.blpop([f"ready:{queue_name}"], timeout):
+            return []
+        return await self._run_dequeue(queue_name, max_n, tokens_consumed=1, task_types=task_types)
+
+    async def dequeue(self, queue_name: str, wait: bool = True, timeout: float = 1) -> Optional[Dict[str, Any]]:
+        try:
+            tasks = await self._claim(queue_name, 1, wait, timeout)
+            if not tasks:
+                return None
+
+            logger.info(f"✅ Dequeued task {tasks[0]['id']} from {queue_name}")
+            return tasks[0]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error dequeuing task from {queue_name}: {e}")
+            return None
+
+    async def dequeue_any(self, queue_names: Iterable[str], timeout: float = 1) -> Optional[Dict[str, Any]]:
+        """Attend une tâche sur l'une des files ; voir RedisQueue.dequeue_any."""
+        names = list(queue_names)
+        if not names:
+            return None
+        self._rotation = (self._rotation + 1) % len(names)
+        names = names[self._rotation:] + names[:self._rotation]
+
+        try:
+            for name in names:
+                tasks = await self._run_dequeue(name, 1)
+                if tasks:
+                    break
+            else:
+                popped = await self.redis.blpop([f"ready:{name}" for name in names], timeout)
+                if not popped:
+                    return None
+                name = popped[0].split(":", 1)[1]
+                tasks = await self._run_dequeue(name, 1, tokens_consumed=1)
+                if not tasks:
+                    return None
+
+            logger.info(f"✅ Dequeued task {tasks[0]['id']} from {name}")
+            return tasks[0]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error dequeuing task from {names}: {e}")
+            return None
+
+    async def dequeue_many(self, queue_name: str, max_n: int, timeout: float = 1,
+                           task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Réclame atomiquement jusqu'à `max_n` tâches ; voir RedisQueue.dequeue_many."""
+        if max_n < 1:
+            return []
+
+        try:
+            tasks = await self._claim(queue_name, max_n, wait=timeout > 0, timeout=timeout, task_types=task_types)
+            if tasks:
+                logger.info(f"✅ Dequeued {len(tasks)} tasks from {queue_name}")
+            return tasks
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error dequeuing tasks from {queue_name}: {e}")
+            return []
+
+    async def complete_task(self, queue_name: str, task_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        try:
+            keys, args = await self._off_loop(self._complete_call, queue_name, task_id, result)
+            task = await self._complete_script(keys=keys, args=args)
+            if not task:
+                logger.warning(f"⚠️ Task {task_id} not found")
+                return False
+
+            logger.info(f"✅ Task {task_id} marked as completed")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error completing task {task_id}: {e}")
+            return False
+
+    async def complete_many(self, queue_name: str, results: Dict[str, Optional[Dict[str, Any]]]) -> int:
+        """Termine plusieurs tâches en un seul aller-retour ; voir RedisQueue.complete_many."""
+        if not results:
+            return 0
+
+        def complete_calls():
+            return [self._complete_call(queue_name, task_id, result) for task_id, result in results.items()]
+
+        try:
+            calls = await self._off_loop(complete_calls)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for keys, args in calls:
+                    await self._complete_script(keys=keys, args=args, client=pipe)
+                completed = sum(1 for task in await pipe.execute() if task)
+            logger.info(f"✅ {completed}/{len(results)} tasks marked as completed in {queue_name}")
+            return completed
+        except Exception as e:
+            logger.error(f"❌ Error completing {len(results)} tasks in {queue_name}: {e}")
+            return 0
+
+    async def fail_task(self, queue_name: str, task_id: str, error: str,
+                        retryable: bool = True, max_attempts: Optional[int] = None) -> bool:
+        """Nouvel essai différé ou dead-letter ; voir RedisQueue.fail_task."""
+        try:
+            tasks = await self._to_tasks([await self._fail_script(
+                keys=[f"task:{task_id}", f"processing:{queue_name}", f"leases:{queue_name}",
+                      f"delayed:{queue_name}", f"dead:{queue_name}"],
+                args=[task_id] + self._retry_args(error, retryable, max_attempts),
+            )])
+            if not tasks:
+                logger.warning(f"⚠️ Task {task_id} not found")
+                return False
+
+            self._log_failure(task_id, error, tasks[0])
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error failing task {task_id}: {e}")
+            return False
+
+    async def requeue_task(self, queue_name: str, task_id: str) -> bool:
+        try:
+            task = await self._requeue_script(
+                keys=[f"task:{task_id}", f"processing:{queue_name}", f"leases:{queue_name}"],
+                args=[task_id, datetime.utcnow().isoformat(), time.time(), queue_name, "task:"],
+            )
+            if not task:
+                logger.warning(f"⚠️ Task {task_id} not found")
+                return False
+
+            logger.info(f"🔄 Task {task_id} requeued to {queue_name}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error requeuing task {task_id}: {e}")
+            return False
+
+    async def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            task_data = await self.redis.hgetall(f"task:{task_id}")
+            if not task_data:
+                logger.warning(f"❓ No task found for ID {task_id}")
+                return None
+
+            return (await self._decode_tasks([task_data]))[0]
+        except Exception as e:
+            logger.error(f"❌ Error retrieving task status for {task_id}: {e}")
+            return None
+
+    async def heartbeat(self, queue_name: str, task_id: str, extend: Optional[float] = None) -> bool:
+        """Prolonge le bail d'une tâche en cours ; False si le bail a été perdu."""
+        try:
+            return bool(await self._heartbeat_script(
+                keys=[f"leases:{queue_name}", f"task:{task_id}"],
+                args=[task_id, time.time(), extend or self.visibility_timeout],
+            ))
+        except Exception as e:
+            logger.error(f"❌ Error extending lease of task {task_id}: {e}")
+            return False
+
+    @asynccontextmanager
+    async def keep_alive(self, queue_name: str, task_id: str,
+                         interval: Optional[float] = None) -> AsyncIterator[None]:
+        """Prolonge périodiquement le bail de la tâche pendant l'exécution du bloc."""
+        interval = interval or self.visibility_timeout / 3
+
+        async def beat():
+            while True:
+                await asyncio.sleep(interval)
+                if not await self.heartbeat(queue_name, task_id):
+                    logger.warning(f"⚠️ Lease lost for task {task_id}")
+                    return
+
+        beater = asyncio.create_task(beat())
+        try:
+            yield
+        finally:
+            beater.cancel()
+            try:
+                await beater
+            except asyncio.CancelledError:
+                pass
+
+    async def reap_expired(self, queue_name: str, limit: int = REAP_BATCH_SIZE) -> Tuple[int, int, Optional[float]]:
+        requeued, dead, next_expiry = await self._reap_script(
+            keys=[f"leases:{queue_name}", f"processing:{queue_name}", f"dead:{queue_name}"],
+            args=[time.time(), datetime.utcnow().isoformat(), limit, "task:", self.max_lease_expiries,
+                  queue_name, self._failed_ttl()],
+        )
+        if requeued:
+            LEASE_EXPIRED.labels(queue_name, "requeued").inc(requeued)
+            logger.warning(f"♻️ Requeued {requeued} tasks with expired lease in {queue_name}")
+        if dead:
+            LEASE_EXPIRED.labels(queue_name, "dead_lettered").inc(dead)
+            logger.error(f"☠️ Dead-lettered {dead} tasks with expired lease in {queue_name}")
+        return requeued, dead, float(next_expiry) if next_expiry else None
+
+    async def count_dead_letters(self, queue_name: str) -> int:
+        return await self.redis.llen(f"dead:{queue_name}")
+
+    async def list_dead_letters(self, queue_name: str, start: int = 0, count: int = 100) -> List[Dict[str, Any]]:
+        """Renvoie les tâches en dead-letter, des plus anciennes aux plus récentes."""
+        task_ids = await self.redis.lrange(f"dead:{queue_name}", -(start + count), -(start + 1))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for task_id in reversed(task_ids):
+                pipe.hgetall(f"task:{task_id}")
+            return await self._decode_tasks([raw for raw in await pipe.execute() if raw])
+
+    async def replay_dead_letters(self, queue_name: str, task_ids: Optional[List[str]] = None,
+                                  limit: int = 100) -> int:
+        replayed = await self._replay_dead_script(
+            keys=[f"dead:{queue_name}", f"delayed:{queue_name}"],
+            args=[time.time(), datetime.utcnow().isoformat(), "task:", limit] + list(task_ids or []),
+        )
+        logger.info(f"🔄 Replayed {replayed} dead-letter tasks in {queue_name}")
+        return replayed
+
+    async def purge_dead_letters(self, queue_name: str, task_ids: Optional[List[str]] = None,
+                                 limit: int = 100) -> int:
+        """Supprime définitivement des dead-letters ; par défaut les `limit` plus anciennes."""
+        purged = await self._purge_dead_script(
+            keys=[f"dead:{queue_name}"],
+            args=["task:", limit] + list(task_ids or []),
+        )
+        logger.info(f"🗑️ Purged {purged} dead-letter tasks from {queue_name}")
+        return purged
+
+    async def get_queue_stats(self, queue_name: str) -> Dict[str, Any]:
+        """Profondeur, attente et débit de la file ; voir RedisQueue.get_queue_stats."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._stats_counts(pipe, queue_name)
+            rings, counts = self._split_stats_counts(await pipe.execute())
+
+        subs = self._sub_queues(rings)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._stats_sub_queues(pipe, queue_name, subs)
+            sizes_and_oldest = await pipe.execute()
+            for task_id in sizes_and_oldest[1::2]:
+                pipe.hget(f"task:{task_id}", "enqueued_at")
+            enqueued = await pipe.execute()
+
+        return self._queue_stats(subs, sizes_and_oldest[::2], enqueued, *counts)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+
+class BlobStore(ABC):
+    """Stockage des payloads volumineux des tâches, référencés depuis Redis par leur clé."""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Écrit (ou remplace) le blob `key`"""
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Lit le blob `key` ; lève KeyError s'il n'existe pas"""
+        pass
+
+    @abstractmethod
+    def delete_task(self, task_id: str) -> None:
+        """Supprime tous les blobs d'une tâche"""
+        pass
+
+    @abstractmethod
+    def task_ids(self, older_than: float = 0) -> Iterator[str]:
+        """Identifiants des tâches ayant au moins un blob, sans écriture depuis `older_than` secondes"""
+        pass
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blobs sur disque, un répertoire par tâche : `{root}/{task_id}/{champ}`.
+
+    Le répertoire doit être partagé entre l'API (qui enfile) et les workers.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture atomique : un worker ne lit jamais un blob partiel
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def delete_task(self, task_id: str) -> None:
+        shutil.rmtree(self._path(task_id), ignore_errors=True)
+
+    def task_ids(self, older_than: float = 0) -> Iterator[str]:
+        # Le mtime du répertoire de la tâche change à chaque blob écrit
+        limit = time.time() - older_than
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.stat().st_mtime <= limit:
+                yield entry.name
@@ -0,0 +1,71 @@
+"""
+Encodage compact des champs `data` et `result` des tâches.
+
+- JSON compact sous `compress_threshold` octets (lisible avec redis-cli) ;
+- au-delà, ou si le payload contient des bytes : msgpack + zlib, en base64
+  préfixé `z:` (le client Redis décode les réponses en str) ;
+- au-delà de `blob_threshold` octets compressés : blob externe, seule la
+  référence `blob:{clé}` reste dans Redis.
+
+Les valeurs JSON existantes restent lisibles : aucun texte JSON ne commence
+par `z:` ou `blob:`.
+"""
+import base64
+import json
+import zlib
+from typing import Any, Optional
+
+import msgpack
+
+from app.queue.blob_store import BlobStore
+
+COMPRESSED_PREFIX = "z:"
+BLOB_PREFIX = "blob:"
+
+
+class PayloadCodec:
+    def __init__(self, compress_threshold: int = 1024, blob_threshold: Optional[int] = None,
+                 blob_store: Optional[BlobStore] = None):
+        self.compress_threshold = compress_threshold
+        self.blob_threshold = blob_threshold
+        self.blob_store = blob_store
+
+    def encode(self, value: Any, blob_key: Optional[str] = None) -> str:
+        """
+        Encode `value` pour un champ du hash de la tâche.
+
+        Args:
+            value: Payload à encoder
+            blob_key: Clé du blob si le payload doit être déporté (ex. "{task_id}/data")
+        """
+        try:
+            text = json.dumps(value, separators=(",", ":"))
+        except TypeError:
+            # bytes (images...) : seul msgpack sait les représenter
+            text = None
+        if text is not None and len(text) < self.compress_threshold:
+            return text
+
+        packed = zlib.compress(msgpack.packb(value, use_bin_type=True))
+        if self.blob_store and blob_key and self.blob_threshold and len(packed) >= self.blob_threshold:
+            self.blob_store.put(blob_key, packed)
+            return BLOB_PREFIX + blob_key
+
+        encoded = COMPRESSED_PREFIX + base64.b64encode(packed).decode("ascii")
+        if text is not None and len(text) <= len(encoded):
+            # Payload peu compressible : le JSON reste plus court
+            return text
+        return encoded
+
+    def decode(self, raw: str) -> Any:
+        if raw.startswith(COMPRESSED_PREFIX):
+            return self._unpack(base64.b64decode(raw[len(COMPRESSED_PREFIX):]))
+        if raw.startswith(BLOB_PREFIX):
+            if self.blob_store is None:
+                raise ValueError(f"No blob store configured to read {raw}")
+            return self._unpack(self.blob_store.get(raw[len(BLOB_PREFIX):]))
+        return json.loads(raw)
+
+    @staticmethod
+    def _unpack(packed: bytes) -> Any:
+        return msgpack.unpackb(zlib.decompress(packed), raw=False)
@@ -0,0 +1,30 @@
+"""
+Compaction des données de la file dans Redis.
+
+Usage :
+    python -m app.queue.compact [--batch-size 500]
+
+À lancer une fois après activation des TTL / du codec compact pour traiter les
+tâches existantes, puis périodiquement (cron) pour supprimer les blobs et les
+entrées de dead-letter dont la tâche a expiré.
+"""
+import argparse
+
+from loguru import logger
+
+from app.queue.factory import QueueFactory
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compacte les tâches stockées dans Redis")
+    parser.add_argument("--batch-size", type=int, default=500, help="Clés traitées par lot")
+    args = parser.parse_args()
+
+    queue = QueueFactory.create_queue()
+    stats = queue.compact(batch_size=args.batch_size)
+    for name, value in stats.items():
+        logger.info(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.config import get_settings
+from app.queue.async_redis_queue import AsyncRedisQueue
+from app.queue.blob_store import LocalBlobStore
+from app.queue.codec import PayloadCodec
+from app.queue.redis_queue import RedisQueue
+from app.queue.redis_stream_queue import RedisStreamQueue
+
+
+class QueueFactory:
+    """Factory pour créer le backend de file d'attente configuré"""
+
+    @staticmethod
+    def create_queue(backend: Optional[str] = None, redis_url: Optional[str] = None, **overrides) -> RedisQueue:
+        """
+        Crée la file d'attente selon QUEUE_BACKEND.
+
+        Args:
+            backend: "redis" (listes, défaut) ou "redis_streams" ; settings.QUEUE_BACKEND si absent
+            redis_url: URL Redis ; settings.REDIS_URL si absente
+            overrides: Options de RedisQueue prioritaires sur la configuration
+
+        Returns:
+            Une instance de RedisQueue ou de RedisStreamQueue
+        """
+        settings = get_settings()
+        backend = (backend or settings.QUEUE_BACKEND).lower()
+        redis_url = redis_url or settings.REDIS_URL
+
+        options = QueueFactory._queue_options(**overrides)
+
+        if backend == "redis":
+            return RedisQueue.from_url(redis_url, **options)
+        elif backend == "redis_streams":
+            logger.info("Using Redis Streams queue backend")
+            return RedisStreamQueue.from_url(
+                redis_url,
+                group=settings.QUEUE_STREAM_GROUP,
+                maxlen=settings.QUEUE_STREAM_MAXLEN or None,
+                **options,
+            )
+        else:
+            raise ValueError(f"Unsupported queue backend: {backend}")
+
+    @staticmethod
+    def _queue_options(**overrides) -> Dict[str, Any]:
+        """Options communes aux backends, issues de la configuration."""
+        settings = get_settings()
+        options = {
+            "visibility_timeout": settings.QUEUE_VISIBILITY_TIMEOUT,
+            "max_lease_expiries": settings.QUEUE_MAX_LEASE_EXPIRIES,
+            "max_attempts": settings.QUEUE_MAX_ATTEMPTS,
+            "retry_base_delay": settings.QUEUE_RETRY_BASE_DELAY,
+            "retry_max_delay": settings.QUEUE_RETRY_MAX_DELAY,
+            "completed_ttl": settings.QUEUE_COMPLETED_TTL or None,
+            "failed_ttl": settings.QUEUE_FAILED_TTL or None,
+            "dedup_ttl": settings.QUEUE_DEDUP_TTL,
+        }
+        if "codec" not in overrides:
+            # Sans seuil, pas de déport en blob : QUEUE_BLOB_DIR n'est pas créé
+            blob_store = LocalBlobStore(settings.QUEUE_BLOB_DIR) if settings.QUEUE_BLOB_THRESHOLD else None
+            options["codec"] = PayloadCodec(
+                compress_threshold=settings.QUEUE_COMPRESS_THRESHOLD,
+                blob_threshold=settings.QUEUE_BLOB_THRESHOLD,
+                blob_store=blob_store,
+            )
+        options.update(overrides)
+        return options
+
+    @staticmethod
+    def create_async_queue(redis_url: Optional[str] = None, **overrides) -> AsyncRedisQueue:
+        """
+        Crée une AsyncRedisQueue (backend listes) sur le pool partagé, pour
+        enfiler depuis les handlers FastAPI sans bloquer la boucle d'événements.
+        """
+        settings = get_settings()
+        if settings.QUEUE_BACKEND.lower() != "redis":
+            raise ValueError(f"Async queue is not available for backend: {settings.QUEUE_BACKEND}")
+        return AsyncRedisQueue.from_url(redis_url or settings.REDIS_URL, **QueueFactory._queue_options(**overrides))
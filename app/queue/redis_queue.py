@@ -1,17 +1,255 @@
 import redis
+import hashlib
 import json
 import uuid
 import time
-from typing import Dict, Any, Optional
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 
+from app.queue import scripts
+from app.queue.codec import BLOB_PREFIX, PayloadCodec
+from app.metrics.queue_metrics import LEASE_EXPIRED, QUEUE_WAIT
+
+# Nombre max de tâches différées promues par appel de process_delayed_tasks
+PROMOTE_BATCH_SIZE = 100
+# Nombre max de baux expirés traités par appel de reap_expired
+REAP_BATCH_SIZE = 100
+# Âge minimal (s) d'un blob orphelin avant suppression par compact : le blob est
+# écrit avant le hash de sa tâche, une tâche en cours d'enfilage n'a pas encore de hash
+BLOB_GRACE_PERIOD = 3600
+
+# Niveaux de priorité, servis strictement dans cet ordre
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+# Sous-file des tâches enfilées sans client
+DEFAULT_CLIENT = "_"
+
+
+class BaseRedisQueue:
+    """
+    Paramètres, scripts et encodage communs à RedisQueue et AsyncRedisQueue.
+
+    Ne fait aucun appel réseau : les sous-classes fournissent `self.redis`
+    (client synchrone ou redis.asyncio) puis appellent _register_scripts().
+    """
+
+    def __init__(self, visibility_timeout: float = 300, max_lease_expiries: int = 3,
+                 max_attempts: int = 3, retry_base_delay: float = 5, retry_max_delay: float = 600,
+                 completed_ttl: Optional[int] = None, failed_ttl: Optional[int] = None,
+                 codec: Optional[PayloadCodec] = None, dedup_ttl: int = 24 * 3600):
+        # Durée du bail d'une tâche réclamée, prolongeable par heartbeat()
+        self.visibility_timeout = visibility_timeout
+        # Au-delà, une tâche dont le bail expire part en dead-letter
+        self.max_lease_expiries = max_lease_expiries
+        # Nouveaux essais après fail_task : backoff exponentiel borné, avec jitter
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        # Durée de conservation (s) des tâches terminées ; None = indéfiniment
+        self.completed_ttl = completed_ttl
+        self.failed_ttl = failed_ttl
+        # Encodage des champs data/result (JSON, msgpack+zlib ou blob externe)
+        self.codec = codec or PayloadCodec()
+        # Durée pendant laquelle une clé d'idempotence renvoie la tâche d'origine
+        self.dedup_ttl = dedup_ttl
+        # Décalage de l'ordre des files pour dequeue_any
+        self._rotation = 0
+
+    def _register_scripts(self) -> None:
+        # Chargés une seule fois puis exécutés via EVALSHA
+        self._add_task_script = self.redis.register_script(scripts.ADD_TASK)
+        self._dequeue_script = self.redis.register_script(scripts.DEQUEUE)
+        self._promote_script = self.redis.register_script(scripts.PROMOTE_DELAYED)
+        self._complete_script = self.redis.register_script(scripts.COMPLETE)
+        self._fail_script = self.redis.register_script(scripts.FAIL)
+        self._requeue_script = self.redis.register_script(scripts.REQUEUE)
+        self._replay_dead_script = self.redis.register_script(scripts.REPLAY_DEAD)
+        self._purge_dead_script = self.redis.register_script(scripts.PURGE_DEAD)
+        self._heartbeat_script = self.redis.register_script(scripts.HEARTBEAT)
+        self._reap_script = self.redis.register_script(scripts.REAP_EXPIRED)
+        self._compact_script = self.redis.register_script(scripts.COMPACT_TASK)
+
+    def _to_task(self, raw: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        """Convertit la réponse HGETALL d'un script Lua en dictionnaire."""
+        if not raw:
+            return None
+        return self._decode_task(dict(zip(raw[::2], raw[1::2])))
+
+    def _decode_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        for field in ("data", "result"):
+            if field in task:
+                task[field] = self.codec.decode(task[field])
+        return task
+
+    def _completed_ttl(self) -> int:
+        return self.completed_ttl or 0
+
+    def _failed_ttl(self) -> int:
+        return self.failed_ttl or 0
+
+    @staticmethod
+    def make_dedup_key(data: Dict[str, Any], client_id: Optional[Any] = None) -> str:
+        """Clé d'idempotence par défaut : client + empreinte SHA-256 du contenu."""
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        client = DEFAULT_CLIENT if client_id is None else client_id
+        return f"{client}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+    def _ready_target(self, queue_name: str) -> Tuple[str, str, Any]:
+        """Clé, mode et longueur max de la file prête, pour le script ADD_TASK."""
+        return f"ready:{queue_name}", "list", ""
+
+    def _add_task_call(self, queue_name: str, data: Dict[str, Any], delay: Optional[int] = None,
+                       priority: str = DEFAULT_PRIORITY, client_id: Optional[Any] = None,
+                       dedup_key: Optional[str] = None) -> Tuple[str, List[str], List[Any]]:
+        """
+        Prépare l'appel du script ADD_TASK : (identifiant proposé, KEYS, ARGV).
+
+        Avec `dedup_key`, le script peut renvoyer l'identifiant d'une tâche existante.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority: {priority}")
+
+        task_id = str(uuid.uuid4())
+        created = datetime.utcnow().isoformat()
+        now = time.time()
+
+        fields = {
+            "id": task_id,
+            "data": self.codec.encode(data, f"{task_id}/data"),
+            "status": "pending",
+            "created_at": created,
+            "updated_at": created,
+            "queue": queue_name,
+            "priority": priority,
+            "client": DEFAULT_CLIENT if client_id is None else str(client_id),
+        }
+        if isinstance(data, dict) and data.get("type"):
+            # Copié hors de `data` (encodé) : DEQUEUE peut filtrer par type
+            fields["type"] = str(data["type"])
+        ready_key, ready_mode, maxlen = self._ready_target(queue_name)
+        args = [
+            queue_name, task_id, "task:", now, now + delay if delay else "",
+            f"dedup:{queue_name}:{dedup_key}" if dedup_key else "", self.dedup_ttl, ready_mode, maxlen,
+        ]
+        for field, value in fields.items():
+            args.extend([field, value])
+
+        return task_id, [f"task:{task_id}", f"delayed:{queue_name}", ready_key], args
+
+    def _dequeue_call(self, queue_name: str, max_n: int, now: float, tokens_consumed: int = 0,
+                      task_types: Optional[Iterable[str]] = None) -> Tuple[List[str], List[Any]]:
+        """KEYS et ARGV du script DEQUEUE."""
+        return (
+            [f"processing:{queue_name}", f"leases:{queue_name}", f"ready:{queue_name}"],
+            [datetime.utcnow().isoformat(), "task:", max_n, now, self.visibility_timeout,
+             queue_name, tokens_consumed, ",".join(task_types or ())],
+        )
+
+    def _complete_call(self, queue_name: str, task_id: str,
+                       result: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        """KEYS et ARGV du script COMPLETE."""
+        return (
+            [f"task:{task_id}", f"processing:{queue_name}", f"leases:{queue_name}", f"stats:{queue_name}"],
+            [task_id, datetime.utcnow().isoformat(),
+             self.codec.encode(result, f"{task_id}/result") if result else "",
+             self._completed_ttl(), time.time()],
+        )
+
+    @staticmethod
+    def _observe_wait(queue_name: str, tasks: List[Dict[str, Any]], now: float) -> None:
+        for task in tasks:
+            if "enqueued_at" in task:
+                QUEUE_WAIT.labels(queue_name, task.get("priority", DEFAULT_PRIORITY)).observe(
+                    max(now - float(task["enqueued_at"]), 0.0))
+
+    def _retry_args(self, error: str, retryable: bool, max_attempts: Optional[int]) -> List[Any]:
+        return [
+            datetime.utcnow().isoformat(), error, time.time(), "1" if retryable else "0",
+            max_attempts or self.max_attempts, self.retry_base_delay, self.retry_max_delay,
+            random.random(), self._failed_ttl(),
+        ]
+
+    @staticmethod
+    def _stats_counts(pipe, queue_name: str) -> None:
+        """Premier aller-retour de get_queue_stats : anneaux de clients et compteurs."""
+        for priority in PRIORITIES:
+            pipe.lrange(f"clients:{queue_name}:{priority}", 0, -1)
+        pipe.llen(f"queue:{queue_name}")
+        pipe.llen(f"processing:{queue_name}")
+        pipe.zcard(f"delayed:{queue_name}")
+        pipe.llen(f"dead:{queue_name}")
+        pipe.hmget(f"stats:{queue_name}", "completed", "busy_seconds")
+
+    @staticmethod
+    def _split_stats_counts(results: List[Any]) -> Tuple[List[List[str]], List[Any]]:
+        return results[:len(PRIORITIES)], results[len(PRIORITIES):]
+
+    @staticmethod
+    def _sub_queues(rings: List[List[str]]) -> List[Tuple[str, str]]:
+        return [(priority, client) for priority, ring in zip(PRIORITIES, rings) for client in ring]
+
+    @staticmethod
+    def _stats_sub_queues(pipe, queue_name: str, subs: List[Tuple[str, str]]) -> None:
+        """Deuxième aller-retour : taille et plus ancienne tâche de chaque sous-file."""
+        for priority, client in subs:
+            sub = f"queue:{queue_name}:{priority}:{client}"
+            pipe.llen(sub)
+            pipe.lindex(sub, -1)
+
+    @staticmethod
+    def _queue_stats(subs: List[Tuple[str, str]], sizes: List[int], enqueued: List[Optional[str]],
+                     legacy: int, processing: int, delayed: int, dead: int,
+                     throughput: List[Optional[str]]) -> Dict[str, Any]:
+        """Assemble le résultat de get_queue_stats à partir des trois allers-retours."""
+        now = time.time()
+        clients: Dict[str, Dict[str, float]] = {}
+        for (priority, client), size, enqueued_at in zip(subs, sizes, enqueued):
+            stats = clients.setdefault(client, {"depth": 0, "oldest_wait": 0.0})
+            stats["depth"] += size
+            if enqueued_at:
+                stats["oldest_wait"] = max(stats["oldest_wait"], now - float(enqueued_at))
+
+        completed, busy = throughput
+        return {
+            "depth": legacy + sum(c["depth"] for c in clients.values()),
+            "processing": processing,
+            "delayed": delayed,
+            "dead": dead,
+            "oldest_wait": max((c["oldest_wait"] for c in clients.values()), default=0.0),
+            "clients": clients,
+            "completed": int(completed or 0),
+            "busy_seconds": float(busy or 0.0),
+        }
+
+    @staticmethod
+    def _log_failure(task_id: str, error: str, task: Dict[str, Any]) -> None:
+        if task["status"] == "retrying":
+            delay = float(task["retry_at"]) - time.time()
+            logger.warning(f"🔁 Task {task_id} failed (attempt {task.get('attempts', '?')}), "
+                           f"retrying in {delay:.0f}s: {error}")
+        else:
+            logger.error(f"❌ Task {task_id} failed, moved to dead-letter queue: {error}")
 
-class RedisQueue:
+
+class RedisQueue(BaseRedisQueue):
     """Gestionnaire de file d'attente Redis pour traitement asynchrone des tâches"""
 
     def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
-                 password: Optional[str] = None, ssl: bool = False):
+                 password: Optional[str] = None, ssl: bool = False,
+                 client: Optional[redis.Redis] = None, **options):
+        # options : voir BaseRedisQueue (bail, essais, TTL, codec, déduplication)
+        super().__init__(**options)
+
+        if client is not None:
+            # Client déjà configuré (tests, fakeredis, pool partagé)
+            self.redis = client
+            self._register_scripts()
+            return
+
         connection_params = {
             "host": host,
             "port": port,
@@ -34,26 +272,57 @@ class RedisQueue:
             logger.error(f"❌ Failed to connect to Redis: {e}")
             raise
 
-    def enqueue(self, queue_name: str, data: Dict[str, Any], delay: Optional[int] = None) -> str:
-        task_id = str(uuid.uuid4())
-        created = datetime.utcnow().isoformat()
+        self._register_scripts()
 
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisQueue":
+        """Crée la file à partir d'une URL Redis (ex. settings.REDIS_URL)."""
+        client = redis.Redis.from_url(url, decode_responses=True)
         try:
-            task_key = f"task:{task_id}"
-            self.redis.hset(task_key, mapping={
-                "id": task_id,
-                "data": json.dumps(data),
-                "status": "pending",
-                "created_at": created,
-                "updated_at": created,
-                "queue": queue_name
-            })
-
-            if delay:
-                self.redis.zadd(f"delayed:{queue_name}", {task_id: time.time() + delay})
+            client.ping()
+            logger.info(f"✅ Connected to Redis at {url.rsplit('@', 1)[-1]}")
+        except redis.exceptions.ConnectionError as e:
+            logger.error(f"❌ Failed to connect to Redis: {e}")
+            raise
+        return cls(client=client, **kwargs)
+
+    def _add_task(self, pipe, queue_name: str, data: Dict[str, Any], delay: Optional[int] = None,
+                  priority: str = DEFAULT_PRIORITY, client_id: Optional[Any] = None,
+                  dedup_key: Optional[str] = None) -> str:
+        """Ajoute au pipeline la création d'une tâche et renvoie l'identifiant proposé."""
+        task_id, keys, args = self._add_task_call(queue_name, data, delay, priority, client_id, dedup_key)
+        self._add_task_script(keys=keys, args=args, client=pipe)
+        return task_id
+
+    def enqueue(self, queue_name: str, data: Dict[str, Any], delay: Optional[int] = None,
+                priority: str = DEFAULT_PRIORITY, client_id: Optional[Any] = None,
+                dedup_key: Optional[str] = None) -> str:
+        """
+        Enfile une tâche.
+
+        Args:
+            queue_name: Nom de la file
+            data: Données de la tâche
+            delay: Délai optionnel avant exécution (secondes)
+            priority: "high" (uploads interactifs), "normal" ou "low" (imports en masse)
+            client_id: Client propriétaire ; les clients d'une même priorité sont servis équitablement
+            dedup_key: Clé d'idempotence (ex. make_dedup_key(data, client_id)) ; tant que la
+                tâche d'origine est en attente, en cours ou récemment terminée (`dedup_ttl`),
+                son identifiant est renvoyé au lieu d'en créer une nouvelle
+
+        Returns:
+            L'identifiant de la tâche (existante en cas de doublon)
+        """
+        try:
+            with self.redis.pipeline() as pipe:
+                proposed_id = self._add_task(pipe, queue_name, data, delay, priority, client_id, dedup_key)
+                task_id = pipe.execute()[-1]
+
+            if task_id != proposed_id:
+                logger.info(f"♻️ Duplicate of task {task_id} in {queue_name}, not enqueued")
+            elif delay:
                 logger.info(f"🕒 Task {task_id} enqueued to {queue_name} with {delay}s delay")
             else:
-                self.redis.lpush(f"queue:{queue_name}", task_id)
                 logger.info(f"📩 Task {task_id} enqueued to {queue_name}")
 
             return task_id
@@ -61,113 +330,260 @@ class RedisQueue:
             logger.error(f"❌ Error enqueueing task to {queue_name}: {e}")
             raise
 
-    def process_delayed_tasks(self, queue_name: str) -> int:
-        delayed_key = f"delayed:{queue_name}"
-        now = time.time()
+    def enqueue_many(self, queue_name: str, payloads: List[Dict[str, Any]], delay: Optional[int] = None,
+                     priority: str = DEFAULT_PRIORITY, client_id: Optional[Any] = None,
+                     dedup_keys: Optional[List[Optional[str]]] = None) -> List[str]:
+        """
+        Enfile plusieurs tâches en un seul aller-retour (pipeline MULTI/EXEC).
+
+        Args:
+            queue_name: Nom de la file
+            payloads: Données de chaque tâche
+            delay: Délai optionnel (secondes) appliqué à toutes les tâches
+            priority: Priorité de toutes les tâches
+            client_id: Client propriétaire de toutes les tâches
+            dedup_keys: Clé d'idempotence de chaque tâche (None = pas de déduplication)
+
+        Returns:
+            Les identifiants des tâches, dans l'ordre des payloads
+        """
+        if not payloads:
+            return []
+        if dedup_keys is not None and len(dedup_keys) != len(payloads):
+            raise ValueError("dedup_keys must match payloads")
 
         try:
-            task_ids = self.redis.zrangebyscore(delayed_key, 0, now)
-            if not task_ids:
-                return 0
-
             with self.redis.pipeline() as pipe:
-                for task_id in task_ids:
-                    pipe.lpush(f"queue:{queue_name}", task_id)
-                    pipe.zrem(delayed_key, task_id)
-                pipe.execute()
+                proposed = [self._add_task(pipe, queue_name, data, delay, priority, client_id,
+                                           dedup_keys[i] if dedup_keys else None)
+                            for i, data in enumerate(payloads)]
+                task_ids = pipe.execute()
+
+            created = sum(1 for a, b in zip(proposed, task_ids) if a == b)
+            logger.info(f"📩 {created} tasks enqueued to {queue_name}"
+                        + (f" ({len(task_ids) - created} duplicates)" if created < len(task_ids) else ""))
+            return task_ids
+        except Exception as e:
+            logger.error(f"❌ Error enqueueing {len(payloads)} tasks to {queue_name}: {e}")
+            raise
 
-            logger.info(f"🔁 Moved {len(task_ids)} delayed tasks to {queue_name}")
-            return len(task_ids)
+    def promote_delayed(self, queue_name: str, limit: int = PROMOTE_BATCH_SIZE) -> Tuple[int, Optional[float]]:
+        """
+        Déplace atomiquement au plus `limit` tâches différées échues vers la file.
+
+        Returns:
+            Le nombre de tâches déplacées et l'échéance (epoch) de la prochaine
+            tâche différée, ou None s'il n'y en a plus.
+        """
+        moved, next_due = self._promote_script(
+            keys=[f"delayed:{queue_name}"],
+            args=[time.time(), limit, queue_name, "task:"],
+        )
+        if moved:
+            logger.info(f"🔁 Moved {moved} delayed tasks to {queue_name}")
+        return moved, float(next_due) if next_due else None
+
+    def process_delayed_tasks(self, queue_name: str, limit: int = PROMOTE_BATCH_SIZE) -> int:
+        try:
+            moved, _ = self.promote_delayed(queue_name, limit)
+            return moved
         except Exception as e:
             logger.error(f"❌ Error processing delayed tasks for {queue_name}: {e}")
             return 0
 
-    def dequeue(self, queue_name: str, wait: bool = True, timeout: int = 1) -> Optional[Dict[str, Any]]:
-        queue_key = f"queue:{queue_name}"
-        processing_key = f"processing:{queue_name}"
+    def _run_dequeue(self, queue_name: str, max_n: int, tokens_consumed: int = 0,
+                     task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        # Choix de la sous-file (priorité, client) + HSET + HGETALL en un seul appel ;
+        # les tâches différées sont promues à part par QueueScheduler
+        now = time.time()
+        keys, args = self._dequeue_call(queue_name, max_n, now, tokens_consumed, task_types)
+        tasks = [self._to_task(raw) for raw in self._dequeue_script(keys=keys, args=args)]
+        self._observe_wait(queue_name, tasks, now)
+        return tasks
+
+    def _claim(self, queue_name: str, max_n: int, wait: bool, timeout: int,
+               task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        tasks = self._run_dequeue(queue_name, max_n, task_types=task_types)
+        if tasks or not wait:
+            return tasks
+
+        # Un jeton par tâche prête : BLPOP réveille le worker dès qu'une tâche arrive
+        if not self.redis.blpop([f"ready:{queue_name}"], timeout):
+            return []
+        return self._run_dequeue(queue_name, max_n, tokens_consumed=1, task_types=task_types)
 
+    def dequeue(self, queue_name: str, wait: bool = True, timeout: int = 1) -> Optional[Dict[str, Any]]:
         try:
-            self.process_delayed_tasks(queue_name)
-
-            result = (
-                self.redis.brpoplpush(queue_key, processing_key, timeout)
-                if wait else self.redis.rpoplpush(queue_key, processing_key)
-            )
-
-            if not result:
+            tasks = self._claim(queue_name, 1, wait, timeout)
+            if not tasks:
                 return None
 
-            task_id = result
-            task_key = f"task:{task_id}"
-            task_data = self.redis.hgetall(task_key)
+            task = tasks[0]
+            logger.info(f"✅ Dequeued task {task['id']} from {queue_name}")
+            return task
+        except Exception as e:
+            logger.error(f"❌ Error dequeuing task from {queue_name}: {e}")
+            return None
 
-            if not task_data:
-                logger.warning(f"⚠️ Task {task_id} not found")
-                return None
+    def dequeue_any(self, queue_names: Iterable[str], timeout: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Attend jusqu'à `timeout` secondes une tâche sur l'une des files.
 
-            self.redis.hset(task_key, mapping={
-                "status": "processing",
-                "updated_at": datetime.utcnow().isoformat()
-            })
+        Les files sont essayées dans un ordre qui tourne à chaque appel
+        (équité entre files), puis un seul BLPOP attend sur les jetons `ready`
+        de toutes les files : le worker est réveillé dès qu'une tâche arrive.
+        """
+        names = list(queue_names)
+        if not names:
+            return None
+        self._rotation = (self._rotation + 1) % len(names)
+        names = names[self._rotation:] + names[:self._rotation]
 
-            task_data["data"] = json.loads(task_data["data"])
-            logger.info(f"✅ Dequeued task {task_id} from {queue_name}")
-            return task_data
+        try:
+            for name in names:
+                tasks = self._run_dequeue(name, 1)
+                if tasks:
+                    break
+            else:
+                popped = self.redis.blpop([f"ready:{name}" for name in names], timeout)
+                if not popped:
+                    return None
+                name = popped[0].split(":", 1)[1]
+                tasks = self._run_dequeue(name, 1, tokens_consumed=1)
+                if not tasks:
+                    return None
+
+            logger.info(f"✅ Dequeued task {tasks[0]['id']} from {name}")
+            return tasks[0]
         except Exception as e:
-            logger.error(f"❌ Error dequeuing task from {queue_name}: {e}")
+            logger.error(f"❌ Error dequeuing task from {names}: {e}")
             return None
 
-    def complete_task(self, queue_name: str, task_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
-        processing_key = f"processing:{queue_name}"
-        task_key = f"task:{task_id}"
+    def dequeue_many(self, queue_name: str, max_n: int, timeout: int = 1,
+                     task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Réclame atomiquement jusqu'à `max_n` tâches.
 
+        Si la file est vide, attend au plus `timeout` secondes la première tâche
+        (timeout=0 : pas d'attente), puis récupère celles déjà disponibles.
+        Avec `task_types`, seules les tâches de ces types (`data["type"]`) sont
+        réclamées ; les autres restent prêtes, à leur place dans la file.
+        """
+        if max_n < 1:
+            return []
+
+        try:
+            tasks = self._claim(queue_name, max_n, wait=timeout > 0, timeout=timeout, task_types=task_types)
+            if tasks:
+                logger.info(f"✅ Dequeued {len(tasks)} tasks from {queue_name}")
+            return tasks
+        except Exception as e:
+            logger.error(f"❌ Error dequeuing tasks from {queue_name}: {e}")
+            return []
+
+    def complete_task(self, queue_name: str, task_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
         try:
-            if not self.redis.exists(task_key):
+            keys, args = self._complete_call(queue_name, task_id, result)
+            task = self._complete_script(keys=keys, args=args)
+            if not task:
                 logger.warning(f"⚠️ Task {task_id} not found")
                 return False
 
-            with self.redis.pipeline() as pipe:
-                pipe.hset(task_key, mapping={
-                    "status": "completed",
-                    "updated_at": datetime.utcnow().isoformat()
-                })
-
-                if result:
-                    pipe.hset(task_key, "result", json.dumps(result))
-
-                pipe.lrem(processing_key, 1, task_id)
-                pipe.execute()
-
             logger.info(f"✅ Task {task_id} marked as completed")
             return True
         except Exception as e:
             logger.error(f"❌ Error completing task {task_id}: {e}")
             return False
 
-    def fail_task(self, queue_name: str, task_id: str, error: str) -> bool:
-        processing_key = f"processing:{queue_name}"
-        task_key = f"task:{task_id}"
+    def complete_many(self, queue_name: str, results: Dict[str, Optional[Dict[str, Any]]]) -> int:
+        """
+        Termine plusieurs tâches en un seul aller-retour (pipeline).
+
+        Args:
+            results: Résultat de chaque tâche, par identifiant
+
+        Returns:
+            Nombre de tâches effectivement terminées
+        """
+        if not results:
+            return 0
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for task_id, result in results.items():
+                keys, args = self._complete_call(queue_name, task_id, result)
+                self._complete_script(keys=keys, args=args, client=pipe)
+            completed = sum(1 for task in pipe.execute() if task)
+            logger.info(f"✅ {completed}/{len(results)} tasks marked as completed in {queue_name}")
+            return completed
+        except Exception as e:
+            logger.error(f"❌ Error completing {len(results)} tasks in {queue_name}: {e}")
+            return 0
+
+    def fail_task(self, queue_name: str, task_id: str, error: str,
+                  retryable: bool = True, max_attempts: Optional[int] = None) -> bool:
+        """
+        Marque une tâche en échec.
 
+        Tant que le nombre d'essais reste sous `max_attempts`, la tâche est
+        reprogrammée dans `delayed:{queue}` avec un backoff exponentiel ; sinon
+        (ou si `retryable` est False) elle part dans la dead-letter queue `dead:{queue}`.
+        """
         try:
-            if not self.redis.exists(task_key):
+            task = self._to_task(self._fail_script(
+                keys=[f"task:{task_id}", f"processing:{queue_name}", f"leases:{queue_name}",
+                      f"delayed:{queue_name}", f"dead:{queue_name}"],
+                args=[task_id] + self._retry_args(error, retryable, max_attempts),
+            ))
+            if not task:
                 logger.warning(f"⚠️ Task {task_id} not found")
                 return False
 
-            with self.redis.pipeline() as pipe:
-                pipe.hset(task_key, mapping={
-                    "status": "failed",
-                    "updated_at": datetime.utcnow().isoformat(),
-                    "error": error
-                })
-                pipe.lrem(processing_key, 1, task_id)
-                pipe.execute()
-
-            logger.error(f"❌ Task {task_id} failed: {error}")
+            self._log_failure(task_id, error, task)
             return True
         except Exception as e:
             logger.error(f"❌ Error failing task {task_id}: {e}")
             return False
 
+    def count_dead_letters(self, queue_name: str) -> int:
+        return self.redis.llen(f"dead:{queue_name}")
+
+    def list_dead_letters(self, queue_name: str, start: int = 0, count: int = 100) -> List[Dict[str, Any]]:
+        """Renvoie les tâches en dead-letter, des plus anciennes aux plus récentes."""
+        task_ids = self.redis.lrange(f"dead:{queue_name}", -(start + count), -(start + 1))
+        with self.redis.pipeline(transaction=False) as pipe:
+            for task_id in reversed(task_ids):
+                pipe.hgetall(f"task:{task_id}")
+            return [self._decode_task(raw) for raw in pipe.execute() if raw]
+
+    def replay_dead_letters(self, queue_name: str, task_ids: Optional[List[str]] = None,
+                            limit: int = 100) -> int:
+        """
+        Remet en file des dead-letters (compteurs d'essais remis à zéro).
+
+        Args:
+            queue_name: Nom de la file
+            task_ids: Tâches à rejouer ; par défaut les `limit` plus anciennes
+
+        Returns:
+            Le nombre de tâches rejouées
+        """
+        replayed = self._replay_dead_script(
+            keys=[f"dead:{queue_name}", f"delayed:{queue_name}"],
+            args=[time.time(), datetime.utcnow().isoformat(), "task:", limit] + list(task_ids or []),
+        )
+        logger.info(f"🔄 Replayed {replayed} dead-letter tasks in {queue_name}")
+        return replayed
+
+    def purge_dead_letters(self, queue_name: str, task_ids: Optional[List[str]] = None,
+                           limit: int = 100) -> int:
+        """Supprime définitivement des dead-letters ; par défaut les `limit` plus anciennes."""
+        purged = self._purge_dead_script(
+            keys=[f"dead:{queue_name}"],
+            args=["task:", limit] + list(task_ids or []),
+        )
+        logger.info(f"🗑️ Purged {purged} dead-letter tasks from {queue_name}")
+        return purged
+
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         task_key = f"task:{task_id}"
         try:
@@ -176,37 +592,187 @@ class RedisQueue:
                 logger.warning(f"❓ No task found for ID {task_id}")
                 return None
 
-            if "data" in task_data:
-                task_data["data"] = json.loads(task_data["data"])
-            if "result" in task_data:
-                task_data["result"] = json.loads(task_data["result"])
-
-            return task_data
+            return self._decode_task(task_data)
         except Exception as e:
             logger.error(f"❌ Error retrieving task status for {task_id}: {e}")
             return None
 
     def requeue_task(self, queue_name: str, task_id: str) -> bool:
-        task_key = f"task:{task_id}"
-        processing_key = f"processing:{queue_name}"
-        queue_key = f"queue:{queue_name}"
-
         try:
-            if not self.redis.exists(task_key):
+            task = self._requeue_script(
+                keys=[f"task:{task_id}", f"processing:{queue_name}", f"leases:{queue_name}"],
+                args=[task_id, datetime.utcnow().isoformat(), time.time(), queue_name, "task:"],
+            )
+            if not task:
                 logger.warning(f"⚠️ Task {task_id} not found")
                 return False
 
-            with self.redis.pipeline() as pipe:
-                pipe.lrem(processing_key, 1, task_id)
-                pipe.hset(task_key, mapping={
-                    "status": "pending",
-                    "updated_at": datetime.utcnow().isoformat()
-                })
-                pipe.lpush(queue_key, task_id)
-                pipe.execute()
-
             logger.info(f"🔄 Task {task_id} requeued to {queue_name}")
             return True
         except Exception as e:
             logger.error(f"❌ Error requeuing task {task_id}: {e}")
             return False
+
+    def heartbeat(self, queue_name: str, task_id: str, extend: Optional[float] = None) -> bool:
+        """
+        Prolonge le bail d'une tâche en cours (OCR long, etc.).
+
+        Args:
+            queue_name: Nom de la file
+            task_id: Identifiant de la tâche
+            extend: Nouvelle durée du bail en secondes (défaut : visibility_timeout)
+
+        Returns:
+            False si le bail a été perdu (tâche reprise par le reaper ou terminée)
+        """
+        try:
+            return bool(self._heartbeat_script(
+                keys=[f"leases:{queue_name}", f"task:{task_id}"],
+                args=[task_id, time.time(), extend or self.visibility_timeout],
+            ))
+        except Exception as e:
+            logger.error(f"❌ Error extending lease of task {task_id}: {e}")
+            return False
+
+    @contextmanager
+    def keep_alive(self, queue_name: str, task_id: str, interval: Optional[float] = None) -> Iterator[None]:
+        """Prolonge périodiquement le bail de la tâche pendant l'exécution du bloc."""
+        interval = interval or self.visibility_timeout / 3
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                if not self.heartbeat(queue_name, task_id):
+                    logger.warning(f"⚠️ Lease lost for task {task_id}")
+                    return
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{task_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def reap_expired(self, queue_name: str, limit: int = REAP_BATCH_SIZE) -> Tuple[int, int, Optional[float]]:
+        """
+        Reprend les tâches dont le bail a expiré : remise en file, ou dead-letter
+        (`dead:{queue}`) après `max_lease_expiries` expirations.
+
+        Returns:
+            (remises en file, dead-letters, échéance du prochain bail ou None)
+        """
+        requeued, dead, next_expiry = self._reap_script(
+            keys=[f"leases:{queue_name}", f"processing:{queue_name}", f"dead:{queue_name}"],
+            args=[time.time(), datetime.utcnow().isoformat(), limit, "task:", self.max_lease_expiries,
+                  queue_name, self._failed_ttl()],
+        )
+        if requeued:
+            LEASE_EXPIRED.labels(queue_name, "requeued").inc(requeued)
+            logger.warning(f"♻️ Requeued {requeued} tasks with expired lease in {queue_name}")
+        if dead:
+            LEASE_EXPIRED.labels(queue_name, "dead_lettered").inc(dead)
+            logger.error(f"☠️ Dead-lettered {dead} tasks with expired lease in {queue_name}")
+        return requeued, dead, float(next_expiry) if next_expiry else None
+
+    def set_client_weight(self, queue_name: str, client_id: Any, weight: int) -> None:
+        """Nombre de tâches servies au client à chaque tour du round-robin (défaut 1)."""
+        if weight < 1:
+            raise ValueError("weight must be >= 1")
+        self.redis.hset(f"weights:{queue_name}", str(client_id), weight)
+
+    def get_queue_stats(self, queue_name: str) -> Dict[str, Any]:
+        """
+        Profondeur de la file et attente de la plus ancienne tâche prête,
+        au total et par client, plus les compteurs cumulés de débit
+        (`completed`, `busy_seconds`).
+        """
+        with self.redis.pipeline(transaction=False) as pipe:
+            self._stats_counts(pipe, queue_name)
+            rings, counts = self._split_stats_counts(pipe.execute())
+
+        subs = self._sub_queues(rings)
+        with self.redis.pipeline(transaction=False) as pipe:
+            self._stats_sub_queues(pipe, queue_name, subs)
+            sizes_and_oldest = pipe.execute()
+            for task_id in sizes_and_oldest[1::2]:
+                pipe.hget(f"task:{task_id}", "enqueued_at")
+            enqueued = pipe.execute()
+
+        return self._queue_stats(subs, sizes_and_oldest[::2], enqueued, *counts)
+
+    def compact(self, batch_size: int = 500, blob_grace: float = BLOB_GRACE_PERIOD) -> Dict[str, int]:
+        """
+        Compacte les données déjà stockées :
+
+        - réencode data/result des tâches terminées avec le codec courant
+          (compression, déport en blob) et leur pose le TTL configuré ;
+        - retire des dead-letter queues les tâches dont le hash a expiré ;
+        - supprime les blobs dont la tâche n'existe plus, écrits depuis plus
+          de `blob_grace` secondes.
+
+        Les tâches en cours ne sont pas modifiées.
+
+        Returns:
+            Compteurs par opération
+        """
+        stats = {"scanned": 0, "compacted": 0, "dead_pruned": 0, "blobs_pruned": 0}
+        ttls = {"completed": self._completed_ttl(), "failed": self._failed_ttl()}
+
+        task_keys: List[str] = []
+        for key in self.redis.scan_iter(match="task:*", count=batch_size, _type="hash"):
+            task_keys.append(key)
+            if len(task_keys) >= batch_size:
+                self._compact_tasks(task_keys, ttls, stats)
+                task_keys = []
+        if task_keys:
+            self._compact_tasks(task_keys, ttls, stats)
+
+        for dead_key in self.redis.scan_iter(match="dead:*", count=batch_size, _type="list"):
+            task_ids = self.redis.lrange(dead_key, 0, -1)
+            missing = [t for t, exists in zip(task_ids, self._exists_many(task_ids)) if not exists]
+            if missing:
+                with self.redis.pipeline(transaction=False) as pipe:
+                    for task_id in missing:
+                        pipe.lrem(dead_key, 0, task_id)
+                    pipe.execute()
+                stats["dead_pruned"] += len(missing)
+
+        blob_store = self.codec.blob_store
+        if blob_store is not None:
+            task_ids = list(blob_store.task_ids(older_than=blob_grace))
+            for i in range(0, len(task_ids), batch_size):
+                batch = task_ids[i:i + batch_size]
+                for task_id, exists in zip(batch, self._exists_many(batch)):
+                    if not exists:
+                        blob_store.delete_task(task_id)
+                        stats["blobs_pruned"] += 1
+
+        logger.info(f"🧹 Queue compaction done: {stats}")
+        return stats
+
+    def _exists_many(self, task_ids: List[str]) -> List[bool]:
+        with self.redis.pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                pipe.exists(f"task:{task_id}")
+            return [bool(n) for n in pipe.execute()]
+
+    def _compact_tasks(self, task_keys: List[str], ttls: Dict[str, int], stats: Dict[str, int]) -> None:
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key in task_keys:
+                pipe.hmget(key, "id", "status", "data", "result")
+            rows = pipe.execute()
+
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key, (task_id, status, data, result) in zip(task_keys, rows):
+                stats["scanned"] += 1
+                if status not in ttls or not task_id:
+                    continue
+                fields = []
+                for field, raw in (("data", data), ("result", result)):
+                    if raw and not raw.startswith(BLOB_PREFIX):
+                        encoded = self.codec.encode(self.codec.decode(raw), f"{task_id}/{field}")
+                        if encoded != raw:
+                            fields.extend([field, encoded])
+                self._compact_script(keys=[key], args=[status, ttls[status]] + fields, client=pipe)
+            stats["compacted"] += sum(pipe.execute())
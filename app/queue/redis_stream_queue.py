@@ -0,0 +1,372 @@
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+from loguru import logger
+
+from app.queue import scripts
+from app.queue.redis_queue import RedisQueue, PROMOTE_BATCH_SIZE, REAP_BATCH_SIZE
+from app.metrics.queue_metrics import LEASE_EXPIRED
+
+
+class RedisStreamQueue(RedisQueue):
+    """
+    File d'attente sur Redis Streams avec groupes de consommateurs.
+
+    Même interface que RedisQueue ; les hash `task:{id}` et les files différées
+    `delayed:{queue}` sont identiques, seule la file prête change :
+    `stream:{queue}` lu par XREADGROUP au lieu de `queue:{queue}`/`processing:{queue}`.
+
+    - chaque consommateur a sa propre liste de messages en attente (PEL) ;
+    - les messages inactifs depuis plus de `visibility_timeout` secondes (worker
+      mort) sont repris automatiquement par XAUTOCLAIM ; heartbeat() remet à
+      zéro ce délai via XCLAIM ;
+    - les messages acquittés sont supprimés (XDEL) et `maxlen` borne la taille
+      du stream (MAXLEN ~). La limite doit rester supérieure au backlog maximal :
+      au-delà, les plus anciens messages non lus sont supprimés.
+    """
+
+    def __init__(self, *args, group: str = "workers", consumer: Optional[str] = None,
+                 reclaim_interval: float = 5, maxlen: Optional[int] = None, **kwargs):
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        self.reclaim_interval = reclaim_interval
+        self.maxlen = maxlen
+
+        self._groups_ready = set()
+        self._last_reclaim: Dict[str, float] = {}
+
+        super().__init__(*args, **kwargs)
+
+    def _register_scripts(self) -> None:
+        super()._register_scripts()
+        self._stream_claim_script = self.redis.register_script(scripts.STREAM_CLAIM)
+        self._stream_finish_script = self.redis.register_script(scripts.STREAM_FINISH)
+        self._stream_fail_script = self.redis.register_script(scripts.STREAM_FAIL)
+        self._stream_requeue_script = self.redis.register_script(scripts.STREAM_REQUEUE)
+        self._stream_release_script = self.redis.register_script(scripts.STREAM_RELEASE)
+        self._stream_promote_script = self.redis.register_script(scripts.STREAM_PROMOTE_DELAYED)
+
+    @staticmethod
+    def _stream_key(queue_name: str) -> str:
+        return f"stream:{queue_name}"
+
+    def _ensure_group(self, queue_name: str) -> None:
+        if queue_name in self._groups_ready:
+            return
+        try:
+            self.redis.xgroup_create(self._stream_key(queue_name), self.group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups_ready.add(queue_name)
+
+    def _ready_target(self, queue_name: str) -> Tuple[str, str, Any]:
+        return self._stream_key(queue_name), "stream", self.maxlen or ""
+
+    def promote_delayed(self, queue_name: str, limit: int = PROMOTE_BATCH_SIZE) -> Tuple[int, Optional[float]]:
+        moved, next_due = self._stream_promote_script(
+            keys=[f"delayed:{queue_name}", self._stream_key(queue_name)],
+            args=[time.time(), limit, self.maxlen or "", "task:"],
+        )
+        if moved:
+            logger.info(f"🔁 Moved {moved} delayed tasks to {queue_name}")
+        return moved, float(next_due) if next_due else None
+
+    def _mark_claimed(self, queue_name: str, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Passe en "processing" les (message_id, task_id) livrés à ce consommateur."""
+        if not messages:
+            return []
+        args = [self.group, datetime.utcnow().isoformat(), "task:", self.consumer, time.time()]
+        for message_id, task_id in messages:
+            args.extend([task_id, message_id])
+        raw_tasks = self._stream_claim_script(keys=[self._stream_key(queue_name)], args=args)
+        return [self._to_task(raw) for raw in raw_tasks]
+
+    def _reclaim(self, queue_name: str, count: int) -> List[Tuple[str, str]]:
+        """Reprend les messages restés inactifs trop longtemps chez un autre consommateur."""
+        now = time.monotonic()
+        if now - self._last_reclaim.get(queue_name, 0.0) < self.reclaim_interval:
+            return []
+        self._last_reclaim[queue_name] = now
+
+        stream = self._stream_key(queue_name)
+        response = self.redis.xautoclaim(stream, self.group, self.consumer,
+                                         int(self.visibility_timeout * 1000), start_id="0-0", count=count)
+        messages = []
+        for message_id, fields in response[1]:
+            if fields and "id" in fields:
+                messages.append((message_id, fields["id"]))
+            else:
+                self.redis.xack(stream, self.group, message_id)
+
+        if messages:
+            logger.warning(f"♻️ Reclaimed {len(messages)} idle tasks from {queue_name}")
+        return messages
+
+    def _read(self, queue_names: List[str], count: int,
+              block_ms: Optional[int]) -> Dict[str, List[Tuple[str, str]]]:
+        """XREADGROUP sur un ou plusieurs streams ; (message_id, task_id) livrés, par file."""
+        response = self.redis.xreadgroup(
+            self.group, self.consumer,
+            {self._stream_key(name): ">" for name in queue_names},
+            count=count, block=block_ms,
+        )
+        return {
+            stream.split(":", 1)[1]: [(message_id, fields.get("id", "")) for message_id, fields in entries]
+            for stream, entries in response or []
+        }
+
+    def _release(self, queue_name: str, messages: List[Tuple[str, str]]) -> None:
+        """Rend au stream des messages livrés mais non servis (voir STREAM_RELEASE)."""
+        args = [self.group, self.maxlen or ""]
+        for message_id, task_id in messages:
+            args.extend([message_id, task_id])
+        self._stream_release_script(keys=[self._stream_key(queue_name)], args=args)
+
+    def _claim(self, queue_name: str, max_n: int, wait: bool, timeout: int,
+               task_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        self._ensure_group(queue_name)
+
+        messages = self._reclaim(queue_name, max_n)
+        if len(messages) < max_n:
+            block_ms = int(timeout * 1000) if wait and timeout > 0 and not messages else None
+            messages += self._read([queue_name], max_n - len(messages), block_ms).get(queue_name, [])
+
+        if task_types and messages:
+            # Un groupe de consommateurs livre les messages dans l'ordre du stream :
+            # ceux d'un autre type sont rendus sans compter d'essai (STREAM_RELEASE)
+            accepted = set(task_types)
+            pipe = self.redis.pipeline(transaction=False)
+            for _, task_id in messages:
+                pipe.hget(f"task:{task_id}", "type")
+            matching = [task_type in accepted for task_type in pipe.execute()]
+            others = [message for message, match in zip(messages, matching) if not match]
+            messages = [message for message, match in zip(messages, matching) if match]
+            if others:
+                self._release(queue_name, others)
+
+        return self._mark_claimed(queue_name, messages)
+
+    def dequeue_any(self, queue_names: Iterable[str], timeout: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Attend jusqu'à `timeout` secondes une tâche sur l'une des files.
+
+        Les files sont lues une à une (COUNT 1), dans un ordre qui tourne à
+        chaque appel pour les servir équitablement. Si aucune n'a de tâche
+        prête, un XREADGROUP bloquant attend sur toutes : il peut livrer un
+        message par stream, le premier est servi et les autres rendus au
+        stream (sans bail, ils seraient repris puis exécutés deux fois).
+        """
+        names = list(queue_names)
+        if not names:
+            return None
+        self._rotation = (self._rotation + 1) % len(names)
+        names = names[self._rotation:] + names[:self._rotation]
+
+        try:
+            delivered: Dict[str, List[Tuple[str, str]]] = {}
+            for name in names:
+                self._ensure_group(name)
+                messages = self._reclaim(name, 1) or self._read([name], 1, None).get(name)
+                if messages:
+                    delivered = {name: messages}
+                    break
+            else:
+                if timeout > 0:
+                    delivered = self._read(names, 1, int(timeout * 1000))
+
+            served = None
+            for name in names:
+                if name not in delivered:
+                    continue
+                if served is None:
+                    tasks = self._mark_claimed(name, delivered[name])
+                    served = (name, tasks[0]) if tasks else None
+                else:
+                    self._release(name, delivered[name])
+            if served is None:
+                return None
+
+            name, task = served
+            logger.info(f"✅ Dequeued task {task['id']} from {name}")
+            return task
+        except Exception as e:
+            logger.error(f"❌ Error dequeuing task from {names}: {e}")
+            return None
+
+    def _finish_call(self, queue_name: str, task_id: str, status: str, field: str, value: str,
+                     ttl: int = 0) -> Tuple[List[str], List[Any]]:
+        """KEYS et ARGV du script STREAM_FINISH."""
+        return (
+            [f"task:{task_id}", self._stream_key(queue_name), f"stats:{queue_name}"],
+            [self.group, datetime.utcnow().isoformat(), status, field, value, ttl, time.time()],
+        )
+
+    def _finish(self, queue_name: str, task_id: str, status: str, field: str, value: str, ttl: int = 0) -> bool:
+        keys, args = self._finish_call(queue_name, task_id, status, field, value, ttl)
+        task = self._stream_finish_script(keys=keys, args=args)
+        if not task:
+            logger.warning(f"⚠️ Task {task_id} not found")
+            return False
+        return True
+
+    def complete_task(self, queue_name: str, task_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        try:
+            value = self.codec.encode(result, f"{task_id}/result") if result else ""
+            if not self._finish(queue_name, task_id, "completed", "result", value, self._completed_ttl()):
+                return False
+            logger.info(f"✅ Task {task_id} marked as completed")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error completing task {task_id}: {e}")
+            return False
+
+    def complete_many(self, queue_name: str, results: Dict[str, Optional[Dict[str, Any]]]) -> int:
+        if not results:
+            return 0
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for task_id, result in results.items():
+                keys, args = self._finish_call(
+                    queue_name, task_id, "completed", "result",
+                    self.codec.encode(result, f"{task_id}/result") if result else "", self._completed_ttl())
+                self._stream_finish_script(keys=keys, args=args, client=pipe)
+            completed = sum(1 for task in pipe.execute() if task)
+            logger.info(f"✅ {completed}/{len(results)} tasks marked as completed in {queue_name}")
+            return completed
+        except Exception as e:
+            logger.error(f"❌ Error completing {len(results)} tasks in {queue_name}: {e}")
+            return 0
+
+    def fail_task(self, queue_name: str, task_id: str, error: str,
+                  retryable: bool = True, max_attempts: Optional[int] = None) -> bool:
+        try:
+            task = self._to_task(self._stream_fail_script(
+                keys=[f"task:{task_id}", self._stream_key(queue_name),
+                      f"delayed:{queue_name}", f"dead:{queue_name}"],
+                args=[self.group] + self._retry_args(error, retryable, max_attempts) + [task_id],
+            ))
+            if not task:
+                logger.warning(f"⚠️ Task {task_id} not found")
+                return False
+
+            self._log_failure(task_id, error, task)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error failing task {task_id}: {e}")
+            return False
+
+    def requeue_task(self, queue_name: str, task_id: str) -> bool:
+        try:
+            task = self._stream_requeue_script(
+                keys=[f"task:{task_id}", self._stream_key(queue_name)],
+                args=[self.group, datetime.utcnow().isoformat(), task_id, self.maxlen or ""],
+            )
+            if not task:
+                logger.warning(f"⚠️ Task {task_id} not found")
+                return False
+
+            logger.info(f"🔄 Task {task_id} requeued to {queue_name}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error requeuing task {task_id}: {e}")
+            return False
+
+    def get_pending_summary(self, queue_name: str) -> Dict[str, Any]:
+        """Messages livrés mais non acquittés, au total et par consommateur."""
+        self._ensure_group(queue_name)
+        summary = self.redis.xpending(self._stream_key(queue_name), self.group)
+        return {
+            "pending": summary["pending"],
+            "consumers": {c["name"]: c["pending"] for c in summary.get("consumers") or []},
+        }
+
+    def get_queue_stats(self, queue_name: str) -> Dict[str, Any]:
+        """
+        Profondeur et messages en cours du stream, et attente du plus ancien
+        message pas encore livré au groupe (horodatage de son ID : entrée dans
+        le stream, à l'enqueue, à la promotion ou au retry).
+
+        Les priorités et clients sont enregistrés sur les tâches mais le
+        stream reste servi en FIFO, sans sous-file par client : `clients` est
+        toujours vide.
+        """
+        self._ensure_group(queue_name)
+        stream = self._stream_key(queue_name)
+        pending = self.get_pending_summary(queue_name)["pending"]
+        with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(stream)
+            pipe.xinfo_groups(stream)
+            pipe.zcard(f"delayed:{queue_name}")
+            pipe.llen(f"dead:{queue_name}")
+            pipe.hmget(f"stats:{queue_name}", "completed", "busy_seconds")
+            length, groups, delayed, dead, (completed, busy) = pipe.execute()
+
+        last_delivered = next((g["last-delivered-id"] for g in groups if g["name"] == self.group), "0-0")
+        oldest = self.redis.xrange(stream, f"({last_delivered}", "+", count=1)
+        oldest_wait = max(time.time() - int(oldest[0][0].split("-")[0]) / 1000, 0.0) if oldest else 0.0
+        return {
+            "depth": max(length - pending, 0),
+            "processing": pending,
+            "delayed": delayed,
+            "dead": dead,
+            "oldest_wait": oldest_wait,
+            "clients": {},
+            "completed": int(completed or 0),
+            "busy_seconds": float(busy or 0.0),
+        }
+
+    def heartbeat(self, queue_name: str, task_id: str, extend: Optional[float] = None) -> bool:
+        """
+        Remet à zéro le temps d'inactivité du message (XCLAIM ... JUSTID) :
+        il ne sera pas repris avant `visibility_timeout` secondes.
+
+        `extend` est accepté pour garder l'interface de RedisQueue mais
+        ignoré : un XCLAIM ne peut pas fixer un délai plus long.
+        """
+        try:
+            message_id, consumer = self.redis.hmget(f"task:{task_id}", "stream_id", "consumer")
+            if not message_id or consumer != self.consumer:
+                return False
+            claimed = self.redis.xclaim(self._stream_key(queue_name), self.group, self.consumer,
+                                        0, [message_id], justid=True)
+            return bool(claimed)
+        except Exception as e:
+            logger.error(f"❌ Error extending lease of task {task_id}: {e}")
+            return False
+
+    def reap_expired(self, queue_name: str, limit: int = REAP_BATCH_SIZE) -> Tuple[int, int, Optional[float]]:
+        """
+        Met en dead-letter les messages inactifs déjà livrés plus de
+        `max_lease_expiries` fois. La remise en file des autres est faite par
+        XAUTOCLAIM au moment du dequeue.
+        """
+        self._ensure_group(queue_name)
+        stream = self._stream_key(queue_name)
+        idle_ms = int(self.visibility_timeout * 1000)
+        entries = self.redis.xpending_range(stream, self.group, min="-", max="+",
+                                            count=limit, idle=idle_ms)
+
+        dead = 0
+        for entry in entries:
+            if entry["times_delivered"] <= self.max_lease_expiries:
+                continue
+            message_id = entry["message_id"]
+            fields = self.redis.xrange(stream, message_id, message_id)
+            task_id = fields[0][1].get("id") if fields else None
+            if task_id and self._finish(queue_name, task_id, "failed", "error", "Lease expired",
+                                        self._failed_ttl()):
+                self.redis.lpush(f"dead:{queue_name}", task_id)
+                dead += 1
+            else:
+                self.redis.xack(stream, self.group, message_id)
+                self.redis.xdel(stream, message_id)
+
+        if dead:
+            LEASE_EXPIRED.labels(queue_name, "dead_lettered").inc(dead)
+            logger.error(f"☠️ Dead-lettered {dead} tasks with expired lease in {queue_name}")
+        return 0, dead, None
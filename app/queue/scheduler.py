@@ -0,0 +1,133 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+from loguru import logger
+
+from app.metrics.queue_metrics import record_queue_stats
+from app.queue import scripts
+from app.queue.redis_queue import RedisQueue, PROMOTE_BATCH_SIZE, REAP_BATCH_SIZE
+
+LEADER_LOCK_KEY = "scheduler:leader"
+
+
+class QueueScheduler:
+    """
+    Promotion des tâches différées (`delayed:{queue}` -> sous-files prêtes),
+    reprise des tâches dont le bail a expiré (reaper) et publication
+    périodique des profondeurs de file par client (`stats_interval`).
+
+    Une seule instance est active à la fois grâce à un verrou Redis avec TTL
+    (élection de leader) : on peut donc la démarrer dans chaque worker sans
+    multiplier le travail. Entre deux passages, le leader dort jusqu'à la
+    prochaine échéance (bornée par `max_sleep`) au lieu de scruter en boucle.
+    """
+
+    def __init__(self, queue: RedisQueue, queue_names: Iterable[str],
+                 batch_size: int = PROMOTE_BATCH_SIZE, max_sleep: float = 1.0,
+                 lock_ttl: float = 10.0, instance_id: Optional[str] = None,
+                 stats_interval: float = 15.0):
+        self.queue = queue
+        self.queue_names = list(queue_names)
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self.lock_ttl_ms = int(lock_ttl * 1000)
+        self.instance_id = instance_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats_interval = stats_interval
+        self.is_leader = False
+        self._last_stats = 0.0
+
+        self._renew_lock = queue.redis.register_script(scripts.RENEW_LOCK)
+        self._release_lock = queue.redis.register_script(scripts.RELEASE_LOCK)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire_leadership(self) -> bool:
+        """Prend ou prolonge le verrou de leader ; renvoie True si on le détient."""
+        if self.is_leader:
+            held = self._renew_lock(keys=[LEADER_LOCK_KEY], args=[self.instance_id, self.lock_ttl_ms])
+        else:
+            held = self.queue.redis.set(LEADER_LOCK_KEY, self.instance_id, nx=True, px=self.lock_ttl_ms)
+
+        if bool(held) != self.is_leader:
+            logger.info(f"👑 Scheduler {self.instance_id} {'is now' if held else 'is no longer'} leader")
+        self.is_leader = bool(held)
+        return self.is_leader
+
+    def tick(self) -> float:
+        """
+        Effectue un passage de promotion et de reprise si on est leader.
+
+        Returns:
+            Le nombre de secondes à attendre avant le prochain passage.
+        """
+        if not self.acquire_leadership():
+            # Réessaye avant l'expiration du verrou du leader actuel
+            return self.lock_ttl_ms / 2000
+
+        sleep_for = self.max_sleep
+        now = time.time()
+        publish_stats = now - self._last_stats >= self.stats_interval
+        if publish_stats:
+            self._last_stats = now
+        for queue_name in self.queue_names:
+            try:
+                moved, next_due = self.queue.promote_delayed(queue_name, self.batch_size)
+            except Exception as e:
+                logger.error(f"❌ Error promoting delayed tasks for {queue_name}: {e}")
+                continue
+
+            if moved >= self.batch_size:
+                # Lot plein : il reste probablement des tâches échues
+                sleep_for = 0.0
+            elif next_due is not None:
+                sleep_for = min(sleep_for, max(next_due - now, 0.0))
+
+            try:
+                requeued, dead, next_expiry = self.queue.reap_expired(queue_name, REAP_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"❌ Error reaping expired leases for {queue_name}: {e}")
+                continue
+
+            if requeued + dead >= REAP_BATCH_SIZE:
+                sleep_for = 0.0
+            elif next_expiry is not None:
+                sleep_for = min(sleep_for, max(next_expiry - now, 0.0))
+
+            if publish_stats:
+                try:
+                    record_queue_stats(queue_name, self.queue.get_queue_stats(queue_name))
+                except Exception as e:
+                    logger.error(f"❌ Error publishing stats for {queue_name}: {e}")
+
+        return sleep_for
+
+    def run(self) -> None:
+        logger.info(f"🕒 Queue scheduler {self.instance_id} started for {self.queue_names}")
+        while not self._stop.is_set():
+            try:
+                delay = self.tick()
+            except Exception as e:
+                logger.error(f"❌ Queue scheduler error: {e}")
+                delay = self.max_sleep
+            self._stop.wait(delay)
+
+        if self.is_leader:
+            self._release_lock(keys=[LEADER_LOCK_KEY], args=[self.instance_id])
+            self.is_leader = False
+        logger.info(f"🕒 Queue scheduler {self.instance_id} stopped")
+
+    def start(self) -> threading.Thread:
+        """Démarre le scheduler dans un thread daemon."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="queue-scheduler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,607 @@
+"""
+Scripts Lua exécutés côté serveur par RedisQueue.
+
+Chaque script déplace l'identifiant de la tâche, met à jour son statut et
+renvoie le hash de la tâche en un seul aller-retour. Ils sont enregistrés via
+`register_script`, donc chargés une fois puis appelés par EVALSHA.
+
+Les clés dérivées d'un identifiant de tâche ou d'un client sont construites
+dans le script à partir des préfixes et noms passés en ARGV (Redis standalone
+uniquement).
+
+File prête d'une queue `q` (backend listes) :
+    queue:{q}:{priorité}:{client}   sous-file FIFO par priorité et par client
+    clients:{q}:{priorité}          anneau des clients ayant des tâches prêtes
+    credits:{q}:{priorité}          tâches servies au client en tête de l'anneau
+    weights:{q}                     poids de chaque client (défaut 1)
+    ready:{q}                       un jeton par tâche prête, pour l'attente bloquante (BLPOP)
+
+Déduplication : `dedup:{q}:{clé}` -> identifiant de la tâche, avec TTL. La clé
+et son TTL sont recopiés sur la tâche (`dedup_key`, `dedup_ttl`) ; le TTL repart
+à chaque étape (remise en file, prise en charge, nouvel essai, fin), la garde
+tient donc tant que la tâche vit puis `dedup_ttl` secondes après sa fin.
+
+Débit : `stats:{q}` cumule `completed` (tâches terminées) et `busy_seconds`
+(temps écoulé entre leur prise en charge et leur fin), lus par l'autoscaler.
+"""
+
+# Prolonge la clé de déduplication de la tâche, si elle la désigne encore :
+# `dedup_ttl` secondes, plus `extra` (attente d'une échéance différée).
+_DEDUP = """
+local function refresh_dedup(task_key, task_id, extra)
+    local fields = redis.call('HMGET', task_key, 'dedup_key', 'dedup_ttl')
+    if fields[1] and redis.call('GET', fields[1]) == task_id then
+        redis.call('EXPIRE', fields[1], math.ceil(tonumber(fields[2]) + extra))
+    end
+end
+"""
+
+# Fonctions communes aux scripts qui rendent une tâche prête ou la réclament.
+# Les priorités sont servies strictement dans l'ordre ; à priorité égale, les
+# clients sont servis en weighted round-robin (`weight` tâches chacun par tour).
+_READY = _DEDUP + """
+local PRIORITIES = {'high', 'normal', 'low'}
+
+local function push_ready(q, id, prefix, now)
+    local task_key = prefix .. id
+    local fields = redis.call('HMGET', task_key, 'priority', 'client')
+    local priority = fields[1] or 'normal'
+    local client = fields[2] or '_'
+    if redis.call('LPUSH', 'queue:' .. q .. ':' .. priority .. ':' .. client, id) == 1 then
+        redis.call('RPUSH', 'clients:' .. q .. ':' .. priority, client)
+    end
+    redis.call('HSET', task_key, 'enqueued_at', now)
+    redis.call('LPUSH', 'ready:' .. q, '1')
+    refresh_dedup(task_key, id, 0)
+end
+
+-- Renvoie l'identifiant et vrai s'il vient d'une sous-file (un jeton `ready` lui correspond)
+local function pop_ready(q)
+    for _, priority in ipairs(PRIORITIES) do
+        local ring = 'clients:' .. q .. ':' .. priority
+        local credits = 'credits:' .. q .. ':' .. priority
+        for _ = 1, redis.call('LLEN', ring) do
+            local client = redis.call('LINDEX', ring, 0)
+            local sub = 'queue:' .. q .. ':' .. priority .. ':' .. client
+            local id = redis.call('RPOP', sub)
+            if id and redis.call('LLEN', sub) > 0 then
+                local weight = tonumber(redis.call('HGET', 'weights:' .. q, client) or '1')
+                if redis.call('HINCRBY', credits, client, 1) >= weight then
+                    redis.call('RPUSH', ring, redis.call('LPOP', ring))
+                    redis.call('HDEL', credits, client)
+                end
+            else
+                -- Sous-file vidée : le client quitte l'anneau
+                redis.call('LPOP', ring)
+                redis.call('HDEL', credits, client)
+            end
+            if id then
+                return id, true
+            end
+        end
+    end
+    -- Tâches enfilées avant l'introduction des sous-files : sans jeton `ready`
+    return redis.call('RPOP', 'queue:' .. q), false
+end
+
+-- Variante filtrée de pop_ready : prend, parmi les TYPE_SCAN plus anciennes
+-- tâches de chaque sous-file, la première dont le `type` est dans `types`. Les
+-- autres tâches ne sont ni réclamées ni déplacées.
+local TYPE_SCAN = 100
+
+local function take_of_type(list, prefix, types)
+    local ids = redis.call('LRANGE', list, -TYPE_SCAN, -1)
+    for i = #ids, 1, -1 do
+        if types[redis.call('HGET', prefix .. ids[i], 'type') or ''] then
+            redis.call('LREM', list, -1, ids[i])
+            return ids[i]
+        end
+    end
+    return nil
+end
+
+local function pop_ready_of(q, prefix, types)
+    for _, priority in ipairs(PRIORITIES) do
+        local ring = 'clients:' .. q .. ':' .. priority
+        for _, client in ipairs(redis.call('LRANGE', ring, 0, -1)) do
+            local sub = 'queue:' .. q .. ':' .. priority .. ':' .. client
+            local id = take_of_type(sub, prefix, types)
+            if id then
+                if redis.call('LLEN', sub) == 0 then
+                    redis.call('LREM', ring, 1, client)
+                    redis.call('HDEL', 'credits:' .. q .. ':' .. priority, client)
+                end
+                return id, true
+            end
+        end
+    end
+    return take_of_type('queue:' .. q, prefix, types), false
+end
+"""
+
+# Crée une tâche : hash puis file différée ou prête. Avec une clé de
+# déduplication, renvoie l'identifiant de la tâche existante tant que la clé
+# n'a pas expiré et que cette tâche existe sans être en échec définitif.
+# KEYS: task, delayed, ready (stream pour le backend Redis Streams)
+# ARGV: queue_name, task_id, task_prefix, now (epoch), run_at (epoch, '' = immédiat),
+#       dedup_key ('' = aucune), dedup_ttl (s), ready_mode ('list'/'stream'),
+#       maxlen ('' = pas de limite), field_1, value_1, ...
+ADD_TASK = _READY + """
+if ARGV[6] ~= '' then
+    local existing = redis.call('GET', ARGV[6])
+    if existing then
+        local status = redis.call('HGET', ARGV[3] .. existing, 'status')
+        if status and status ~= 'failed' then
+            return existing
+        end
+    end
+    -- Une tâche différée garde sa clé jusqu'à son échéance, plus le TTL
+    local wait = ARGV[5] ~= '' and math.max(tonumber(ARGV[5]) - tonumber(ARGV[4]), 0) or 0
+    redis.call('SET', ARGV[6], ARGV[2], 'EX', math.ceil(tonumber(ARGV[7]) + wait))
+end
+
+local fields = {}
+for i = 10, #ARGV do
+    fields[#fields + 1] = ARGV[i]
+end
+redis.call('HSET', KEYS[1], unpack(fields))
+if ARGV[6] ~= '' then
+    redis.call('HSET', KEYS[1], 'dedup_key', ARGV[6], 'dedup_ttl', ARGV[7])
+end
+
+if ARGV[5] ~= '' then
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[2])
+elseif ARGV[8] == 'stream' then
+    if ARGV[9] ~= '' then
+        redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[9], '*', 'id', ARGV[2])
+    else
+        redis.call('XADD', KEYS[3], '*', 'id', ARGV[2])
+    end
+else
+    push_ready(ARGV[1], ARGV[2], ARGV[3], ARGV[4])
+end
+return ARGV[2]
+"""
+
+# Fragment commun à FAIL et STREAM_FAIL : nouvel essai différé avec backoff
+# exponentiel et jitter, ou dead-letter une fois les essais épuisés.
+# Attend les variables locales task_key, task_id, now, now_iso, err, retryable,
+# max_attempts, base_delay, max_delay, jitter, failed_ttl, delayed_key et dead_key,
+# et la fonction refresh_dedup (_DEDUP).
+_RETRY_OR_DEAD = """
+local attempts = tonumber(redis.call('HGET', task_key, 'attempts') or '0')
+if retryable and attempts < max_attempts then
+    local backoff = math.min(max_delay, base_delay * 2 ^ math.max(attempts - 1, 0))
+    local retry_at = now + backoff / 2 + backoff / 2 * jitter
+    redis.call('HSET', task_key, 'status', 'retrying', 'updated_at', now_iso, 'error', err,
+               'retry_at', tostring(retry_at))
+    redis.call('ZADD', delayed_key, retry_at, task_id)
+    refresh_dedup(task_key, task_id, retry_at - now)
+else
+    redis.call('HSET', task_key, 'status', 'failed', 'updated_at', now_iso, 'error', err)
+    redis.call('LPUSH', dead_key, task_id)
+    if failed_ttl > 0 then
+        redis.call('EXPIRE', task_key, failed_ttl)
+    end
+end
+"""
+
+# Réclame jusqu'à `max_n` tâches et renvoie la liste de leurs hash.
+# Chaque tâche réclamée reçoit un bail (lease) jusqu'à now + visibility_timeout.
+# `tokens_consumed` : jetons `ready` déjà retirés par un BLPOP.
+# `task_types` : types acceptés, séparés par des virgules ('' : tous), voir pop_ready_of.
+# KEYS: processing, leases, ready
+# ARGV: now (iso), task_prefix, max_n, now (epoch), visibility_timeout, queue_name, tokens_consumed,
+#       task_types
+DEQUEUE = _READY + """
+local tasks = {}
+local max_n = tonumber(ARGV[3])
+local tokens_consumed = tonumber(ARGV[7])
+local types = nil
+if ARGV[8] and ARGV[8] ~= '' then
+    types = {}
+    for task_type in string.gmatch(ARGV[8], '[^,]+') do
+        types[task_type] = true
+    end
+end
+while #tasks < max_n do
+    local id, has_token
+    if types then
+        id, has_token = pop_ready_of(ARGV[6], ARGV[2], types)
+    else
+        id, has_token = pop_ready(ARGV[6])
+    end
+    if not id then
+        break
+    end
+    -- Une tâche de l'ancienne file n'a pas de jeton : ne pas prendre celui d'une sous-file
+    if has_token and tokens_consumed > 0 then
+        tokens_consumed = tokens_consumed - 1
+    elseif has_token then
+        redis.call('LPOP', KEYS[3])
+    end
+    local task_key = ARGV[2] .. id
+    if redis.call('EXISTS', task_key) == 1 then
+        redis.call('LPUSH', KEYS[1], id)
+        redis.call('HSET', task_key, 'status', 'processing', 'updated_at', ARGV[1], 'claimed_at', ARGV[4])
+        redis.call('HINCRBY', task_key, 'attempts', 1)
+        redis.call('ZADD', KEYS[2], tonumber(ARGV[4]) + tonumber(ARGV[5]), id)
+        refresh_dedup(task_key, id, 0)
+        tasks[#tasks + 1] = redis.call('HGETALL', task_key)
+    end
+end
+-- Filtre : le jeton consommé peut désigner une tâche d'un autre type, restée prête
+if types then
+    for _ = 1, tokens_consumed do
+        redis.call('LPUSH', KEYS[3], '1')
+    end
+end
+return tasks
+"""
+
+# Promeut un lot borné de tâches différées échues.
+# Renvoie {nombre déplacé, score de la prochaine échéance ou false}.
+# KEYS: delayed
+# ARGV: now (epoch), limit, queue_name, task_prefix
+PROMOTE_DELAYED = _READY + """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    for _, id in ipairs(due) do
+        push_ready(ARGV[3], id, ARGV[4], ARGV[1])
+    end
+end
+local next_due = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if next_due[2] then
+    return {#due, next_due[2]}
+end
+return {#due, false}
+"""
+
+# Élection de leader : prolonge le verrou seulement si on le détient encore.
+# KEYS: lock
+# ARGV: owner, ttl (ms)
+RENEW_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: lock
+# ARGV: owner
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Compteurs de débit d'une tâche terminée (tâches prises en charge uniquement).
+_RECORD_DONE = """
+local function record_done(task_key, stats_key, now)
+    local claimed = redis.call('HGET', task_key, 'claimed_at')
+    if claimed then
+        redis.call('HINCRBY', stats_key, 'completed', 1)
+        redis.call('HINCRBYFLOAT', stats_key, 'busy_seconds', math.max(now - tonumber(claimed), 0))
+    end
+end
+"""
+
+# KEYS: task, processing, leases, stats
+# ARGV: task_id, now (iso), result (encodé, '' si absent), ttl (s, 0 = conservée), now (epoch)
+COMPLETE = _DEDUP + _RECORD_DONE + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+record_done(KEYS[1], KEYS[4], tonumber(ARGV[5]))
+refresh_dedup(KEYS[1], ARGV[1], 0)
+redis.call('HSET', KEYS[1], 'status', 'completed', 'updated_at', ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('HSET', KEYS[1], 'result', ARGV[3])
+end
+if tonumber(ARGV[4]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+redis.call('LREM', KEYS[2], 1, ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# KEYS: task, processing, leases, delayed, dead
+# ARGV: task_id, now (iso), error, now (epoch), retryable ('1'/'0'), max_attempts,
+#       base_delay, max_delay, jitter ([0, 1[), failed_ttl (s, 0 = conservée)
+FAIL = _DEDUP + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+redis.call('LREM', KEYS[2], 1, ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+
+local task_key, task_id, now_iso, err = KEYS[1], ARGV[1], ARGV[2], ARGV[3]
+local now, retryable, max_attempts = tonumber(ARGV[4]), ARGV[5] == '1', tonumber(ARGV[6])
+local base_delay, max_delay, jitter = tonumber(ARGV[7]), tonumber(ARGV[8]), tonumber(ARGV[9])
+local failed_ttl = tonumber(ARGV[10])
+local delayed_key, dead_key = KEYS[4], KEYS[5]
+""" + _RETRY_OR_DEAD + """
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Rejoue des dead-letters : compteurs remis à zéro, TTL retiré, puis passage par
+# la file différée (échéance immédiate), promue par QueueScheduler quel que soit le backend.
+# Sans identifiant fourni, rejoue les `limit` plus anciennes.
+# KEYS: dead, delayed
+# ARGV: now (epoch), now (iso), task_prefix, limit, task_id_1, ...
+REPLAY_DEAD = """
+local ids = {}
+if #ARGV > 4 then
+    for i = 5, #ARGV do
+        if redis.call('LREM', KEYS[1], 1, ARGV[i]) == 1 then
+            ids[#ids + 1] = ARGV[i]
+        end
+    end
+else
+    for _ = 1, tonumber(ARGV[4]) do
+        local id = redis.call('RPOP', KEYS[1])
+        if not id then
+            break
+        end
+        ids[#ids + 1] = id
+    end
+end
+
+local replayed = 0
+for _, id in ipairs(ids) do
+    local task_key = ARGV[3] .. id
+    if redis.call('EXISTS', task_key) == 1 then
+        redis.call('HSET', task_key, 'status', 'pending', 'updated_at', ARGV[2],
+                   'attempts', 0, 'lease_expiries', 0)
+        redis.call('HDEL', task_key, 'error', 'retry_at')
+        redis.call('PERSIST', task_key)
+        redis.call('ZADD', KEYS[2], ARGV[1], id)
+        replayed = replayed + 1
+    end
+end
+return replayed
+"""
+
+# Supprime des dead-letters et leur hash.
+# KEYS: dead
+# ARGV: task_prefix, limit, task_id_1, ...
+PURGE_DEAD = """
+local ids = {}
+if #ARGV > 2 then
+    for i = 3, #ARGV do
+        if redis.call('LREM', KEYS[1], 1, ARGV[i]) == 1 then
+            ids[#ids + 1] = ARGV[i]
+        end
+    end
+else
+    for _ = 1, tonumber(ARGV[2]) do
+        local id = redis.call('RPOP', KEYS[1])
+        if not id then
+            break
+        end
+        ids[#ids + 1] = id
+    end
+end
+for _, id in ipairs(ids) do
+    redis.call('DEL', ARGV[1] .. id)
+end
+return #ids
+"""
+
+# KEYS: task, processing, leases
+# ARGV: task_id, now (iso), now (epoch), queue_name, task_prefix
+REQUEUE = _READY + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+redis.call('LREM', KEYS[2], 1, ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('HSET', KEYS[1], 'status', 'pending', 'updated_at', ARGV[2])
+push_ready(ARGV[4], ARGV[1], ARGV[5], ARGV[3])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Compaction d'une tâche terminée : réécrit ses champs et pose son TTL, seulement
+# si son statut n'a pas changé depuis la lecture (rejeu concurrent) et qu'elle
+# n'a pas déjà de TTL.
+# KEYS: task
+# ARGV: status, ttl (s, 0 = aucun), field_1, value_1, ...
+COMPACT_TASK = """
+if redis.call('HGET', KEYS[1], 'status') ~= ARGV[1] then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if tonumber(ARGV[2]) > 0 and redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+# Prolonge le bail d'une tâche encore en cours ; renvoie 0 si le bail a été perdu.
+# KEYS: leases, task
+# ARGV: task_id, now (epoch), extend (s)
+HEARTBEAT = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', tonumber(ARGV[2]) + tonumber(ARGV[3]), ARGV[1])
+redis.call('HSET', KEYS[2], 'heartbeat_at', ARGV[2])
+return 1
+"""
+
+# Reprend un lot borné de tâches dont le bail a expiré (worker mort ou bloqué) :
+# remise en file, ou dead-letter après `max_expiries` expirations.
+# Renvoie {remises en file, dead-letters, prochaine échéance de bail ou false}.
+# KEYS: leases, processing, dead
+# ARGV: now (epoch), now (iso), limit, task_prefix, max_expiries, queue_name, failed_ttl (s)
+REAP_EXPIRED = _READY + """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+local requeued, dead = 0, 0
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('LREM', KEYS[2], 1, id)
+    local task_key = ARGV[4] .. id
+    if redis.call('EXISTS', task_key) == 1 then
+        local expiries = redis.call('HINCRBY', task_key, 'lease_expiries', 1)
+        if expiries >= tonumber(ARGV[5]) then
+            redis.call('HSET', task_key, 'status', 'failed', 'updated_at', ARGV[2], 'error', 'Lease expired')
+            redis.call('LPUSH', KEYS[3], id)
+            if tonumber(ARGV[7]) > 0 then
+                redis.call('EXPIRE', task_key, ARGV[7])
+            end
+            dead = dead + 1
+        else
+            redis.call('HSET', task_key, 'status', 'pending', 'updated_at', ARGV[2])
+            push_ready(ARGV[6], id, ARGV[4], ARGV[1])
+            requeued = requeued + 1
+        end
+    end
+end
+local next_expiry = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if next_expiry[2] then
+    return {requeued, dead, next_expiry[2]}
+end
+return {requeued, dead, false}
+"""
+
+
+# --- Backend Redis Streams (RedisStreamQueue) ---
+
+# Marque comme "processing" les messages lus par XREADGROUP / XAUTOCLAIM.
+# Les messages dont le hash a disparu sont acquittés et supprimés.
+# KEYS: stream
+# ARGV: group, now (iso), task_prefix, consumer, now (epoch), task_id_1, message_id_1, ...
+STREAM_CLAIM = _DEDUP + """
+local tasks = {}
+for i = 6, #ARGV, 2 do
+    local task_key = ARGV[3] .. ARGV[i]
+    local message_id = ARGV[i + 1]
+    if redis.call('EXISTS', task_key) == 1 then
+        redis.call('HSET', task_key, 'status', 'processing', 'updated_at', ARGV[2],
+                   'stream_id', message_id, 'consumer', ARGV[4], 'claimed_at', ARGV[5])
+        redis.call('HINCRBY', task_key, 'attempts', 1)
+        refresh_dedup(task_key, ARGV[i], 0)
+        tasks[#tasks + 1] = redis.call('HGETALL', task_key)
+    else
+        redis.call('XACK', KEYS[1], ARGV[1], message_id)
+        redis.call('XDEL', KEYS[1], message_id)
+    end
+end
+return tasks
+"""
+
+# Termine une tâche : XACK + XDEL du message en cours.
+# KEYS: task, stream, stats
+# ARGV: group, now (iso), status, field, value ('' si absent), ttl (s, 0 = conservée), now (epoch)
+STREAM_FINISH = _DEDUP + _RECORD_DONE + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+if ARGV[3] == 'completed' then
+    record_done(KEYS[1], KEYS[3], tonumber(ARGV[7]))
+    refresh_dedup(KEYS[1], redis.call('HGET', KEYS[1], 'id'), 0)
+end
+local message_id = redis.call('HGET', KEYS[1], 'stream_id')
+redis.call('HSET', KEYS[1], 'status', ARGV[3], 'updated_at', ARGV[2])
+if ARGV[5] ~= '' then
+    redis.call('HSET', KEYS[1], ARGV[4], ARGV[5])
+end
+if message_id then
+    redis.call('XACK', KEYS[2], ARGV[1], message_id)
+    redis.call('XDEL', KEYS[2], message_id)
+    redis.call('HDEL', KEYS[1], 'stream_id', 'consumer')
+end
+if tonumber(ARGV[6]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[6])
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Échec : XACK + XDEL puis nouvel essai différé ou dead-letter.
+# KEYS: task, stream, delayed, dead
+# ARGV: group, now (iso), error, now (epoch), retryable ('1'/'0'), max_attempts,
+#       base_delay, max_delay, jitter ([0, 1[), failed_ttl (s, 0 = conservée), task_id
+STREAM_FAIL = _DEDUP + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local message_id = redis.call('HGET', KEYS[1], 'stream_id')
+if message_id then
+    redis.call('XACK', KEYS[2], ARGV[1], message_id)
+    redis.call('XDEL', KEYS[2], message_id)
+    redis.call('HDEL', KEYS[1], 'stream_id', 'consumer')
+end
+
+local task_key, task_id, now_iso, err = KEYS[1], ARGV[11], ARGV[2], ARGV[3]
+local now, retryable, max_attempts = tonumber(ARGV[4]), ARGV[5] == '1', tonumber(ARGV[6])
+local base_delay, max_delay, jitter = tonumber(ARGV[7]), tonumber(ARGV[8]), tonumber(ARGV[9])
+local failed_ttl = tonumber(ARGV[10])
+local delayed_key, dead_key = KEYS[3], KEYS[4]
+""" + _RETRY_OR_DEAD + """
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# KEYS: task, stream
+# ARGV: group, now (iso), task_id, maxlen ('' = pas de limite)
+STREAM_REQUEUE = _DEDUP + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local message_id = redis.call('HGET', KEYS[1], 'stream_id')
+if message_id then
+    redis.call('XACK', KEYS[2], ARGV[1], message_id)
+    redis.call('XDEL', KEYS[2], message_id)
+    redis.call('HDEL', KEYS[1], 'stream_id', 'consumer')
+end
+redis.call('HSET', KEYS[1], 'status', 'pending', 'updated_at', ARGV[2])
+refresh_dedup(KEYS[1], ARGV[3], 0)
+if ARGV[4] ~= '' then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], '*', 'id', ARGV[3])
+else
+    redis.call('XADD', KEYS[2], '*', 'id', ARGV[3])
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Rend au stream des messages livrés par un XREADGROUP multi-stream mais non
+# servis : XACK + XDEL puis XADD en fin de stream. Ils ne restent pas dans la
+# PEL sans bail, où XAUTOCLAIM les donnerait à un autre consommateur.
+# KEYS: stream
+# ARGV: group, maxlen ('' = pas de limite), puis paires message_id, task_id
+STREAM_RELEASE = """
+for i = 3, #ARGV, 2 do
+    redis.call('XACK', KEYS[1], ARGV[1], ARGV[i])
+    redis.call('XDEL', KEYS[1], ARGV[i])
+    if ARGV[2] ~= '' then
+        redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], '*', 'id', ARGV[i + 1])
+    else
+        redis.call('XADD', KEYS[1], '*', 'id', ARGV[i + 1])
+    end
+end
+return (#ARGV - 2) / 2
+"""
+
+# KEYS: delayed, stream
+# ARGV: now (epoch), limit, maxlen ('' = pas de limite), task_prefix
+STREAM_PROMOTE_DELAYED = _DEDUP + """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], id)
+    refresh_dedup(ARGV[4] .. id, id, 0)
+    if ARGV[3] ~= '' then
+        redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'id', id)
+    else
+        redis.call('XADD', KEYS[2], '*', 'id', id)
+    end
+end
+local next_due = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if next_due[2] then
+    return {#due, next_due[2]}
+end
+return {#due, false}
+"""
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends, status
-from app.database import SessionLocal
+from app.database import get_db_session
 from app.models import Receipt, User
 from app.email_sender import send_email
 from app.logger_setup import logger
@@ -13,11 +13,7 @@ REMINDER_DELAY_DAYS = 7  # Peut être déplacé dans settings si besoin
 
 async def send_reminders(db: Session):
     cutoff = datetime.utcnow() - timedelta(days=5)
-    receipts = db.query(Receipt).filter(
-        Receipt.invoice_received == False,
-        Receipt.email_sent == True,
-        Receipt.created_at < cutoff
-    ).all()
+    receipts = Receipt.query_pending(db, cutoff).all()
 
     for receipt in receipts:
         await send_email(
@@ -26,14 +22,6 @@ async def send_reminders(db: Session):
             body=f"Please send the invoice for receipt {receipt.file}"
         )
 
-def get_db_session():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @reminder_router.post("/reminder", status_code=status.HTTP_200_OK)
 def run_reminder_endpoint(user=Depends(get_current_user), db: Session = Depends(get_db_session)):
     return {"sent": send_reminder(db, client_id=user.client_id)}
@@ -46,16 +34,7 @@ def send_reminder(db: Session, client_id: int = None) -> int:
     """
     threshold = datetime.utcnow() - timedelta(days=REMINDER_DELAY_DAYS)
 
-    query = db.query(Receipt).filter(
-        Receipt.email_sent == True,
-        Receipt.invoice_received == False,
-        Receipt.created_at <= threshold
-    )
-
-    if client_id:
-        query = query.filter(Receipt.client_id == client_id)
-
-    receipts_to_remind = query.all()
+    receipts_to_remind = Receipt.query_pending(db, threshold, client_id=client_id, inclusive=True).all()
     logger.info(f"🔁 Found {len(receipts_to_remind)} receipts requiring reminders")
 
     count = 0
@@ -0,0 +1,173 @@
+"""
+Lectures sur le réplica malgré le retard de réplication.
+
+Les endpoints en lecture seule (listes, détail, export, statistiques)
+prennent leur session via replica_session / replica_bind : elle lit sur le
+réplica (DATABASE_REPLICA_URL), sauf pour un client écrit depuis moins de
+REPLICA_LAG_WINDOW secondes, qui relit sur le primaire ce qu'il vient
+d'envoyer.
+
+Les écritures sont relevées à chaque flush de session ORM (reçus insérés,
+modifiés ou supprimés) et par note_writes pour celles qui contournent l'ORM,
+puis marquées une fois la transaction validée, dans une clé Redis à
+expiration par client : la fenêtre est partagée entre les workers uvicorn et
+les workers de tâches, qui font l'essentiel des écritures (OCR). Le marquage
+est au mieux : une erreur Redis est journalisée, jamais propagée au commit.
+Sans réplica, rien n'est noté et tout reste sur le primaire.
+"""
+import asyncio
+from typing import Callable, Iterable, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+from fastapi import Depends
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import database
+from app.config import get_settings
+from app.database import get_async_db_session, get_db_session, read_from_replica
+from app.models import Receipt
+
+settings = get_settings()
+
+
+class RecentWrites:
+    """Clients écrits depuis moins de `window` secondes (une clé Redis à expiration par client)."""
+
+    prefix = "db:recent_write:"
+
+    def __init__(self, window: float, client=None, async_client=None):
+        self.window = window
+        self._client = client
+        self._async_client = async_client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(settings.REDIS_URL)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = aioredis.from_url(settings.REDIS_URL)
+        return self._async_client
+
+    def _to_mark(self, client_ids: Iterable[int]) -> Set[int]:
+        if self.window <= 0:
+            return set()
+        return {client_id for client_id in client_ids if client_id is not None}
+
+    def mark(self, client_ids: Iterable[int]) -> None:
+        """Ouvre (ou prolonge) la fenêtre de lecture sur le primaire des clients."""
+        client_ids = self._to_mark(client_ids)
+        if not client_ids:
+            return
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for client_id in client_ids:
+                pipeline.set(f"{self.prefix}{client_id}", 1, px=int(self.window * 1000))
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Could not record writes of clients {sorted(client_ids)}: {e}")
+
+    async def mark_async(self, client_ids: Iterable[int]) -> None:
+        """Comme mark, avec le client asynchrone : ne bloque pas la boucle d'événements."""
+        client_ids = self._to_mark(client_ids)
+        if not client_ids:
+            return
+        try:
+            pipeline = self.async_client.pipeline(transaction=False)
+            for client_id in client_ids:
+                pipeline.set(f"{self.prefix}{client_id}", 1, px=int(self.window * 1000))
+            await pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Could not record writes of clients {sorted(client_ids)}: {e}")
+
+    async def is_recent(self, client_id: Optional[int]) -> bool:
+        """Vrai si le client a écrit dans la fenêtre ; en cas de doute (Redis indisponible), aussi."""
+        if client_id is None or self.window <= 0:
+            return False
+        try:
+            return bool(await self.async_client.exists(f"{self.prefix}{client_id}"))
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Could not check recent writes of client {client_id}: {e}")
+            return True
+
+
+recent_writes: Optional[RecentWrites] = (
+    RecentWrites(settings.REPLICA_LAG_WINDOW) if database.REPLICA_URL else None
+)
+
+# Marquages en cours des sessions async (référence gardée jusqu'à leur fin)
+_pending_marks: Set[asyncio.Task] = set()
+
+
+def note_writes(session: Session, client_ids: Iterable[int]) -> None:
+    """Note les clients écrits par la transaction en cours de `session` (marqués à son commit)."""
+    if recent_writes is not None:
+        session.info.setdefault("written_clients", set()).update(client_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    if recent_writes is not None:
+        note_writes(session, {obj.client_id for obj in (*session.new, *session.dirty, *session.deleted)
+                              if isinstance(obj, Receipt)})
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    # La transaction est validée : seul le marquage reste à faire
+    written = session.info.pop("written_clients", None)
+    if not written or recent_writes is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Session synchrone hors boucle (worker, thread d'un endpoint synchrone)
+        recent_writes.mark(written)
+        return
+    # AsyncSession (le hook tourne sur la boucle) : aucun aller-retour Redis
+    # bloquant, le marquage s'exécute dès que commit() a rendu la main
+    task = loop.create_task(recent_writes.mark_async(written))
+    _pending_marks.add(task)
+    task.add_done_callback(_pending_marks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop("written_clients", None)
+
+
+async def use_replica(client_id: Optional[int]) -> bool:
+    """Vrai si les lectures du client peuvent aller au réplica."""
+    return recent_writes is not None and not await recent_writes.is_recent(client_id)
+
+
+def replica_session(current_user: Callable) -> Callable:
+    """
+    Dépendance : session async de la requête, en lecture sur le réplica si
+    l'utilisateur courant (dépendance `current_user`) le permet.
+    """
+    async def dependency(user=Depends(current_user),
+                         db: AsyncSession = Depends(get_async_db_session)) -> AsyncSession:
+        if await use_replica(user.client_id):
+            read_from_replica(db)
+        return db
+
+    return dependency
+
+
+def replica_bind(current_user: Callable) -> Callable:
+    """Dépendance : moteur synchrone des lectures longues (export), réplica ou primaire."""
+    async def dependency(user=Depends(current_user), db: Session = Depends(get_db_session)):
+        replica = database.get_replica_engine()
+        if replica is not None and await use_replica(user.client_id):
+            return replica
+        return db.get_bind()
+
+    return dependency
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # --- AUTHENTICATION ---
@@ -83,3 +83,55 @@ class ReceiptOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ReceiptSummary(BaseModel):
+    """Reçu dans une liste : sans ocr_text, colonnes éventuellement restreintes par `fields=`."""
+    id: int
+    created_at: datetime
+    file: Optional[str] = None
+    email_sent_to: Optional[str] = None
+    date: Optional[str] = None
+    company_name: Optional[str] = None
+    vat_number: Optional[str] = None
+    price_ttc: Optional[float] = None
+    price_ht: Optional[float] = None
+    vat_amount: Optional[float] = None
+    vat_rate: Optional[float] = None
+    email_sent: Optional[bool] = None
+    invoice_received: Optional[bool] = None
+    user_id: Optional[int] = None
+    client_id: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class ReceiptPage(BaseModel):
+    items: List[ReceiptSummary]
+    next_cursor: Optional[str] = None  # reçus plus anciens
+    prev_cursor: Optional[str] = None  # reçus plus récents
+
+
+class ReceiptSearchResults(BaseModel):
+    items: List[ReceiptSummary]  # du plus au moins pertinent
+
+
+# --- STATISTIQUES ---
+class VatTotals(BaseModel):
+    receipt_count: int = 0
+    pending_count: int = 0
+    reminded_count: int = 0
+    total_ttc: float = 0.0
+    total_ht: float = 0.0
+    total_vat: float = 0.0
+    recoverable_vat: float = 0.0
+    pending_vat: float = 0.0
+
+class VatPeriodStats(VatTotals):
+    period: str  # "2026-01"
+    vat_rate: Optional[float]  # None : taux non extrait
+
+class ReceiptStats(BaseModel):
+    items: List[VatPeriodStats]
+    totals: VatTotals
@@ -0,0 +1,114 @@
+"""
+Recherche plein texte des reçus d'un client (nom du fournisseur et texte OCR).
+
+- Postgres : colonne générée receipts.search_vector (tsvector, fournisseur
+  pondéré A, texte OCR B) et index GIN (client_id, search_vector) (extension
+  btree_gin) : la recherche ne parcourt que les entrées du client.
+- SQLite : table FTS5 receipts_fts à contenu externe, tenue à jour par
+  triggers ; préfixes de 2 et 3 caractères indexés.
+
+Les accents sont ignorés des deux côtés ("cafe" trouve "Café") : tokenizer
+unicode61 remove_diacritics sous SQLite, configuration receipts_search
+(simple précédé du dictionnaire unaccent) sous Postgres.
+
+Dans les deux cas l'index suit toute écriture sur receipts, ORM ou SQL
+(migration 0005_receipt_search). Chaque mot de la recherche est un préfixe
+("boul paul" trouve "Boulangerie Paul"), tous doivent être présents ; les
+résultats sont classés par pertinence (ts_rank_cd / bm25).
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import DDL, column, event, func, literal_column, select, table
+
+from app.models import Receipt
+
+# Configuration sans racinisation (noms propres, numéros et tickets multilingues),
+# copie de `simple` dont les mots passent d'abord par unaccent
+TEXT_SEARCH_CONFIG = "receipts_search"
+# Mots pris en compte par recherche, au-delà ignorés
+MAX_TERMS = 8
+
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(company_name, '')), 'A') || "
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(ocr_text, '')), 'B')"
+)
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # CREATE TEXT SEARCH CONFIGURATION n'a pas de IF NOT EXISTS ; elle survit à drop_all
+    f"""DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{TEXT_SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {TEXT_SEARCH_CONFIG} (COPY = simple);
+            ALTER TEXT SEARCH CONFIGURATION {TEXT_SEARCH_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+        END IF;
+    END $$""",
+    f"ALTER TABLE receipts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED",
+    "CREATE INDEX ix_receipts_search ON receipts USING gin (client_id, search_vector)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE receipts_fts USING fts5(company_name, ocr_text, content='receipts', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    """CREATE TRIGGER receipts_fts_insert AFTER INSERT ON receipts BEGIN
+        INSERT INTO receipts_fts(rowid, company_name, ocr_text) VALUES (new.id, new.company_name, new.ocr_text);
+    END""",
+    """CREATE TRIGGER receipts_fts_delete AFTER DELETE ON receipts BEGIN
+        INSERT INTO receipts_fts(receipts_fts, rowid, company_name, ocr_text)
+        VALUES ('delete', old.id, old.company_name, old.ocr_text);
+    END""",
+    """CREATE TRIGGER receipts_fts_update AFTER UPDATE OF company_name, ocr_text ON receipts BEGIN
+        INSERT INTO receipts_fts(receipts_fts, rowid, company_name, ocr_text)
+        VALUES ('delete', old.id, old.company_name, old.ocr_text);
+        INSERT INTO receipts_fts(rowid, company_name, ocr_text) VALUES (new.id, new.company_name, new.ocr_text);
+    END""",
+]
+
+receipts_fts = table("receipts_fts", column("rowid"))
+
+# Bases créées par Base.metadata.create_all (tests, init_db) : index créé avec la table
+for _statement in POSTGRES_DDL:
+    event.listen(Receipt.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in SQLITE_DDL:
+    event.listen(Receipt.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+# Hors métadonnées : drop_all ne la supprimerait pas (ses triggers partent avec receipts)
+event.listen(Receipt.__table__, "after_drop", DDL("DROP TABLE IF EXISTS receipts_fts").execute_if(dialect="sqlite"))
+
+
+def search_terms(q: str) -> List[str]:
+    """Mots de la recherche, en minuscules (ponctuation et opérateurs ignorés)."""
+    return [term.lower() for term in re.findall(r"\w+", q)][:MAX_TERMS]
+
+
+def select_search(dialect: str, client_id: int, q: str, fields: Optional[List[str]] = None):
+    """
+    Reçus du client contenant tous les mots de `q` (en préfixe), du plus au
+    moins pertinent ; None si `q` ne contient aucun mot.
+
+    Args:
+        dialect: Nom du dialecte de la session ("postgresql" ou "sqlite")
+        client_id: Client dont les reçus sont cherchés
+        q: Texte saisi
+        fields: Colonnes renvoyées (défaut : le reçu entier)
+    """
+    terms = search_terms(q)
+    if not terms:
+        return None
+
+    statement = select(*Receipt._columns(fields)).where(Receipt.client_id == client_id)
+    if dialect == "postgresql":
+        config = literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig")
+        query = func.to_tsquery(config, " & ".join(f"{term}:*" for term in terms))
+        vector = literal_column("receipts.search_vector")
+        rank = func.ts_rank_cd(vector, query)
+        return statement.where(vector.op("@@")(query)).order_by(rank.desc(), Receipt.id.desc())
+    if dialect == "sqlite":
+        fts = literal_column("receipts_fts")
+        # bm25 : plus petit = plus pertinent ; le fournisseur compte 10 fois plus que le texte
+        rank = func.bm25(fts, 10.0, 1.0)
+        return (statement.join_from(Receipt, receipts_fts, receipts_fts.c.rowid == Receipt.id)
+                .where(fts.op("MATCH")(" AND ".join(f'"{term}"*' for term in terms)))
+                .order_by(rank, Receipt.id.desc()))
+    raise ValueError(f"Full-text search is not supported on {dialect}")
@@ -1,4 +1,6 @@
+import html
 from datetime import datetime, timedelta
+from email_validator import validate_email as validate_email_format, EmailNotValidError
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import get_settings
@@ -21,3 +23,16 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, str(settings.SECRET_KEY), algorithm="HS256")
     return encoded_jwt
+
+def sanitize_input(input_text: str) -> str:
+    """Échappe le HTML d'un texte saisi (prévention XSS)."""
+    if not input_text:
+        return ""
+    return html.escape(input_text)
+
+def validate_email(email: str) -> bool:
+    try:
+        validate_email_format(email, check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
@@ -0,0 +1,156 @@
+"""
+Autoscaler des workers, piloté par la profondeur des files.
+
+À chaque passage, pour chaque file, l'autoscaler lit RedisQueue.get_queue_stats
+et en déduit, entre deux lectures :
+
+- la durée moyenne de traitement d'une tâche : Δbusy_seconds / Δcompleted
+  (lissée, conservée tant qu'aucune tâche ne se termine) ;
+- le débit d'arrivée : tâches terminées + variation du backlog, par seconde.
+
+La concurrence nécessaire (tous workers confondus) couvre les arrivées et vide
+le backlog dans `target_drain_time` :
+
+    ceil(arrivées/s * durée + profondeur * durée / target_drain_time)
+
+Si la plus ancienne tâche attend déjà plus que `target_drain_time`, elle est
+au moins augmentée d'une unité. La recommandation est publiée (gauge
+`queue_recommended_concurrency`) pour un orchestrateur externe ; la part de
+ce worker (recommandation / `replicas`) est appliquée au runtime local, dans
+les bornes de la politique de chaque file. Les baisses n'interviennent qu'après
+`scale_down_delay` secondes sans hausse, pour éviter les oscillations.
+"""
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from app.metrics.queue_metrics import QUEUE_RECOMMENDED_CONCURRENCY, QUEUE_SERVICE_TIME, WORKER_CONCURRENCY
+from app.queue.redis_queue import RedisQueue
+from app.tasks.runtime import WorkerRuntime
+
+
+class Autoscaler:
+    def __init__(self, queue: RedisQueue, runtime: Optional[WorkerRuntime] = None,
+                 queue_names: Optional[Iterable[str]] = None, target_drain_time: float = 300.0,
+                 replicas: int = 1, interval: float = 15.0, scale_down_delay: float = 120.0,
+                 smoothing: float = 0.3):
+        """
+        Args:
+            queue: File dont on lit les statistiques
+            runtime: Runtime local à ajuster (None : recommandation publiée seulement)
+            queue_names: Files suivies (défaut : celles du runtime)
+            target_drain_time: Délai cible (s) pour vider le backlog
+            replicas: Nombre de workers qui se partagent la recommandation
+            interval: Intervalle (s) entre deux passages
+            scale_down_delay: Délai (s) sans hausse avant d'autoriser une baisse
+            smoothing: Poids d'une nouvelle mesure dans la moyenne de la durée de traitement
+        """
+        self.queue = queue
+        self.runtime = runtime
+        self.queue_names = list(queue_names if queue_names is not None else runtime.policies)
+        self.target_drain_time = target_drain_time
+        self.replicas = max(replicas, 1)
+        self.interval = interval
+        self.scale_down_delay = scale_down_delay
+        self.smoothing = smoothing
+
+        # Dernière lecture par file : (instant, stats)
+        self._samples: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._service_time: Dict[str, float] = {}
+        self._last_scale_up: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def observe(self, queue_name: str, stats: Dict[str, Any], now: float) -> int:
+        """Intègre une lecture des statistiques et renvoie la concurrence recommandée."""
+        backlog = stats["depth"] + stats["processing"]
+        previous = self._samples.get(queue_name)
+        self._samples[queue_name] = (now, stats)
+        arrival_rate = 0.0
+
+        if previous:
+            last_time, last = previous
+            elapsed = now - last_time
+            completed = stats["completed"] - last["completed"]
+            if completed > 0:
+                measured = (stats["busy_seconds"] - last["busy_seconds"]) / completed
+                current = self._service_time.get(queue_name)
+                self._service_time[queue_name] = measured if current is None else \
+                    current + self.smoothing * (measured - current)
+            if elapsed > 0:
+                arrival_rate = max(completed + backlog - last["depth"] - last["processing"], 0) / elapsed
+        elif stats["completed"]:
+            # Première lecture : moyenne depuis le démarrage des compteurs
+            self._service_time[queue_name] = stats["busy_seconds"] / stats["completed"]
+
+        service_time = self._service_time.get(queue_name)
+        if service_time is None:
+            # Aucune tâche terminée : un slot par tâche en cours, plus un si la file attend
+            return stats["processing"] + (1 if stats["depth"] else 0)
+
+        QUEUE_SERVICE_TIME.labels(queue_name).set(service_time)
+        needed = math.ceil(arrival_rate * service_time + stats["depth"] * service_time / self.target_drain_time)
+        if stats["depth"] and stats["oldest_wait"] > self.target_drain_time:
+            needed = max(needed, stats["processing"] + 1)
+        return needed
+
+    def apply(self, queue_name: str, recommended: int, now: float) -> Optional[int]:
+        """Applique au runtime local sa part de la recommandation ; renvoie la limite appliquée."""
+        if self.runtime is None:
+            return None
+
+        policy = self.runtime.policies[queue_name]
+        target = math.ceil(recommended / self.replicas)
+        if target > policy.concurrency:
+            self._last_scale_up[queue_name] = now
+        elif target < policy.concurrency and now - self._last_scale_up.get(queue_name, 0.0) < self.scale_down_delay:
+            target = policy.concurrency
+
+        previous = policy.concurrency
+        applied = self.runtime.set_concurrency(queue_name, target)
+        if applied != previous:
+            logger.info(f"📈 Concurrency of {queue_name}: {previous} -> {applied} (recommended {recommended})")
+        WORKER_CONCURRENCY.labels(queue_name).set(applied)
+        return applied
+
+    def tick(self) -> Dict[str, int]:
+        """Un passage sur toutes les files ; renvoie la recommandation par file."""
+        now = time.monotonic()
+        recommendations = {}
+        for queue_name in self.queue_names:
+            try:
+                stats = self.queue.get_queue_stats(queue_name)
+            except Exception as e:
+                logger.error(f"❌ Error reading stats for {queue_name}: {e}")
+                continue
+
+            recommended = self.observe(queue_name, stats, now)
+            QUEUE_RECOMMENDED_CONCURRENCY.labels(queue_name).set(recommended)
+            self.apply(queue_name, recommended, now)
+            recommendations[queue_name] = recommended
+        return recommendations
+
+    def run(self) -> None:
+        logger.info(f"📈 Autoscaler started for {self.queue_names} (target drain {self.target_drain_time}s)")
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"❌ Autoscaler error: {e}")
+            self._stop.wait(self.interval)
+        logger.info("📈 Autoscaler stopped")
+
+    def start(self) -> threading.Thread:
+        """Démarre l'autoscaler dans un thread daemon."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="worker-autoscaler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
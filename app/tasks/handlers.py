@@ -0,0 +1,163 @@
+"""
+Handlers des tâches du worker.
+
+Un handler reçoit les données de la tâche et renvoie son résultat ; il ne
+touche pas à la file : c'est le runtime qui termine ou met en échec la tâche.
+Chaque handler est déclaré dans le registre (app.tasks.registry) avec sa file
+et sa classe de ressource. Les handlers CPU s'exécutent dans un processus du
+pool, ils doivent donc rester des fonctions de niveau module.
+"""
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.aggregates import record_bulk_update
+from app.config import get_settings
+from app.database import SessionLocal
+from app.email_sender import send_email
+from app.models import Receipt
+from app.ocr_engine import OCREngine
+from app.security import sanitize_input, validate_email
+from app.tasks.registry import CPU, IO, PermanentTaskError, registry, task
+
+settings = get_settings()
+
+
+def execute_task(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Exécute une tâche réclamée via le registre global."""
+    return registry.dispatch(task)
+
+
+# "ocr" : ancien nom du type, publié avec le texte OCR dans les données
+@task("ocr_receipt", queue="ocr", resource=CPU, timeout=120, aliases=("ocr",))
+def process_ocr_receipt(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extrait les informations du texte OCR d'un reçu et les enregistre."""
+    receipt_id = _receipt_id(data)
+
+    session = SessionLocal()
+    try:
+        receipt = session.query(Receipt).filter_by(id=receipt_id).first()
+        if not receipt:
+            raise ValueError(f"Receipt {receipt_id} not found")
+
+        text = data.get("text") or receipt.ocr_text or ""
+        if not text.strip():
+            logger.warning(f"Empty OCR text for receipt {receipt_id}")
+            return {"warning": "Empty OCR text"}
+
+        extracted = OCREngine().extract_fields_from_text(text)
+        for key, value in extracted.items():
+            setattr(receipt, key, value)
+        session.commit()
+
+        logger.info(f"Receipt {receipt_id} OCR processed successfully")
+        return extracted
+    finally:
+        session.close()
+
+
+@registry.batch("ocr_receipt", size=settings.OCR_BATCH_SIZE)
+def process_ocr_receipts(items: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Version par lots de process_ocr_receipt, pour les backfills.
+
+    Les reçus sont chargés en une requête puis mis à jour par un seul UPDATE
+    groupé, dans une seule transaction. Chaque tâche reçoit son propre résultat
+    ou sa propre exception : une donnée invalide n'affecte pas le reste du lot.
+    """
+    outcomes: List[Any] = [None] * len(items)
+    indices: Dict[int, List[int]] = {}
+    for index, data in enumerate(items):
+        try:
+            indices.setdefault(_receipt_id(data), []).append(index)
+        except PermanentTaskError as e:
+            outcomes[index] = e
+
+    session = SessionLocal()
+    try:
+        texts = dict(session.query(Receipt.id, Receipt.ocr_text).filter(Receipt.id.in_(list(indices))))
+        engine = OCREngine()
+        updates: Dict[int, Dict[str, Any]] = {}
+        for receipt_id, positions in indices.items():
+            for index in positions:
+                if receipt_id not in texts:
+                    outcomes[index] = ValueError(f"Receipt {receipt_id} not found")
+                    continue
+                text = items[index].get("text") or texts[receipt_id] or ""
+                if not text.strip():
+                    logger.warning(f"Empty OCR text for receipt {receipt_id}")
+                    outcomes[index] = {"warning": "Empty OCR text"}
+                    continue
+                try:
+                    outcomes[index] = engine.extract_fields_from_text(text)
+                    updates[receipt_id] = {"id": receipt_id, **outcomes[index]}
+                except Exception as e:
+                    outcomes[index] = e
+
+        for receipt_id, error in _write_receipts(session, list(updates.values())).items():
+            for index in indices[receipt_id]:
+                outcomes[index] = error
+
+        logger.info(f"{len(updates)} receipts OCR processed in batch")
+        return outcomes
+    finally:
+        session.close()
+
+
+def _receipt_id(data: Dict[str, Any]) -> int:
+    receipt_id = data.get("receipt_id")
+    if not receipt_id:
+        raise PermanentTaskError("Missing receipt_id")
+    if not isinstance(receipt_id, (int, str)) or (isinstance(receipt_id, str) and not receipt_id.isdigit()):
+        raise PermanentTaskError("Invalid receipt_id format")
+    return int(receipt_id)
+
+
+def _write_receipts(session, mappings: List[Dict[str, Any]]) -> Dict[int, Exception]:
+    """
+    Écrit les champs extraits en un UPDATE groupé (agrégats de TVA compris,
+    voir app.aggregates). Si la transaction échoue,
+    les reçus sont réécrits un par un pour isoler ceux en erreur.
+
+    Returns:
+        Exception par identifiant de reçu non enregistré
+    """
+    if not mappings:
+        return {}
+    try:
+        record_bulk_update(session, mappings)
+        session.bulk_update_mappings(Receipt, mappings)
+        session.commit()
+        return {}
+    except Exception as e:
+        session.rollback()
+        logger.warning(f"Batch update of {len(mappings)} receipts failed, retrying one by one: {e}")
+
+    errors: Dict[int, Exception] = {}
+    for mapping in mappings:
+        try:
+            record_bulk_update(session, [mapping])
+            session.bulk_update_mappings(Receipt, [mapping])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            errors[mapping["id"]] = e
+    return errors
+
+
+@task("send_invoice_email", queue="email", resource=IO, timeout=60, max_attempts=5,
+      aliases=("send_email",))
+def send_invoice_email(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Envoie la demande de facture au fournisseur."""
+    to_email = data.get("to")
+    if not to_email:
+        raise PermanentTaskError("Missing recipient email")
+    if not validate_email(to_email):
+        raise PermanentTaskError(f"Invalid email format: {to_email}")
+
+    subject = sanitize_input(data.get("subject", "Demande de facture"))
+    body = sanitize_input(data.get("body", "Bonjour, merci d'envoyer la facture jointe."))
+
+    send_email(to_addresses=to_email, subject=subject, body=body)
+    logger.info(f"Email sent to {to_email}")
+    return {"to": to_email}
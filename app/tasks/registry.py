@@ -0,0 +1,162 @@
+"""
+Registre des types de tâches.
+
+Chaque handler est déclaré avec le décorateur `task`, qui fixe sa file, sa
+classe de ressource (CPU : pool de processus, IO : pool de threads), son
+délai maximal et sa politique de retry :
+
+    @registry.task("ocr_receipt", queue="ocr", resource=CPU, timeout=120)
+    def process_ocr_receipt(data): ...
+
+Un type peut aussi déclarer un handler par lots avec `batch` : le runtime
+réclame alors jusqu'à `size` tâches de ce type à la fois et les confie
+ensemble au handler, qui renvoie un résultat ou une exception par tâche.
+
+Le runtime route chaque tâche réclamée d'après ce registre. Importer un module
+de tâches ne fait qu'enregistrer ses handlers : aucune connexion Redis n'est
+ouverte.
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from loguru import logger
+
+CPU = "cpu"
+IO = "io"
+
+Handler = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+# Reçoit les données de N tâches, renvoie N résultats ou exceptions (échec isolé par tâche)
+BatchHandler = Callable[[List[Dict[str, Any]]], List[Any]]
+
+
+class PermanentTaskError(Exception):
+    """Erreur non retentable (données invalides...) : la tâche part directement en dead-letter."""
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    name: str
+    func: Handler
+    queue: str
+    resource: str = IO
+    # Durée max (s) avant que la tâche soit mise en échec ; None = illimitée
+    timeout: Optional[float] = None
+    # Nombre d'essais avant dead-letter ; None = valeur de la file
+    max_attempts: Optional[int] = None
+    # Exceptions retentables ; les autres envoient la tâche en dead-letter
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+    batch_func: Optional[BatchHandler] = None
+    batch_size: int = 1
+
+    def is_retryable(self, error: BaseException) -> bool:
+        return not isinstance(error, PermanentTaskError) and isinstance(error, self.retry_on)
+
+
+class TaskRegistry:
+    def __init__(self):
+        self._specs: Dict[str, TaskSpec] = {}
+
+    def task(self, name: str, queue: str, resource: str = IO, timeout: Optional[float] = None,
+             max_attempts: Optional[int] = None, retry_on: Iterable[Type[BaseException]] = (Exception,),
+             aliases: Iterable[str] = ()) -> Callable[[Handler], Handler]:
+        """
+        Décorateur d'enregistrement d'un handler.
+
+        Args:
+            name: Type de tâche (champ `type` des données)
+            queue: File sur laquelle les tâches de ce type sont publiées
+            resource: CPU ou IO, détermine le pool d'exécution
+            timeout: Durée max d'exécution (s)
+            max_attempts: Essais avant dead-letter (défaut : celui de la file)
+            retry_on: Exceptions retentables
+            aliases: Anciens noms du type, traités par le même handler
+        """
+        if resource not in (CPU, IO):
+            raise ValueError(f"Invalid resource class: {resource}")
+
+        def decorator(func: Handler) -> Handler:
+            spec = TaskSpec(name=name, func=func, queue=queue, resource=resource, timeout=timeout,
+                            max_attempts=max_attempts, retry_on=tuple(retry_on))
+            for task_type in (name, *aliases):
+                if task_type in self._specs:
+                    raise ValueError(f"Task type already registered: {task_type}")
+                self._specs[task_type] = spec
+            return func
+
+        return decorator
+
+    def batch(self, name: str, size: int) -> Callable[[BatchHandler], BatchHandler]:
+        """
+        Décorateur d'enregistrement du handler par lots d'un type déjà déclaré.
+
+        Args:
+            name: Type de tâche, enregistré au préalable avec `task`
+            size: Nombre max de tâches traitées ensemble
+        """
+        spec = self.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown task type: {name}")
+
+        def decorator(func: BatchHandler) -> BatchHandler:
+            batched = replace(spec, batch_func=func, batch_size=max(size, 1))
+            for task_type, registered in list(self._specs.items()):
+                if registered is spec:
+                    self._specs[task_type] = batched
+            return func
+
+        return decorator
+
+    def get(self, task_type: str) -> Optional[TaskSpec]:
+        return self._specs.get(task_type)
+
+    def resolve(self, task: Dict[str, Any]) -> Optional[TaskSpec]:
+        """Retrouve la spécification d'une tâche réclamée d'après son type."""
+        return self.get(task.get("data", {}).get("type", ""))
+
+    def types(self, spec: TaskSpec) -> List[str]:
+        """Types de tâche (nom et alias) traités par `spec`."""
+        return [task_type for task_type, registered in self._specs.items() if registered is spec]
+
+    def specs(self) -> List[TaskSpec]:
+        """Spécifications enregistrées, sans doublon dû aux alias."""
+        return list({id(spec): spec for spec in self._specs.values()}.values())
+
+    def queues(self) -> Dict[str, List[TaskSpec]]:
+        """Types de tâches par file."""
+        queues: Dict[str, List[TaskSpec]] = {}
+        for spec in self.specs():
+            queues.setdefault(spec.queue, []).append(spec)
+        return queues
+
+    def enqueue(self, queue, task_type: str, data: Optional[Dict[str, Any]] = None, **options) -> Optional[str]:
+        """Publie une tâche sur la file déclarée pour son type (options : voir RedisQueue.enqueue)."""
+        spec = self.get(task_type)
+        if spec is None:
+            raise ValueError(f"Unknown task type: {task_type}")
+        return queue.enqueue(spec.queue, {**(data or {}), "type": spec.name}, **options)
+
+    def dispatch(self, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Exécute le handler de la tâche. Méthode picklable, envoyée telle quelle au pool CPU."""
+        data = task.get("data", {})
+        task_type = data.get("type", "unknown")
+        spec = self.get(task_type)
+        if spec is None:
+            raise PermanentTaskError(f"Invalid task type: {task_type}")
+        logger.info(f"Processing task {task.get('id')} of type {task_type}")
+        return spec.func(data)
+
+    def dispatch_batch(self, tasks: List[Dict[str, Any]]) -> List[Any]:
+        """Exécute un lot de tâches du même type ; renvoie un résultat ou une exception par tâche."""
+        spec = self.resolve(tasks[0])
+        if spec is None or spec.batch_func is None:
+            raise PermanentTaskError(f"No batch handler for task type: {tasks[0].get('data', {}).get('type')}")
+        logger.info(f"Processing batch of {len(tasks)} tasks of type {spec.name}")
+        outcomes = spec.batch_func([task.get("data", {}) for task in tasks])
+        if len(outcomes) != len(tasks):
+            raise RuntimeError(f"Batch handler {spec.name} returned {len(outcomes)} results for {len(tasks)} tasks")
+        return outcomes
+
+
+# Registre global, alimenté par les modules de tâches (app.tasks.handlers)
+registry = TaskRegistry()
+task = registry.task
@@ -0,0 +1,311 @@
+"""
+Runtime des workers.
+
+Le processus principal (superviseur) réclame les tâches avec
+RedisQueue.dequeue_any et les exécute, d'après le registre des types de tâches,
+dans le pool correspondant à leur classe de ressource (par lots pour les types
+qui déclarent un handler par lots) :
+
+- "cpu" (OCR) : pool de processus, un par cœur par défaut ;
+- "io" (emails, fournisseurs) : pool de threads, concurrence élevée.
+
+Chaque file a une limite de tâches simultanées : une file saturée n'est plus
+réclamée tant qu'une place ne s'est pas libérée. Le superviseur prolonge les
+baux de toutes les tâches en cours, met en échec celles qui dépassent le
+timeout de leur type, puis termine ou met en échec chaque tâche selon le
+résultat du handler et la politique de retry de son type. À l'arrêt (SIGTERM),
+il cesse de réclamer, attend les tâches en cours jusqu'à `drain_timeout` et
+remet les autres en file.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.queue.redis_queue import RedisQueue
+from app.tasks.registry import CPU, IO, PermanentTaskError, TaskRegistry, TaskSpec, registry as default_registry
+
+
+@dataclass
+class QueuePolicy:
+    # Tâches simultanées max pour la file
+    concurrency: int = 1
+    # Intervalle minimal (s) entre deux tâches, pour les files à débit limité
+    pacing: float = 0.0
+    # Bornes de `concurrency` pour l'autoscaler (max_concurrency None = concurrency fixe)
+    min_concurrency: int = 1
+    max_concurrency: Optional[int] = None
+
+    def bounds(self) -> Tuple[int, int]:
+        return self.min_concurrency, max(self.max_concurrency or self.concurrency, self.min_concurrency)
+
+
+def parse_queue_map(value: str) -> Dict[str, float]:
+    """Parse une variable d'environnement "ocr=4,email=32" en dictionnaire."""
+    return {
+        name.strip(): float(number)
+        for name, number in (item.split("=", 1) for item in value.split(",") if item.strip())
+    }
+
+
+class WorkerRuntime:
+    def __init__(self, queue: RedisQueue, policies: Dict[str, QueuePolicy],
+                 registry: Optional[TaskRegistry] = None, cpu_workers: Optional[int] = None,
+                 drain_timeout: float = 30.0, heartbeat_interval: Optional[float] = None,
+                 poll_timeout: float = 1.0, cpu_initializer: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            queue: File partagée par le superviseur et les callbacks
+            policies: Politique de chaque file traitée
+            registry: Registre des types de tâches (défaut : registre global) ; ses handlers
+                doivent être des fonctions de niveau module, picklables pour le pool CPU
+            cpu_workers: Taille du pool de processus (défaut : nombre de cœurs)
+            drain_timeout: Délai laissé aux tâches en cours à l'arrêt
+            heartbeat_interval: Intervalle des heartbeats (défaut : visibility_timeout / 3)
+            poll_timeout: Attente max d'un dequeue_any, pour revenir vérifier l'arrêt
+            cpu_initializer: Exécuté au démarrage de chaque processus du pool CPU
+        """
+        self.queue = queue
+        self.registry = registry or default_registry
+        self.policies = policies
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.drain_timeout = drain_timeout
+        self.heartbeat_interval = heartbeat_interval or queue.visibility_timeout / 3
+        self.poll_timeout = poll_timeout
+        self.cpu_initializer = cpu_initializer
+
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+        self._in_flight: Dict[str, int] = {name: 0 for name in policies}
+        # task_id -> (file, future, spec, échéance) des tâches en cours ; un lot partage son future
+        self._running: Dict[str, Tuple[str, Future, TaskSpec, Optional[float]]] = {}
+        # Tâches remises en file au drain ou expirées : leur résultat tardif est ignoré
+        self._abandoned: Set[str] = set()
+        self._next_allowed: Dict[str, float] = {name: 0.0 for name in policies}
+        self._pools: Dict[str, Executor] = {}
+
+    def _create_pool(self, resource: str) -> Executor:
+        if resource == CPU:
+            return ProcessPoolExecutor(max_workers=self.cpu_workers, initializer=self.cpu_initializer)
+        # Borne haute : toutes les files peuvent porter des tâches IO, à leur concurrence maximale
+        io_workers = sum(p.bounds()[1] for p in self.policies.values())
+        return ThreadPoolExecutor(max_workers=max(io_workers, 1), thread_name_prefix="task-io")
+
+    def _pool(self, resource: str) -> Executor:
+        if resource not in self._pools:
+            self._pools[resource] = self._create_pool(resource)
+        return self._pools[resource]
+
+    def start_pools(self) -> None:
+        """
+        Crée les pools d'avance. Les processus CPU sont tous lancés immédiatement
+        (et non au fil des premières tâches) : ils héritent des modules déjà importés.
+        """
+        queues = self.registry.queues()
+        for resource in {spec.resource for name in self.policies for spec in queues.get(name, [])}:
+            if resource in self._pools:
+                continue
+            pool = self._pool(resource)
+            if resource == CPU:
+                wait([pool.submit(os.getpid) for _ in range(self.cpu_workers)])
+
+    def stop(self) -> None:
+        """Demande l'arrêt : plus aucune tâche n'est réclamée, les tâches en cours sont drainées."""
+        self._stopping.set()
+        with self._lock:
+            self._slot_freed.notify_all()
+
+    def set_concurrency(self, queue_name: str, concurrency: int) -> int:
+        """Ajuste la limite d'une file (autoscaler), bornée par sa politique ; renvoie la limite appliquée."""
+        policy = self.policies[queue_name]
+        low, high = policy.bounds()
+        with self._lock:
+            policy.concurrency = min(max(concurrency, low), high)
+            self._slot_freed.notify_all()
+        return policy.concurrency
+
+    def in_flight(self, queue_name: Optional[str] = None) -> int:
+        with self._lock:
+            if queue_name:
+                return self._in_flight.get(queue_name, 0)
+            return sum(self._in_flight.values())
+
+    def _eligible_queues(self, now: float) -> List[str]:
+        return [
+            name for name, policy in self.policies.items()
+            if self._in_flight[name] < policy.concurrency and self._next_allowed[name] <= now
+        ]
+
+    def run(self) -> None:
+        """Boucle du superviseur, jusqu'à stop()."""
+        logger.info(f"🚀 Worker runtime started for {list(self.policies)} ({self.cpu_workers} CPU workers)")
+        self.start_pools()
+        heartbeats = threading.Thread(target=self._heartbeat_loop, name="task-heartbeats", daemon=True)
+        heartbeats.start()
+
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            with self._lock:
+                eligible = self._eligible_queues(now)
+                if not eligible:
+                    # Toutes les files sont saturées ou en pause : attente d'une place libre
+                    pauses = [t - now for t in self._next_allowed.values() if t > now]
+                    self._slot_freed.wait(min(pauses + [self.poll_timeout]))
+                    continue
+
+            timeout = min([self.poll_timeout] + [t - now for t in self._next_allowed.values() if t > now])
+            task = self.queue.dequeue_any(eligible, timeout=timeout)
+            if task:
+                self._submit(task)
+
+        self._drain()
+        heartbeats.join(timeout=1)
+        logger.info("👋 Worker runtime stopped")
+
+    def _submit(self, task: Dict[str, Any]) -> None:
+        queue_name = task["queue"]
+        spec = self.registry.resolve(task)
+        if spec is None:
+            self.queue.fail_task(queue_name, task["id"], f"Invalid task type: {task['data'].get('type')}",
+                                 retryable=False)
+            return
+
+        batch = [task]
+        if spec.batch_func:
+            # Type traité par lots : les tâches du même type déjà disponibles
+            # rejoignent le lot ; les autres types ne sont pas réclamés
+            batch += self.queue.dequeue_many(queue_name, spec.batch_size - 1, timeout=0,
+                                             task_types=self.registry.types(spec))
+        self._start(queue_name, spec, batch)
+
+    def _start(self, queue_name: str, spec: TaskSpec, tasks: List[Dict[str, Any]]) -> None:
+        # Un lot occupe une seule place de la file
+        policy = self.policies[queue_name]
+        with self._lock:
+            self._in_flight[queue_name] += 1
+            if policy.pacing:
+                self._next_allowed[queue_name] = time.monotonic() + policy.pacing
+
+        func, arg = (self.registry.dispatch_batch, tasks) if spec.batch_func else (self.registry.dispatch, tasks[0])
+        try:
+            try:
+                future = self._pool(spec.resource).submit(func, arg)
+            except BrokenProcessPool:
+                # Un processus du pool est mort (OOM...) : le pool est recréé
+                logger.error("💥 CPU pool broken, restarting it")
+                self._pools.pop(spec.resource).shutdown(wait=False, cancel_futures=True)
+                future = self._pool(spec.resource).submit(func, arg)
+        except Exception as e:
+            logger.error(f"❌ Cannot submit {len(tasks)} tasks: {e}")
+            for task in tasks:
+                self.queue.requeue_task(queue_name, task["id"])
+            with self._lock:
+                self._in_flight[queue_name] -= 1
+            return
+
+        # Le timeout d'un lot est proportionnel à sa taille
+        deadline = time.monotonic() + spec.timeout * len(tasks) if spec.timeout else None
+        with self._lock:
+            for task in tasks:
+                self._running[task["id"]] = (queue_name, future, spec, deadline)
+        future.add_done_callback(lambda f: self._on_done(queue_name, tasks, spec, f))
+
+    def _on_done(self, queue_name: str, tasks: List[Dict[str, Any]], spec: TaskSpec, future: Future) -> None:
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                outcomes = [error] * len(tasks)
+            else:
+                outcomes = future.result() if spec.batch_func else [future.result()]
+
+            completed = {}
+            for task, outcome in zip(tasks, outcomes):
+                if task["id"] in self._abandoned:
+                    continue
+                if isinstance(outcome, BaseException):
+                    self._fail(queue_name, task["id"], spec, outcome)
+                else:
+                    completed[task["id"]] = outcome
+            if len(completed) == 1:
+                (task_id, result), = completed.items()
+                self.queue.complete_task(queue_name, task_id, result=result)
+            elif completed:
+                # Les tâches d'un lot sont terminées ensemble, en un aller-retour
+                self.queue.complete_many(queue_name, completed)
+        except Exception as e:
+            logger.error(f"❌ Error finishing tasks {[task['id'] for task in tasks]}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight[queue_name] -= 1
+                for task in tasks:
+                    self._running.pop(task["id"], None)
+                    self._abandoned.discard(task["id"])
+                self._slot_freed.notify_all()
+
+    def _fail(self, queue_name: str, task_id: str, spec: TaskSpec, error: BaseException) -> None:
+        if isinstance(error, BrokenProcessPool):
+            self.queue.requeue_task(queue_name, task_id)
+            return
+        if not isinstance(error, PermanentTaskError):
+            logger.error(f"Error processing task {task_id}: {error}")
+        self.queue.fail_task(queue_name, task_id, str(error), retryable=spec.is_retryable(error),
+                             max_attempts=spec.max_attempts)
+
+    def _heartbeat_loop(self) -> None:
+        # Un seul thread prolonge les baux de toutes les tâches en cours (drain compris)
+        # et met en échec celles qui dépassent le timeout de leur type
+        last_heartbeat = time.monotonic()
+        while not self._stopped.wait(min(self.heartbeat_interval, 1.0)):
+            now = time.monotonic()
+            with self._lock:
+                running = [(task_id, entry) for task_id, entry in self._running.items()
+                           if task_id not in self._abandoned]
+            for task_id, (queue_name, future, spec, deadline) in running:
+                if future.done():
+                    continue
+                if deadline and now > deadline:
+                    self._expire(queue_name, task_id, spec)
+                elif now - last_heartbeat >= self.heartbeat_interval:
+                    self.queue.heartbeat(queue_name, task_id)
+            if now - last_heartbeat >= self.heartbeat_interval:
+                last_heartbeat = now
+
+    def _expire(self, queue_name: str, task_id: str, spec: TaskSpec) -> None:
+        # Le handler ne peut pas être interrompu : son résultat sera ignoré, et sa
+        # place dans la file reste occupée jusqu'à ce qu'il rende la main
+        with self._lock:
+            self._abandoned.add(task_id)
+        logger.warning(f"⏱️ Task {task_id} ({spec.name}) exceeded its {spec.timeout}s timeout")
+        self.queue.fail_task(queue_name, task_id, f"Timeout after {spec.timeout}s",
+                             max_attempts=spec.max_attempts)
+
+    def _drain(self) -> None:
+        deadline = time.monotonic() + self.drain_timeout
+        logger.info(f"⏳ Draining {self.in_flight()} in-flight tasks (max {self.drain_timeout}s)")
+        with self._lock:
+            while self._running and time.monotonic() < deadline:
+                self._slot_freed.wait(max(deadline - time.monotonic(), 0))
+            leftovers = dict(self._running)
+            self._abandoned.update(leftovers)
+
+        for task_id, (queue_name, future, _, _) in leftovers.items():
+            future.cancel()
+            if self.queue.requeue_task(queue_name, task_id):
+                logger.warning(f"↩️ Task {task_id} not finished before shutdown, requeued")
+
+        self._stopped.set()
+        for resource, pool in self._pools.items():
+            if resource == CPU and leftovers:
+                # Les processus encore occupés ne rendront plus la main à temps
+                for process in list(getattr(pool, "_processes", {}).values()):
+                    process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,114 @@
+"""
+Démarrage à chaud du worker.
+
+Avant de se déclarer prêt, le worker paie une fois pour toutes les coûts de
+démarrage qui pèseraient sinon sur ses premières tâches :
+
+- import du backend OCR (PIL, pytesseract) et reconnaissance d'une image
+  minuscule, qui charge le binaire et le modèle Tesseract en cache ;
+- ouverture des connexions du pool SQLAlchemy ;
+- connexion Redis et chargement des scripts Lua (plus de NOSCRIPT au premier appel) ;
+- création des pools du runtime : les processus CPU sont forkés après les
+  imports lourds et partagent ces pages en copy-on-write.
+
+La disponibilité est signalée par un fichier (sonde `test -f` d'un
+orchestrateur) et par la gauge `worker_ready`.
+"""
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+from prometheus_client import Gauge
+from redis.commands.core import Script
+
+from app.queue.redis_queue import RedisQueue
+
+WORKER_READY = Gauge('worker_ready', 'Worker réchauffé et prêt à traiter des tâches')
+
+
+def preload_ocr() -> None:
+    """Importe le backend OCR et reconnaît une image blanche de quelques pixels."""
+    import pytesseract
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (64, 24), 255)
+    ImageDraw.Draw(image).text((4, 6), "TVA", fill=0)
+    pytesseract.image_to_string(image, lang="fra")
+
+
+def warm_database(engine, connections: Optional[int] = None) -> None:
+    """Ouvre `connections` connexions simultanées (défaut : taille du pool) puis les rend au pool."""
+    from sqlalchemy import text
+    from sqlalchemy.pool import QueuePool
+
+    size = connections or (engine.pool.size() if isinstance(engine.pool, QueuePool) else 1)
+    opened = [engine.connect() for _ in range(max(size, 1))]
+    try:
+        for connection in opened:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+def warm_redis(queue: RedisQueue) -> None:
+    """Établit la connexion Redis et charge les scripts Lua de la file."""
+    queue.redis.ping()
+    for script in {id(s): s for s in vars(queue).values() if isinstance(s, Script)}.values():
+        queue.redis.script_load(script.script)
+
+
+def warm_up(queue: RedisQueue, runtime=None, engine=None, ocr: bool = True) -> Dict[str, Optional[float]]:
+    """
+    Exécute les étapes de démarrage à chaud. Une étape en échec est journalisée
+    sans empêcher les suivantes.
+
+    Args:
+        queue: File du worker
+        runtime: WorkerRuntime dont les pools sont créés en dernier
+        engine: Moteur SQLAlchemy (défaut : app.database.engine)
+        ocr: Précharge le backend OCR (workers qui traitent des tâches CPU)
+
+    Returns:
+        Durée de chaque étape en secondes (None si elle a échoué)
+    """
+    if engine is None:
+        from app.database import engine
+
+    steps: Dict[str, Callable[[], None]] = {}
+    if ocr:
+        steps["ocr"] = preload_ocr
+    steps["database"] = lambda: warm_database(engine)
+    steps["redis"] = lambda: warm_redis(queue)
+    if runtime is not None:
+        # En dernier : les processus CPU héritent de tout ce qui précède
+        steps["pools"] = runtime.start_pools
+
+    durations: Dict[str, Optional[float]] = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+            durations[name] = time.perf_counter() - started
+            logger.info(f"🔥 Warm-up {name} done in {durations[name]:.2f}s")
+        except Exception as e:
+            durations[name] = None
+            logger.warning(f"⚠️ Warm-up {name} failed: {e}")
+    return durations
+
+
+def mark_ready(path: Optional[str]) -> None:
+    """Signale que le worker est prêt."""
+    WORKER_READY.set(1)
+    if path:
+        with open(path, "w") as f:
+            f.write(str(os.getpid()))
+    logger.info("✅ Worker ready")
+
+
+def mark_not_ready(path: Optional[str]) -> None:
+    """Retire le signal de disponibilité (arrêt en cours)."""
+    WORKER_READY.set(0)
+    if path and os.path.exists(path):
+        os.remove(path)
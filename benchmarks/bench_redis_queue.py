@@ -0,0 +1,162 @@
+# benchmarks/bench_redis_queue.py
+"""
+Benchmark du débit (tâches/s) de RedisQueue : scripts Lua vs implémentation
+historique en plusieurs allers-retours.
+
+Usage :
+    python benchmarks/bench_redis_queue.py                      # fakeredis
+    python benchmarks/bench_redis_queue.py --rtt-ms 0.3         # fakeredis + RTT simulé
+    python benchmarks/bench_redis_queue.py --redis-url redis://localhost:6379/15
+
+Avec fakeredis il n'y a pas de latence réseau et les scripts Lua passent par
+un interpréteur Python (lupa) : sans --rtt-ms, l'écart mesuré est donc un
+minorant de celui observé face à un vrai serveur Redis.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import redis
+from loguru import logger
+
+from app.queue.redis_queue import RedisQueue
+
+
+class LegacyRedisQueue(RedisQueue):
+    """Reproduit enqueue/dequeue/complete_task tels qu'ils étaient avant les scripts Lua."""
+
+    def enqueue(self, queue_name: str, data: Dict[str, Any], delay: Optional[int] = None, **kwargs) -> str:
+        task_id = str(uuid.uuid4())
+        created = datetime.utcnow().isoformat()
+        with self.redis.pipeline() as pipe:
+            pipe.hset(f"task:{task_id}", mapping={
+                "id": task_id,
+                "data": json.dumps(data),
+                "status": "pending",
+                "created_at": created,
+                "updated_at": created,
+                "queue": queue_name
+            })
+            pipe.lpush(f"queue:{queue_name}", task_id)
+            pipe.execute()
+        return task_id
+
+    def dequeue(self, queue_name: str, wait: bool = True, timeout: int = 1) -> Optional[Dict[str, Any]]:
+        queue_key = f"queue:{queue_name}"
+        processing_key = f"processing:{queue_name}"
+        self.process_delayed_tasks(queue_name)
+        task_id = self.redis.rpoplpush(queue_key, processing_key)
+        if not task_id:
+            return None
+        task_key = f"task:{task_id}"
+        task_data = self.redis.hgetall(task_key)
+        if not task_data:
+            return None
+        self.redis.hset(task_key, mapping={
+            "status": "processing",
+            "updated_at": datetime.utcnow().isoformat()
+        })
+        task_data["data"] = json.loads(task_data["data"])
+        return task_data
+
+    def complete_task(self, queue_name: str, task_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        task_key = f"task:{task_id}"
+        if not self.redis.exists(task_key):
+            return False
+        with self.redis.pipeline() as pipe:
+            pipe.hset(task_key, mapping={
+                "status": "completed",
+                "updated_at": datetime.utcnow().isoformat()
+            })
+            if result:
+                pipe.hset(task_key, "result", json.dumps(result))
+            pipe.lrem(f"processing:{queue_name}", 1, task_id)
+            pipe.execute()
+        return True
+
+
+def make_client(url: Optional[str], rtt_ms: float = 0.0) -> redis.Redis:
+    if url:
+        return redis.Redis.from_url(url, decode_responses=True)
+
+    import fakeredis
+    client = fakeredis.FakeRedis(decode_responses=True)
+    if rtt_ms:
+        # Un envoi de paquet = un aller-retour (une commande, un EVALSHA ou un pipeline)
+        connection_class = client.connection_pool.connection_class
+        send = connection_class.send_packed_command
+
+        def send_with_latency(self, *args, **kwargs):
+            time.sleep(rtt_ms / 1000)
+            return send(self, *args, **kwargs)
+
+        connection_class.send_packed_command = send_with_latency
+    return client
+
+
+def run(queue: RedisQueue, n_tasks: int) -> float:
+    """Enfile n_tasks puis mesure le débit dequeue + complete."""
+    for i in range(n_tasks):
+        queue.enqueue("bench", {"type": "ocr_receipt", "receipt_id": i})
+
+    start = time.perf_counter()
+    done = 0
+    while True:
+        task = queue.dequeue("bench", wait=False)
+        if task is None:
+            break
+        queue.complete_task("bench", task["id"], result={"ok": True})
+        done += 1
+    elapsed = time.perf_counter() - start
+    return done / elapsed if elapsed else float("inf")
+
+
+def run_batch(queue: RedisQueue, n_tasks: int, batch_size: int = 100) -> float:
+    """Même mesure avec enqueue_many / dequeue_many."""
+    queue.enqueue_many("bench", [{"type": "ocr_receipt", "receipt_id": i} for i in range(n_tasks)])
+
+    start = time.perf_counter()
+    done = 0
+    while True:
+        tasks = queue.dequeue_many("bench", batch_size, timeout=0)
+        if not tasks:
+            break
+        for task in tasks:
+            queue.complete_task("bench", task["id"], result={"ok": True})
+        done += len(tasks)
+    elapsed = time.perf_counter() - start
+    return done / elapsed if elapsed else float("inf")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=None, help="URL Redis (défaut : fakeredis)")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="latence simulée par aller-retour (fakeredis)")
+    parser.add_argument("--tasks", type=int, default=5000)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    results = {}
+    client = make_client(args.redis_url, args.rtt_ms)
+    for name, cls in (("legacy", LegacyRedisQueue), ("lua", RedisQueue)):
+        client.flushdb()
+        results[name] = run(cls(client=client), args.tasks)
+        print(f"{name:>7}: {results[name]:10.0f} tasks/s")
+
+    client.flushdb()
+    results["batch"] = run_batch(RedisQueue(client=client), args.tasks)
+    print(f"{'batch':>7}: {results['batch']:10.0f} tasks/s")
+
+    print(f"speedup: {results['lua'] / results['legacy']:.2f}x (batch {results['batch'] / results['legacy']:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
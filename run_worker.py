@@ -1,180 +1,106 @@
 # run_worker.py
-import time
 import os
-import json
-from typing import Dict, Any, Optional
-import traceback
-from app.queue.redis_queue import RedisQueue
-from app.ocr_engine import extract_info_from_text
-from app.email_sender import send_email
-from app.models import SessionLocal, Receipt, User
-from app.security import sanitize_input, validate_email
-from loguru import logger
 import signal
 import sys
 
+from loguru import logger
+
+from app.database import configure_role, dispose_after_fork
+from app.metrics.exporter import start_metrics_server
+from app.queue.factory import QueueFactory
+from app.queue.scheduler import QueueScheduler
+from app.tasks.autoscaler import Autoscaler
+from app.tasks import handlers  # noqa: F401 (enregistre les types de tâches)
+from app.tasks.registry import CPU, registry
+from app.tasks.runtime import QueuePolicy, WorkerRuntime, parse_queue_map
+from app.tasks.warmup import mark_not_ready, mark_ready, warm_up
+
 # Configuration du logger
 logger.add(
-    "logs/worker_{time}.log", 
-    rotation="500 MB", 
+    "logs/worker_{time}.log",
+    rotation="500 MB",
     level=os.getenv("LOG_LEVEL", "INFO"),
     format="{time} {level} {message}"
 )
 
-# Délai entre les traitements pour éviter de surcharger les ressources
-PROCESS_DELAY = float(os.getenv("WORKER_DELAY_SECONDS", "1"))
-# Nombre max d'essais de traitement avant abandon
+# Nombre max d'essais de traitement avant abandon (dead-letter)
 MAX_RETRIES = int(os.getenv("WORKER_MAX_RETRIES", "3"))
-
-# Gestion de la terminaison propre
-should_exit = False
-
-def handle_exit_signal(sig, frame):
-    global should_exit
-    logger.info(f"Signal {sig} reçu, arrêt en cours...")
-    should_exit = True
-
-signal.signal(signal.SIGTERM, handle_exit_signal)
-signal.signal(signal.SIGINT, handle_exit_signal)
-
-
-def process_task(task: Dict[str, Any]) -> None:
-    """
-    Traite une tâche de la file d'attente selon son type.
-    
-    Args:
-        task: Le dictionnaire contenant les détails de la tâche
-    """
-    task_type = task.get("data", {}).get("type", "unknown")
-    task_id = task.get("id", "no-id")
-    queue_name = task.get("queue", "unknown")
-    
-    logger.info(f"Processing task {task_id} of type {task_type}")
-
-    try:
-        if task_type == "ocr_receipt":
-            _process_ocr_task(task)
-        elif task_type == "send_invoice_email":
-            _process_email_task(task)
-        else:
-            logger.warning(f"Unknown task type: {task_type}")
-            queue.fail_task(queue_name, task_id, "Invalid task type")
-    except Exception as e:
-        logger.error(f"Error processing task {task_id}: {str(e)}")
-        logger.debug(traceback.format_exc())
-        queue.fail_task(queue_name, task_id, str(e))
-
-
-def _process_ocr_task(task: Dict[str, Any]) -> None:
-    """
-    Traite une tâche OCR pour extraire des informations d'un reçu.
-    
-    Args:
-        task: Le dictionnaire contenant les détails de la tâche
-    """
-    task_id = task.get("id", "no-id")
-    receipt_id = task.get("data", {}).get("receipt_id")
-    
-    if not receipt_id:
-        queue.fail_task("ocr", task_id, "Missing receipt_id")
-        return
-    
-    # Validation de l'ID du reçu
-    if not isinstance(receipt_id, (int, str)) or (isinstance(receipt_id, str) and not receipt_id.isdigit()):
-        queue.fail_task("ocr", task_id, "Invalid receipt_id format")
-        return
-    
-    session = None
-    try:
-        session = SessionLocal()
-        receipt = session.query(Receipt).filter_by(id=receipt_id).first()
-        
-        if not receipt:
-            raise ValueError(f"Receipt {receipt_id} not found")
-
-        # Validation du texte OCR
-        text = receipt.ocr_text or ""
-        if not text.strip():
-            logger.warning(f"Empty OCR text for receipt {receipt_id}")
-            queue.complete_task("ocr", task_id, result={"warning": "Empty OCR text"})
-            return
-            
-        # Extraction d'informations du texte OCR
-        extracted = extract_info_from_text(text)
-        
-        # Mise à jour du reçu avec les informations extraites
-        for key, value in extracted.items():
-            setattr(receipt, key, value)
-        
-        session.commit()
-        logger.info(f"Receipt {receipt_id} OCR processed successfully")
-        queue.complete_task("ocr", task_id, result=extracted)
-        
-    except Exception as e:
-        logger.error(f"Error in OCR task: {str(e)}")
-        logger.debug(traceback.format_exc())
-        queue.fail_task("ocr", task_id, str(e))
-    finally:
-        if session:
-            session.close()
-
-
-def _process_email_task(task: Dict[str, Any]) -> None:
-    """
-    Traite une tâche d'envoi d'email.
-    
-    Args:
-        task: Le dictionnaire contenant les détails de la tâche
-    """
-    task_id = task.get("id", "no-id")
-    data = task.get("data", {})
-    
-    to_email = data.get("to")
-    subject = data.get("subject", "Demande de facture")
-    body = data.get("body", "Bonjour, merci d'envoyer la facture jointe.")
-    
-    # Validation des entrées
-    if not to_email:
-        queue.fail_task("email", task_id, "Missing recipient email")
-        return
-    
-    # Validation du format d'email
-    if not validate_email(to_email):
-        queue.fail_task("email", task_id, f"Invalid email format: {to_email}")
-        return
-    
-    # Sanitization des entrées
-    subject = sanitize_input(subject)
-    body = sanitize_input(body)
-    
-    try:
-        # Envoi de l'email
-        send_email(to=to_email, subject=subject, body=body)
-        logger.info(f"Email sent to {to_email}")
-        queue.complete_task("email", task_id, result={"to": to_email})
-    except Exception as e:
-        logger.error(f"Email sending failed: {str(e)}")
-        logger.debug(traceback.format_exc())
-        queue.fail_task("email", task_id, str(e))
+# Tâches simultanées par file, ex. WORKER_CONCURRENCY="ocr=4,email=32"
+# (défaut : un processus par cœur pour les files CPU, 16 tâches pour les files IO)
+QUEUE_CONCURRENCY = parse_queue_map(os.getenv("WORKER_CONCURRENCY", ""))
+# Intervalle minimal entre deux tâches d'une file à débit limité (API tierce, SMTP),
+# ex. WORKER_QUEUE_PACING="email=0.5" ; les autres files sont traitées sans pause
+QUEUE_PACING = parse_queue_map(os.getenv("WORKER_QUEUE_PACING", ""))
+# Autoscaling : la concurrence de chaque file varie entre 1 et WORKER_MAX_CONCURRENCY
+# (ex. "ocr=8,email=64") pour vider la file en WORKER_TARGET_DRAIN_TIME secondes ;
+# WORKER_REPLICAS workers se partagent la concurrence recommandée
+AUTOSCALE = os.getenv("WORKER_AUTOSCALE", "false").lower() == "true"
+QUEUE_MAX_CONCURRENCY = parse_queue_map(os.getenv("WORKER_MAX_CONCURRENCY", ""))
+TARGET_DRAIN_TIME = float(os.getenv("WORKER_TARGET_DRAIN_TIME", "300"))
+REPLICAS = int(os.getenv("WORKER_REPLICAS", "1"))
+# Délai laissé aux tâches en cours à l'arrêt avant remise en file
+DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "30"))
+# Fichier présent tant que le worker est réchauffé et prêt (sonde de readiness)
+READY_FILE = os.getenv("WORKER_READY_FILE", "/tmp/worker.ready")
+# Port du endpoint /metrics du worker (readiness, baux expirés, autoscaling, pool DB),
+# 0 = pas d'exposition. Les processus du pool CPU ne sont inclus qu'avec
+# PROMETHEUS_MULTIPROC_DIR (voir app.metrics.exporter)
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+
+CPU_COUNT = os.cpu_count() or 1
+# Files servies : celles déclarées par les types de tâches du registre
+CPU_QUEUES = {name for name, specs in registry.queues().items() if any(s.resource == CPU for s in specs)}
+POLICIES = {
+    name: QueuePolicy(concurrency=int(QUEUE_CONCURRENCY.get(name, CPU_COUNT if name in CPU_QUEUES else 16)),
+                      pacing=QUEUE_PACING.get(name, 0.0),
+                      max_concurrency=int(QUEUE_MAX_CONCURRENCY[name]) if name in QUEUE_MAX_CONCURRENCY else None)
+    for name in registry.queues()
+}
 
 
 if __name__ == "__main__":
     logger.info("Starting worker process")
-    queue = RedisQueue()
-
-    # Boucle principale du worker
-    while not should_exit:
-        for q in ["ocr", "email"]:
-            try:
-                task = queue.dequeue(q, wait=False)
-                if task:
-                    process_task(task)
-            except Exception as e:
-                logger.error(f"Error in worker loop for queue {q}: {str(e)}")
-                logger.debug(traceback.format_exc())
-        
-        # Pause pour éviter de surcharger les ressources
-        time.sleep(PROCESS_DELAY)
-    
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    # Pool et statement_timeout du profil worker (voir app.database)
+    configure_role("worker")
+    queue = QueueFactory.create_queue(max_attempts=MAX_RETRIES)
+
+    runtime = WorkerRuntime(
+        queue, POLICIES, registry,
+        cpu_workers=min(sum(POLICIES[name].bounds()[1] for name in CPU_QUEUES) or 1, CPU_COUNT),
+        drain_timeout=DRAIN_TIMEOUT,
+        cpu_initializer=dispose_after_fork,
+    )
+
+    # Démarrage à chaud, avant tout thread : les processus CPU sont forkés
+    # après les imports lourds et les premières tâches ne paient pas le démarrage
+    warm_up(queue, runtime, ocr=bool(CPU_QUEUES))
+
+    # Promotion des tâches différées : un seul worker (le leader) s'en charge
+    queue_scheduler = QueueScheduler(queue, list(POLICIES))
+    queue_scheduler.start()
+
+    autoscaler = None
+    if AUTOSCALE:
+        autoscaler = Autoscaler(queue, runtime, target_drain_time=TARGET_DRAIN_TIME, replicas=REPLICAS)
+        autoscaler.start()
+
+    # Gestion de la terminaison propre : drain des tâches en cours
+    def handle_exit_signal(sig, frame):
+        logger.info(f"Signal {sig} reçu, arrêt en cours...")
+        mark_not_ready(READY_FILE)
+        runtime.stop()
+
+    signal.signal(signal.SIGTERM, handle_exit_signal)
+    signal.signal(signal.SIGINT, handle_exit_signal)
+
+    mark_ready(READY_FILE)
+    runtime.run()
+    mark_not_ready(READY_FILE)
+
+    if autoscaler:
+        autoscaler.stop(timeout=5)
+    queue_scheduler.stop(timeout=5)
     logger.info("Worker shutting down gracefully")
     sys.exit(0)
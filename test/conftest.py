@@ -1,10 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from app.main import app
-from app.database import Base, get_db_session
+from app.database import Base, get_async_db_session, get_db_session, to_async_url
 from app.models import User, Client
 from werkzeug.security import generate_password_hash
 
@@ -23,6 +25,28 @@ def override_get_db_session():
 
 app.dependency_overrides[get_db_session] = override_get_db_session
 
+# Moteur async sur la même base ; NullPool car TestClient peut changer de
+# boucle d'événements d'une requête à l'autre
+TestingAsyncSessionLocal = async_sessionmaker(
+    create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool), expire_on_commit=False
+)
+
+async def override_get_async_db_session():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db_session] = override_get_async_db_session
+
+
+@pytest.fixture
+def sqlite_engines(tmp_path):
+    """Moteurs synchrone et async sur une même base SQLite temporaire, tables créées."""
+    url = f"sqlite:///{tmp_path}/app.db"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine, create_async_engine(to_async_url(url), poolclass=NullPool)
+    engine.dispose()
+
 
 @pytest.fixture(scope="session")
 def db():
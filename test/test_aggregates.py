@@ -0,0 +1,162 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import auth
+from app.aggregates import COUNTERS, rebuild, record_bulk_update, select_stored
+from app.database import get_async_db_session
+from app.main import app
+from app.models import UNKNOWN_VAT_RATE, Client, Receipt, ReceiptAggregate, User
+
+
+@pytest.fixture
+def session(sqlite_engines):
+    session = sessionmaker(bind=sqlite_engines[0])()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(session):
+    user = User(email="stats@example.com", hashed_password="x", client=Client(name="Stats Corp"))
+    session.add(user)
+    session.commit()
+    return user
+
+
+def receipt(user, day, vat_amount=None, vat_rate=None, **fields):
+    return Receipt(file="r.jpg", email_sent_to="factures@example.com", user=user, client=user.client,
+                   created_at=day, vat_amount=vat_amount, vat_rate=vat_rate,
+                   price_ttc=None if vat_amount is None else vat_amount * 6, **fields)
+
+
+def snapshot(session):
+    session.expire_all()
+    return {
+        (row.client_id, row.period, row.vat_rate): {name: pytest.approx(getattr(row, name)) for name in COUNTERS}
+        for row in session.query(ReceiptAggregate) if row.receipt_count
+    }
+
+
+def assert_matches_rebuild(session):
+    incremental = snapshot(session)
+    rebuild(session)
+    session.commit()
+    assert snapshot(session) == incremental
+    return incremental
+
+
+def test_inserts_are_aggregated_by_client_month_and_rate(session, user):
+    session.add_all([
+        receipt(user, datetime(2026, 1, 5), vat_amount=10.0, vat_rate=20.0, invoice_received=True),
+        receipt(user, datetime(2026, 1, 20), vat_amount=5.0, vat_rate=20.0, email_sent=True),
+        receipt(user, datetime(2026, 1, 21), vat_amount=1.0, vat_rate=5.5),
+        receipt(user, datetime(2026, 2, 1)),
+    ])
+    session.commit()
+
+    aggregates = assert_matches_rebuild(session)
+    january = aggregates[(user.client_id, "2026-01", 20.0)]
+    assert january["receipt_count"] == 2
+    assert january["pending_count"] == 1
+    assert january["reminded_count"] == 1
+    assert january["recoverable_vat"] == 10.0
+    assert january["pending_vat"] == 5.0
+    assert aggregates[(user.client_id, "2026-02", UNKNOWN_VAT_RATE)]["receipt_count"] == 1
+    assert len(aggregates) == 3
+
+
+def test_updates_and_deletes_move_the_contribution(session, user):
+    first = receipt(user, datetime(2026, 1, 5), vat_amount=10.0, vat_rate=20.0)
+    second = receipt(user, datetime(2026, 1, 6))
+    session.add_all([first, second])
+    session.commit()
+
+    first.invoice_received = True
+    first.vat_amount = 12.0
+    second.vat_rate, second.vat_amount, second.created_at = 10.0, 3.0, datetime(2026, 3, 1)
+    session.commit()
+    aggregates = assert_matches_rebuild(session)
+    assert aggregates[(user.client_id, "2026-01", 20.0)]["recoverable_vat"] == 12.0
+    assert (user.client_id, "2026-01", UNKNOWN_VAT_RATE) not in aggregates
+
+    session.delete(first)
+    session.commit()
+    assert (user.client_id, "2026-01", 20.0) not in assert_matches_rebuild(session)
+
+
+def test_bulk_updates_are_reported(session, user):
+    receipts = [receipt(user, datetime(2026, 4, day)) for day in (1, 2, 3)]
+    session.add_all(receipts)
+    session.commit()
+
+    mappings = [{"id": r.id, "vat_rate": 20.0, "vat_amount": 2.0, "company_name": "ACME"} for r in receipts[:2]]
+    record_bulk_update(session, mappings)
+    session.bulk_update_mappings(Receipt, mappings)
+    session.commit()
+
+    aggregates = assert_matches_rebuild(session)
+    assert aggregates[(user.client_id, "2026-04", 20.0)]["pending_vat"] == 4.0
+    assert aggregates[(user.client_id, "2026-04", UNKNOWN_VAT_RATE)]["receipt_count"] == 1
+
+
+def test_interleaved_sessions_retract_the_committed_values(session, user, sqlite_engines):
+    target = receipt(user, datetime(2026, 5, 1), vat_amount=1.0, vat_rate=20.0)
+    session.add(target)
+    session.commit()
+    other = sessionmaker(bind=sqlite_engines[0])()
+    try:
+        # La session courante a chargé le reçu ; l'autre le modifie et commite entre-temps
+        loaded = session.get(Receipt, target.id)
+        mapping = {"id": target.id, "vat_rate": 10.0, "vat_amount": 3.0}
+        record_bulk_update(other, [mapping])
+        other.bulk_update_mappings(Receipt, [mapping])
+        other.commit()
+
+        loaded.invoice_received = True
+        session.commit()
+    finally:
+        other.close()
+
+    aggregates = assert_matches_rebuild(session)
+    assert (user.client_id, "2026-05", 20.0) not in aggregates
+    assert aggregates[(user.client_id, "2026-05", 10.0)]["recoverable_vat"] == 3.0
+
+
+def test_stored_values_are_read_with_a_row_lock():
+    assert "FOR UPDATE" in str(select_stored([1]).compile(dialect=postgresql.dialect()))
+
+
+def test_stats_endpoint_reads_the_aggregates(session, user, sqlite_engines):
+    session.add_all([
+        receipt(user, datetime(2026, 1, 5), vat_amount=10.0, vat_rate=20.0, invoice_received=True),
+        receipt(user, datetime(2026, 2, 5), vat_amount=4.0, vat_rate=20.0),
+        receipt(user, datetime(2026, 3, 5)),
+    ])
+    session.commit()
+
+    sessions = async_sessionmaker(sqlite_engines[1])
+
+    async def override_get_async_db_session():
+        async with sessions() as db:
+            yield db
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update({get_async_db_session: override_get_async_db_session,
+                                     auth.get_current_user: lambda: user})
+    try:
+        http = TestClient(app)
+        body = http.get("/dashboard/stats", params={"period_from": "2026-02"}).json()
+        assert http.get("/dashboard/stats", params={"period_to": "March"}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous)
+
+    assert [(item["period"], item["vat_rate"]) for item in body["items"]] == [("2026-02", 20.0), ("2026-03", None)]
+    assert body["totals"]["receipt_count"] == 2
+    assert body["totals"]["pending_vat"] == 4.0
+    assert body["totals"]["recoverable_vat"] == 0.0
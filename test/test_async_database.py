@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.auth import create_access_token
+from app.database import get_async_db_session, to_async_url
+from app.main import app
+from app.models import Client, Receipt, User
+
+
+def test_async_url_uses_the_async_driver_of_the_dialect():
+    assert to_async_url("postgresql://vat:s3cret@db:5432/vat") == "postgresql+asyncpg://vat:s3cret@db:5432/vat"
+    assert to_async_url("postgresql+psycopg2://db/vat") == "postgresql+asyncpg://db/vat"
+    assert to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    with pytest.raises(ValueError):
+        to_async_url("mysql://db/vat")
+
+
+@pytest.fixture
+def http(sqlite_engines):
+    sessions = async_sessionmaker(sqlite_engines[1], expire_on_commit=False)
+
+    async def override_get_async_db_session():
+        async with sessions() as db:
+            yield db
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_async_db_session] = override_get_async_db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+@pytest.fixture
+def user(sqlite_engines):
+    with sessionmaker(bind=sqlite_engines[0], expire_on_commit=False)() as session:
+        user = User(email="async@example.com", hashed_password="x", client=Client(name="Async Corp"))
+        session.add(Receipt(file="r.jpg", email_sent_to="factures@example.com", user=user, client=user.client))
+        session.commit()
+        return user
+
+
+def test_bearer_token_is_resolved_through_the_async_session(http, user):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+    assert http.get("/dashboard/me", headers=headers).json()["email"] == "async@example.com"
+    assert len(http.get("/internal-api/receipts", headers=headers).json()["items"]) == 1
+    assert http.get("/dashboard/me", headers={"Authorization": "Bearer invalid"}).status_code == 401
+    unknown = {"Authorization": f"Bearer {create_access_token({'sub': '9999'})}"}
+    assert http.get("/dashboard/receipts", headers=unknown).status_code == 401
+
+
+def test_api_token_is_resolved_through_the_async_session(http, user):
+    response = http.post("/api/upload", headers={"X-API-Token": "not-a-token"},
+                         files={"file": ("r.jpg", b"data", "image/jpeg")})
+    assert response.status_code == 403
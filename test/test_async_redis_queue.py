@@ -0,0 +1,146 @@
+import asyncio
+import os
+
+import fakeredis
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.queue.async_redis_queue import AsyncRedisQueue
+from app.queue.blob_store import LocalBlobStore
+from app.queue.codec import PayloadCodec
+from app.queue.redis_queue import RedisQueue
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def queue(server):
+    return AsyncRedisQueue(client=FakeRedis(server=server, decode_responses=True))
+
+
+@pytest.fixture
+def sync_queue(server):
+    return RedisQueue(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+
+
+@pytest.mark.asyncio
+async def test_enqueue_dequeue_complete(queue):
+    task_id = await queue.enqueue("ocr", {"receipt_id": 1}, priority="high")
+
+    task = await queue.dequeue("ocr", wait=False)
+
+    assert task["id"] == task_id
+    assert task["status"] == "processing"
+    assert await queue.complete_task("ocr", task_id, result={"ok": True})
+    assert (await queue.get_task_status(task_id))["result"] == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_many_is_pipelined_and_deduplicated(queue):
+    task_ids = await queue.enqueue_many("ocr", [{"receipt_id": 1}, {"receipt_id": 1}],
+                                        dedup_keys=["r1", "r1"])
+
+    assert task_ids[0] == task_ids[1]
+    assert len(await queue.dequeue_many("ocr", 10, timeout=0)) == 1
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_shared_with_sync_queue(queue, sync_queue):
+    task_id = await queue.enqueue("ocr", {"receipt_id": 1})
+
+    task = sync_queue.dequeue("ocr", wait=False)
+    sync_queue.fail_task("ocr", task["id"], "boom", retryable=False)
+
+    assert task["id"] == task_id
+    assert await queue.count_dead_letters("ocr") == 1
+    assert await queue.replay_dead_letters("ocr") == 1
+
+
+@pytest.mark.asyncio
+async def test_blocking_dequeue_wakes_up_on_enqueue(queue):
+    waiter = asyncio.create_task(queue.dequeue("ocr", timeout=2))
+    await asyncio.sleep(0.05)
+    task_id = await queue.enqueue("ocr", {"receipt_id": 1})
+
+    task = await asyncio.wait_for(waiter, 3)
+
+    assert task["id"] == task_id
+
+
+@pytest.mark.asyncio
+async def test_blocking_dequeue_can_be_cancelled(queue):
+    waiter = asyncio.create_task(queue.dequeue("ocr", timeout=0))
+    await asyncio.sleep(0.05)
+
+    waiter.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+
+@pytest.mark.asyncio
+async def test_fail_schedules_retry_and_reaper_requeues(queue):
+    queue.visibility_timeout = 0
+    task_id = await queue.enqueue("email", {"to": "a@b.c"})
+
+    await queue.dequeue("email", wait=False)
+    assert await queue.reap_expired("email") == (1, 0, None)
+
+    await queue.dequeue("email", wait=False)
+    assert await queue.fail_task("email", task_id, "SMTP down")
+    assert (await queue.get_task_status(task_id))["status"] == "retrying"
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_extends_lease(queue):
+    queue.visibility_timeout = 0.2
+    task_id = await queue.enqueue("ocr", {"receipt_id": 1})
+    await queue.dequeue("ocr", wait=False)
+
+    async with queue.keep_alive("ocr", task_id, interval=0.05):
+        await asyncio.sleep(0.3)
+        assert (await queue.reap_expired("ocr"))[:2] == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_complete_many_stats_and_dead_letters_match_sync_queue(queue, sync_queue):
+    task_ids = await queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(3)], client_id=5)
+    stats, sync_stats = await queue.get_queue_stats("ocr"), sync_queue.get_queue_stats("ocr")
+    assert stats.keys() == sync_stats.keys()
+    assert stats["depth"] == sync_stats["depth"] == stats["clients"]["5"]["depth"] == 3
+
+    await queue.dequeue_many("ocr", 3, timeout=0)
+    assert await queue.complete_many("ocr", {task_ids[0]: {"ok": True}, task_ids[1]: None}) == 2
+    await queue.fail_task("ocr", task_ids[2], "boom", retryable=False)
+
+    stats = await queue.get_queue_stats("ocr")
+    assert (stats["completed"], stats["processing"], stats["dead"]) == (2, 0, 1)
+    assert [task["id"] for task in await queue.list_dead_letters("ocr")] == [task_ids[2]]
+    assert await queue.purge_dead_letters("ocr") == 1
+    assert await queue.count_dead_letters("ocr") == 0
+
+
+@pytest.mark.asyncio
+async def test_blob_payloads_are_encoded_and_decoded_off_the_event_loop(server, tmp_path, monkeypatch):
+    queue = AsyncRedisQueue(client=FakeRedis(server=server, decode_responses=True),
+                            codec=PayloadCodec(compress_threshold=0, blob_threshold=1,
+                                               blob_store=LocalBlobStore(str(tmp_path))))
+    threads = []
+    real_to_thread = asyncio.to_thread
+
+    async def to_thread(func, *args):
+        threads.append(func)
+        return await real_to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+    task_id = await queue.enqueue("ocr", {"text": "x" * 100})
+    assert len(threads) == 1 and os.listdir(str(tmp_path)) == [task_id]
+
+    assert (await queue.get_task_status(task_id))["data"] == {"text": "x" * 100}
+    assert (await queue.dequeue("ocr", wait=False))["data"] == {"text": "x" * 100}
+    await queue.fail_task("ocr", task_id, "boom", retryable=False)
+    assert (await queue.list_dead_letters("ocr"))[0]["data"] == {"text": "x" * 100}
+    assert len(threads) == 5
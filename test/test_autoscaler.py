@@ -0,0 +1,81 @@
+import fakeredis
+import pytest
+
+from app.metrics.queue_metrics import QUEUE_RECOMMENDED_CONCURRENCY
+from app.queue.redis_queue import RedisQueue
+from app.tasks.autoscaler import Autoscaler
+from app.tasks.runtime import QueuePolicy, WorkerRuntime
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def queue(redis_client):
+    return RedisQueue(client=redis_client)
+
+
+def process(queue, redis_client, n, duration):
+    """Simule `n` tâches traitées en `duration` secondes chacune."""
+    tasks = queue.dequeue_many("ocr", n, timeout=0)
+    for task in tasks:
+        claimed_at = float(redis_client.hget(f"task:{task['id']}", "claimed_at"))
+        redis_client.hset(f"task:{task['id']}", "claimed_at", claimed_at - duration)
+    queue.complete_many("ocr", {task["id"]: None for task in tasks})
+
+
+def test_completions_feed_throughput_counters(queue, redis_client):
+    queue.enqueue_many("ocr", [{} for _ in range(3)])
+    process(queue, redis_client, 2, duration=1.5)
+
+    stats = queue.get_queue_stats("ocr")
+    assert stats["completed"] == 2
+    assert stats["busy_seconds"] == pytest.approx(3.0, abs=0.5)
+
+
+def test_without_completions_recommends_one_slot_per_busy_task(queue):
+    queue.enqueue_many("ocr", [{} for _ in range(5)])
+    queue.dequeue_many("ocr", 2, timeout=0)
+
+    assert Autoscaler(queue, queue_names=["ocr"]).observe("ocr", queue.get_queue_stats("ocr"), now=0) == 3
+
+
+def test_recommendation_follows_backlog_and_arrivals(queue, redis_client):
+    scaler = Autoscaler(queue, queue_names=["ocr"], target_drain_time=60, smoothing=1.0)
+    queue.enqueue_many("ocr", [{} for _ in range(100)])
+    scaler.observe("ocr", queue.get_queue_stats("ocr"), now=0)
+
+    # 10 tâches de 1,8 s traitées en 10 s, aucune arrivée : 90 tâches * 1,8 s à vider en 60 s
+    process(queue, redis_client, 10, duration=1.8)
+    assert scaler.observe("ocr", queue.get_queue_stats("ocr"), now=10) == 3
+
+    # Pic de fin de mois : 200 tâches arrivent en 10 s (20/s, 36 slots pour suivre)
+    # et 280 tâches * 1,8 s à vider en 60 s
+    queue.enqueue_many("ocr", [{} for _ in range(200)])
+    process(queue, redis_client, 10, duration=1.8)
+    assert scaler.observe("ocr", queue.get_queue_stats("ocr"), now=20) == 45
+
+    # Nuit : file vide
+    while queue.get_queue_stats("ocr")["depth"]:
+        process(queue, redis_client, 100, duration=1.8)
+    assert scaler.observe("ocr", queue.get_queue_stats("ocr"), now=3600) == 0
+
+
+def test_tick_publishes_recommendation(queue):
+    queue.enqueue_many("ocr", [{} for _ in range(4)])
+
+    assert Autoscaler(queue, queue_names=["ocr"]).tick() == {"ocr": 1}
+    assert QUEUE_RECOMMENDED_CONCURRENCY.labels("ocr")._value.get() == 1
+
+
+def test_apply_stays_within_bounds_and_delays_scale_down(queue):
+    runtime = WorkerRuntime(queue, {"ocr": QueuePolicy(concurrency=2, min_concurrency=1, max_concurrency=8)})
+    scaler = Autoscaler(queue, runtime, replicas=2, scale_down_delay=100)
+
+    assert scaler.apply("ocr", 10, now=1000) == 5
+    assert scaler.apply("ocr", 40, now=1010) == 8
+    assert scaler.apply("ocr", 2, now=1050) == 8
+    assert scaler.apply("ocr", 0, now=1200) == 1
+    assert runtime.policies["ocr"].concurrency == 1
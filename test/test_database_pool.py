@@ -0,0 +1,81 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+
+from app import database
+from app.database import POOL_PROFILES, configure_role, engine_options, pool_profile
+from app.metrics.db_metrics import instrument_engine, timed_pool_class
+
+
+def sample(name, role, engine="sync"):
+    return REGISTRY.get_sample_value(name, {"role": role, "engine": engine}) or 0
+
+
+def test_pool_profile_uses_role_defaults_and_settings_overrides(monkeypatch):
+    assert pool_profile("worker") == POOL_PROFILES["worker"]
+    monkeypatch.setattr(database.settings, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(database.settings, "DB_STATEMENT_TIMEOUT_MS", 0)
+    profile = pool_profile("api")
+    assert (profile.pool_size, profile.max_overflow, profile.statement_timeout_ms) == (20, 5, 0)
+    with pytest.raises(ValueError):
+        pool_profile("batch")
+
+
+def test_postgres_engines_get_pool_sizing_pre_ping_and_statement_timeout():
+    options = engine_options("postgresql://vat:s3cret@db/vat", "worker")
+    assert (options["pool_size"], options["max_overflow"], options["pool_pre_ping"]) == (4, 4, True)
+    assert issubclass(options["poolclass"], QueuePool)
+    assert options["connect_args"] == {"application_name": "vatrecovery-worker",
+                                       "options": "-c statement_timeout=120000"}
+
+    options = engine_options("postgresql+asyncpg://vat:s3cret@db/vat", "api")
+    assert options["connect_args"] == {"server_settings": {"application_name": "vatrecovery-api",
+                                                           "statement_timeout": "15000"}}
+
+    # Scheduler : pas de limite de durée des requêtes
+    assert "options" not in engine_options("postgresql://db/vat", "scheduler")["connect_args"]
+
+
+def test_sqlite_engines_keep_the_dialect_pool():
+    options = engine_options("sqlite://", "api")
+    assert options["poolclass"] is SingletonThreadPool
+    assert "pool_size" not in options
+
+
+def test_pool_metrics_record_checkouts_waits_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=timed_pool_class(QueuePool),
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    instrument_engine(engine, "test", "sync")
+    checkouts = sample("db_pool_checkout_seconds_count", "test")
+    timeouts = sample("db_pool_timeouts_total", "test")
+
+    with engine.connect():
+        assert sample("db_pool_checked_out", "test") == 1
+        assert sample("db_pool_size", "test") == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    assert sample("db_pool_checked_out", "test") == 0
+    assert sample("db_pool_checkout_seconds_count", "test") == checkouts + 2
+    assert sample("db_pool_timeouts_total", "test") == timeouts + 1
+    assert sample("db_pool_waits_total", "test") >= 1
+
+    # dispose() remplace le pool : l'instrumentation suit
+    engine.dispose()
+    engine.connect().close()
+    assert sample("db_pool_checkout_seconds_count", "test") == checkouts + 3
+
+
+def test_configure_role_rebinds_the_session_factories():
+    try:
+        configure_role("scheduler")
+        assert database.SessionLocal.session_factory.kw["bind"] is database.get_engine("scheduler")
+        assert database.engine is database.get_engine()
+        assert database.AsyncSessionLocal.kw["bind"] is database.async_engine
+    finally:
+        configure_role("api")
+    assert database.SessionLocal.session_factory.kw["bind"] is database.get_engine("api")
+    with pytest.raises(ValueError):
+        configure_role("batch")
@@ -0,0 +1,80 @@
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.query_plans import HOT_QUERIES, explain, sequential_scans
+
+
+@pytest.fixture
+def alembic_config(tmp_path):
+    config = Config("alembic.ini")
+    config.attributes["sqlalchemy.url"] = f"sqlite:///{tmp_path}/migrated.db"
+    return config
+
+
+@pytest.fixture
+def engine(alembic_config):
+    command.upgrade(alembic_config, "head")
+    return sa.create_engine(alembic_config.attributes["sqlalchemy.url"])
+
+
+def index_names(engine):
+    return {index["name"] for index in sa.inspect(engine).get_indexes("receipts")}
+
+
+def test_migrations_create_the_receipt_indexes(engine, alembic_config):
+    assert {"ix_receipts_reminder", "ix_receipts_client_keyset", "ix_receipts_user_keyset",
+            "ix_receipts_awaiting_invoice"} <= index_names(engine)
+    assert not {"ix_receipts_client_created", "ix_receipts_user_id"} & index_names(engine)
+
+    assert "receipts_fts" in sa.inspect(engine).get_table_names()
+
+    command.downgrade(alembic_config, "0001_initial_schema")
+    assert "ix_receipts_reminder" not in index_names(engine)
+    assert "receipts_fts" not in sa.inspect(engine).get_table_names()
+
+
+def test_migrations_adopt_a_database_created_from_the_models(alembic_config):
+    engine = sa.create_engine(alembic_config.attributes["sqlalchemy.url"])
+    Base.metadata.create_all(bind=engine)
+
+    command.upgrade(alembic_config, "head")
+
+    assert "ix_receipts_awaiting_invoice" in index_names(engine)
+
+
+def test_search_migration_indexes_existing_receipts(alembic_config):
+    command.upgrade(alembic_config, "0004_receipt_aggregates")
+    engine = sa.create_engine(alembic_config.attributes["sqlalchemy.url"])
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO clients (id, name) VALUES (1, 'Search Corp')")
+        connection.exec_driver_sql("INSERT INTO users (id, email, hashed_password, client_id) "
+                                   "VALUES (1, 'a@b.c', 'x', 1)")
+        connection.exec_driver_sql("INSERT INTO receipts (file, email_sent_to, company_name, user_id, client_id) "
+                                   "VALUES ('r.jpg', 'a@b.c', 'Boulangerie Paul', 1, 1)")
+
+    command.upgrade(alembic_config, "head")
+
+    with Session(engine) as session:
+        assert session.execute(HOT_QUERIES["search"](session)).all()
+
+
+def test_hot_queries_do_not_scan_the_receipts_table(engine):
+    with Session(engine) as session:
+        assert sequential_scans(session) == {}
+        assert "ix_receipts_client_keyset" in " ".join(explain(session, HOT_QUERIES["dashboard"](session)))
+        plan = explain(session, HOT_QUERIES["dashboard_next_page"](session))
+        assert "ix_receipts_client_keyset" in " ".join(plan)
+        assert not any("TEMP B-TREE" in line for line in plan)
+        assert "VIRTUAL TABLE INDEX" in " ".join(explain(session, HOT_QUERIES["search"](session)))
+
+
+def test_plan_check_detects_a_missing_index(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_receipts_user_keyset")
+
+    with Session(engine) as session:
+        assert list(sequential_scans(session)) == ["list_receipts"]
@@ -0,0 +1,52 @@
+import pytest
+
+from app.queue.blob_store import LocalBlobStore
+from app.queue.codec import BLOB_PREFIX, COMPRESSED_PREFIX, PayloadCodec
+
+
+def test_small_payload_stays_json():
+    codec = PayloadCodec()
+
+    assert codec.encode({"receipt_id": 1}) == '{"receipt_id":1}'
+    assert codec.decode('{"receipt_id": 1}') == {"receipt_id": 1}
+
+
+def test_large_payload_is_compressed():
+    codec = PayloadCodec(compress_threshold=100)
+    payload = {"text": "TOTAL TTC 12,00 EUR " * 200}
+
+    encoded = codec.encode(payload)
+
+    assert encoded.startswith(COMPRESSED_PREFIX)
+    assert len(encoded) < len(payload["text"]) / 4
+    assert codec.decode(encoded) == payload
+
+
+def test_bytes_payload_uses_msgpack():
+    codec = PayloadCodec()
+    payload = {"image": b"\x89PNG\r\n\x1a\n"}
+
+    assert codec.decode(codec.encode(payload)) == payload
+
+
+def test_huge_payload_is_offloaded_to_blob_store(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    codec = PayloadCodec(compress_threshold=10, blob_threshold=100, blob_store=store)
+    payload = {"image": bytes(range(256)) * 10}
+
+    encoded = codec.encode(payload, "task-1/data")
+
+    assert encoded == BLOB_PREFIX + "task-1/data"
+    assert list(store.task_ids()) == ["task-1"]
+    assert codec.decode(encoded) == payload
+
+    store.delete_task("task-1")
+    with pytest.raises(KeyError):
+        codec.decode(encoded)
+
+
+def test_blob_keys_cannot_escape_root(tmp_path):
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+
+    with pytest.raises(ValueError):
+        store.put("../outside", b"x")
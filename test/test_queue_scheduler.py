@@ -0,0 +1,103 @@
+import time
+
+import fakeredis
+import pytest
+
+from app.queue.redis_queue import RedisQueue
+from app.queue.scheduler import QueueScheduler, LEADER_LOCK_KEY
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def queue(redis_client):
+    return RedisQueue(client=redis_client)
+
+
+def test_only_one_scheduler_is_leader(queue):
+    first = QueueScheduler(queue, ["ocr"], instance_id="a")
+    second = QueueScheduler(queue, ["ocr"], instance_id="b")
+
+    assert first.acquire_leadership()
+    assert not second.acquire_leadership()
+    assert first.acquire_leadership()
+
+
+def test_leadership_moves_when_lock_expires(queue, redis_client):
+    first = QueueScheduler(queue, ["ocr"], instance_id="a")
+    second = QueueScheduler(queue, ["ocr"], instance_id="b")
+    first.acquire_leadership()
+
+    redis_client.delete(LEADER_LOCK_KEY)
+
+    assert second.acquire_leadership()
+    assert not first.acquire_leadership()
+    assert redis_client.get(LEADER_LOCK_KEY) == "b"
+
+
+def test_tick_promotes_due_tasks_and_sleeps_until_next_due(queue, redis_client):
+    scheduler = QueueScheduler(queue, ["email"], max_sleep=30, instance_id="a")
+    due_id = queue.enqueue("email", {"to": "a@b.c"}, delay=1)
+    queue.enqueue("email", {"to": "d@e.f"}, delay=10)
+    redis_client.zadd("delayed:email", {due_id: time.time() - 1})
+
+    sleep_for = scheduler.tick()
+
+    assert redis_client.lrange("queue:email:normal:_", 0, -1) == [due_id]
+    assert 8 < sleep_for <= 10
+
+
+def test_tick_does_not_sleep_when_batch_is_full(queue, redis_client):
+    scheduler = QueueScheduler(queue, ["ocr"], batch_size=2, instance_id="a")
+    task_ids = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(3)], delay=1)
+    redis_client.zadd("delayed:ocr", {t: time.time() - 1 for t in task_ids})
+
+    assert scheduler.tick() == 0.0
+    assert scheduler.tick() == scheduler.max_sleep
+    assert queue.get_queue_stats("ocr")["depth"] == 3
+
+
+def test_follower_does_not_promote(queue, redis_client):
+    redis_client.set(LEADER_LOCK_KEY, "someone-else")
+    scheduler = QueueScheduler(queue, ["ocr"], lock_ttl=10, instance_id="a")
+    task_id = queue.enqueue("ocr", {"receipt_id": 1}, delay=1)
+    redis_client.zadd("delayed:ocr", {task_id: time.time() - 1})
+
+    assert scheduler.tick() == 5.0
+    assert queue.get_queue_stats("ocr")["depth"] == 0
+
+
+def test_start_and_stop_release_the_lock(queue, redis_client):
+    scheduler = QueueScheduler(queue, ["ocr"], max_sleep=0.05, instance_id="a")
+
+    scheduler.start()
+    time.sleep(0.2)
+    scheduler.stop(timeout=2)
+
+    assert redis_client.get(LEADER_LOCK_KEY) is None
+
+
+def test_tick_publishes_per_client_depth(queue):
+    from app.metrics.queue_metrics import QUEUE_CLIENT_DEPTH
+
+    scheduler = QueueScheduler(queue, ["ocr"], instance_id="a")
+    queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(2)], client_id="acme")
+
+    scheduler.tick()
+
+    assert QUEUE_CLIENT_DEPTH.labels("ocr", "acme")._value.get() == 2
+
+
+def test_clients_without_ready_tasks_are_removed_from_the_gauges():
+    from app.metrics.queue_metrics import QUEUE_CLIENT_DEPTH, record_queue_stats
+
+    record_queue_stats("export", {"clients": {"acme": {"depth": 3, "oldest_wait": 1.0},
+                                              "globex": {"depth": 1, "oldest_wait": 0.5}}})
+    record_queue_stats("export", {"clients": {"globex": {"depth": 2, "oldest_wait": 0.2}}})
+
+    depths = {sample.labels["client"]: sample.value for metric in QUEUE_CLIENT_DEPTH.collect()
+              for sample in metric.samples if sample.labels["queue"] == "export"}
+    assert depths == {"globex": 2}
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+import redis
+from fakeredis import FakeRedis, FakeServer
+from fakeredis.aioredis import FakeRedis as AsyncFakeRedis
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import database, replica
+from app.auth import create_access_token
+from app.database import Base, RoutingSession, get_async_db_session, read_from_replica, to_async_url
+from app.main import app
+from app.models import Client, Receipt, User
+from app.replica import RecentWrites
+
+
+@pytest.fixture
+def replica_engine(tmp_path, monkeypatch):
+    """Second fichier SQLite jouant le réplica du primaire de sqlite_engines."""
+    url = f"sqlite:///{tmp_path}/replica.db"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(to_async_url(url), poolclass=NullPool)
+    monkeypatch.setattr(database, "get_replica_engine", lambda role=None: engine)
+    monkeypatch.setattr(database, "get_async_replica_engine", lambda role=None: async_engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def recent_writes(monkeypatch):
+    server = FakeServer()
+    tracker = RecentWrites(5, client=FakeRedis(server=server), async_client=AsyncFakeRedis(server=server))
+    monkeypatch.setattr(replica, "recent_writes", tracker)
+    return tracker
+
+
+def seed(engine, file):
+    """Même client et même utilisateur dans chaque base, avec un reçu propre à celle-ci."""
+    with sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        user = User(id=1, email="replica@example.com", hashed_password="x", client=Client(id=1, name="Replica Corp"))
+        session.add(Receipt(file=file, email_sent_to="factures@example.com", user=user, client=user.client))
+        session.commit()
+        return user
+
+
+def test_routing_session_reads_from_the_replica_until_it_writes(sqlite_engines, replica_engine):
+    seed(sqlite_engines[0], "primary.jpg")
+    seed(replica_engine, "replica.jpg")
+
+    session = RoutingSession(bind=sqlite_engines[0])
+    read_from_replica(session)
+    assert session.scalars(select(Receipt.file)).all() == ["replica.jpg"]
+
+    session.add(Receipt(file="new.jpg", email_sent_to="factures@example.com", client_id=1, user_id=1))
+    session.flush()
+    assert sorted(session.scalars(select(Receipt.file))) == ["new.jpg", "primary.jpg"]
+    session.close()
+    assert "replica" not in session.info
+
+
+def test_recent_writes_expire_per_client(recent_writes):
+    recent_writes.mark([1, None])
+    assert asyncio.run(recent_writes.is_recent(1))
+    assert not asyncio.run(recent_writes.is_recent(2))
+
+    recent_writes.window = 0
+    assert not asyncio.run(recent_writes.is_recent(1))
+
+
+def test_committed_receipt_writes_open_the_window_of_their_client(sqlite_engines, recent_writes):
+    seed(sqlite_engines[0], "primary.jpg")
+    assert asyncio.run(recent_writes.is_recent(1))
+    recent_writes.client.flushall()
+
+    with sessionmaker(bind=sqlite_engines[0])() as session:
+        session.add(Receipt(file="b.jpg", email_sent_to="factures@example.com", client_id=1, user_id=1))
+        session.flush()
+        session.rollback()
+        assert not asyncio.run(recent_writes.is_recent(1))
+
+        session.get(Receipt, 1).vat_amount = 2.0
+        session.commit()
+    assert asyncio.run(recent_writes.is_recent(1))
+
+
+def test_async_commits_mark_writes_without_the_blocking_client(sqlite_engines, recent_writes, monkeypatch):
+    seed(sqlite_engines[0], "primary.jpg")
+    recent_writes.client.flushall()
+    monkeypatch.setattr(recent_writes, "mark", lambda client_ids: pytest.fail("blocking Redis call on the loop"))
+
+    async def write():
+        async with async_sessionmaker(sqlite_engines[1])() as session:
+            (await session.get(Receipt, 1)).vat_amount = 3.0
+            await session.commit()
+        await asyncio.gather(*replica._pending_marks)
+        return await recent_writes.is_recent(1)
+
+    assert asyncio.run(write())
+
+
+def test_marking_failures_do_not_fail_the_commit(sqlite_engines, recent_writes):
+    class Unavailable:
+        def pipeline(self, transaction=True):
+            raise redis.ConnectionError("Redis down")
+
+    seed(sqlite_engines[0], "primary.jpg")
+    recent_writes._client = recent_writes._async_client = Unavailable()
+
+    with sessionmaker(bind=sqlite_engines[0])() as session:
+        session.get(Receipt, 1).vat_amount = 2.0
+        session.commit()
+
+    async def write():
+        async with async_sessionmaker(sqlite_engines[1])() as session:
+            (await session.get(Receipt, 1)).vat_amount = 3.0
+            await session.commit()
+        await asyncio.gather(*replica._pending_marks)
+
+    asyncio.run(write())
+    with sessionmaker(bind=sqlite_engines[0])() as session:
+        assert session.get(Receipt, 1).vat_amount == 3.0
+
+
+@pytest.fixture
+def http(sqlite_engines):
+    sessions = async_sessionmaker(sqlite_engines[1], expire_on_commit=False, sync_session_class=RoutingSession)
+
+    async def override_get_async_db_session():
+        async with sessions() as db:
+            yield db
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_async_db_session] = override_get_async_db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+def test_dashboard_reads_from_the_primary_right_after_a_client_write(http, sqlite_engines, replica_engine,
+                                                                    recent_writes):
+    user = seed(sqlite_engines[0], "primary.jpg")
+    seed(replica_engine, "replica.jpg")
+    recent_writes.client.flushall()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+    def files():
+        return [item["file"] for item in http.get("/dashboard/receipts", headers=headers).json()["items"]]
+
+    assert files() == ["replica.jpg"]
+    recent_writes.mark([user.client_id])
+    assert files() == ["primary.jpg"]
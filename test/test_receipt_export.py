@@ -0,0 +1,104 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import auth, export
+from app.database import Base, get_db_session
+from app.export import export_receipts, quarter_bounds
+from app.main import app
+from app.models import Client, Receipt, User
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(session):
+    client, other = Client(name="Export Corp"), Client(name="Other Corp")
+    user = User(email="export@example.com", hashed_password="x", client=client)
+    other_user = User(email="other@example.com", hashed_password="x", client=other)
+    session.add_all([user, other_user])
+    # Un reçu tous les 3 jours de décembre 2025 à mai 2026, plus un reçu d'un autre client
+    for i in range(60):
+        session.add(Receipt(file=f"r{i}.jpg", email_sent_to="factures@example.com", user=user, client=client,
+                            company_name=f"Fournisseur, n°{i}", price_ttc=10.0 + i,
+                            created_at=datetime(2025, 12, 1) + timedelta(days=3 * i)))
+    session.add(Receipt(file="other.jpg", email_sent_to="x@example.com", user=other_user, client=other,
+                        created_at=datetime(2026, 2, 1)))
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def http(session, user):
+    def override_get_db_session():
+        yield session
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update({get_db_session: override_get_db_session, auth.get_current_user: lambda: user})
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+def test_quarter_bounds():
+    assert quarter_bounds("2026-Q1") == (datetime(2026, 1, 1), datetime(2026, 4, 1))
+    assert quarter_bounds("2026q4") == (datetime(2026, 10, 1), datetime(2027, 1, 1))
+    with pytest.raises(ValueError):
+        quarter_bounds("2026-Q5")
+
+
+def test_csv_export_of_a_quarter(http, session, user):
+    response = http.get("/dashboard/receipts/export", params={"quarter": "2026-Q1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert f'filename="receipts-{user.client_id}-2026-Q1.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    q1 = [r for r in session.query(Receipt).filter_by(client_id=user.client_id)
+          if datetime(2026, 1, 1) <= r.created_at < datetime(2026, 4, 1)]
+    assert [int(row["id"]) for row in rows] == [r.id for r in q1]
+    assert rows[0]["company_name"] == q1[0].company_name
+    assert "ocr_text" not in rows[0]
+
+
+def test_gzip_jsonl_export(http):
+    response = http.get("/dashboard/receipts/export", params={"format": "jsonl", "gzip": "true"})
+
+    assert response.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert len(lines) == 60
+    assert json.loads(lines[-1])["created_at"] == (datetime(2025, 12, 1) + timedelta(days=177)).isoformat()
+
+
+def test_invalid_export_parameters(http):
+    assert http.get("/dashboard/receipts/export", params={"quarter": "T1"}).status_code == 400
+    assert http.get("/dashboard/receipts/export", params={"format": "xml"}).status_code == 422
+    params = {"quarter": "2026-Q1", "created_from": "2026-02-01T00:00:00"}
+    assert http.get("/dashboard/receipts/export", params=params).status_code == 400
+
+
+def test_export_is_streamed_in_bounded_chunks(session, user, monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_SIZE", 512)
+
+    chunks = export_receipts(session, user.client_id, batch_size=7)
+    first = next(chunks)
+    chunks = [first, *chunks]
+
+    assert len(chunks) > 3
+    assert all(len(chunk) < 512 + 200 for chunk in chunks)
+    assert b"".join(chunks).count(b"\n") == 61
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, dependencies
+from app.database import get_async_db_session
+from app.main import app
+from app.models import Client, Receipt, User
+from app.pagination import encode_cursor
+
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def session(sqlite_engines):
+    session = sessionmaker(bind=sqlite_engines[0])()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(session):
+    client = Client(name="Keyset Corp")
+    user = User(email="keyset@example.com", hashed_password="x", client=client)
+    session.add(user)
+    # 25 reçus, dont trois paires créées au même instant pour exercer le départage par id
+    for i in range(25):
+        session.add(Receipt(
+            file=f"r{i}.jpg", email_sent_to="factures@example.com", user=user, client=client,
+            created_at=START + timedelta(days=i // 2 if i < 6 else i),
+            invoice_received=i % 3 == 0, email_sent=i % 2 == 0, ocr_text="TOTAL TTC 12,00 " * 200,
+        ))
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def http(sqlite_engines, user):
+    sessions = async_sessionmaker(sqlite_engines[1], expire_on_commit=False)
+
+    async def override_get_async_db_session():
+        async with sessions() as db:
+            yield db
+
+    overrides = {
+        get_async_db_session: override_get_async_db_session,
+        auth.get_current_user: lambda: user,
+        dependencies.get_current_user: lambda: user,
+    }
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update(overrides)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+def expected_ids(session, **filters):
+    receipts = Receipt.filter_listing(session.query(Receipt), **filters).all()
+    return [r.id for r in sorted(receipts, key=lambda r: (r.created_at, r.id), reverse=True)]
+
+
+@pytest.mark.parametrize("path", ["/dashboard/receipts", "/internal-api/receipts"])
+def test_pages_cover_every_receipt_once_in_both_directions(http, session, path):
+    pages, cursor = [], None
+    while True:
+        body = http.get(path, params={"limit": 7, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append(body)
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(page["items"]) for page in pages] == [7, 7, 7, 4]
+    assert [item["id"] for page in pages for item in page["items"]] == expected_ids(session)
+    assert pages[0]["prev_cursor"] is None
+
+    # Retour en arrière depuis la dernière page
+    previous = http.get(path, params={"limit": 7, "cursor": pages[-1]["prev_cursor"]}).json()
+    assert previous["items"] == pages[-2]["items"]
+    assert previous["next_cursor"] is not None
+
+
+def test_filters_are_applied_before_paging(http, session):
+    params = {"invoice_received": "false", "email_sent": "true",
+              "created_from": (START + timedelta(days=2)).isoformat(), "limit": 3}
+    first = http.get("/dashboard/receipts", params=params).json()
+    second = http.get("/dashboard/receipts", params={**params, "cursor": first["next_cursor"]}).json()
+
+    expected = expected_ids(session, invoice_received=False, email_sent=True, created_from=START + timedelta(days=2))
+    assert [item["id"] for item in first["items"] + second["items"]] == expected[:6]
+    assert all(item["email_sent"] and not item["invoice_received"] for item in first["items"])
+
+
+def test_page_size_is_bounded(http):
+    assert http.get("/internal-api/receipts", params={"limit": 500}).status_code == 422
+    assert http.get("/internal-api/receipts", params={"limit": 0}).status_code == 422
+
+
+def test_invalid_cursor_is_rejected(http):
+    response = http.get("/dashboard/receipts", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    unknown_direction = encode_cursor(START, 1, "sideways")
+    assert http.get("/dashboard/receipts", params={"cursor": unknown_direction}).status_code == 400
+
+
+@pytest.fixture
+def statements(sqlite_engines):
+    """Requêtes SQL exécutées par les endpoints pendant le test."""
+    executed = []
+    listener = lambda conn, cursor, statement, *args: executed.append(statement)
+    event.listen(sqlite_engines[1].sync_engine, "before_cursor_execute", listener)
+    yield executed
+    event.remove(sqlite_engines[1].sync_engine, "before_cursor_execute", listener)
+
+
+def test_listing_never_reads_ocr_text(http, statements):
+    items = http.get("/internal-api/receipts").json()["items"]
+
+    assert "ocr_text" not in items[0]
+    assert {"file", "company_name", "invoice_received"} <= set(items[0])
+    assert not any("ocr_text" in statement for statement in statements)
+
+
+@pytest.mark.parametrize("path", ["/dashboard/receipts", "/internal-api/receipts"])
+def test_sparse_fieldset_selects_only_the_requested_columns(http, statements, path):
+    first = http.get(path, params={"fields": "price_ttc,company_name", "limit": 2}).json()
+    second = http.get(path, params={"fields": "price_ttc,company_name", "cursor": first["next_cursor"]}).json()
+
+    assert set(first["items"][0]) == {"id", "created_at", "price_ttc", "company_name"}
+    assert second["items"][0]["id"] < first["items"][-1]["id"]
+    select = next(statement for statement in statements if "FROM receipts" in statement)
+    assert "file" not in select.split("FROM")[0]
+
+
+def test_unknown_or_full_text_fields_are_rejected(http):
+    assert http.get("/internal-api/receipts", params={"fields": "id,password"}).status_code == 400
+    assert http.get("/internal-api/receipts", params={"fields": "ocr_text"}).status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/dashboard/receipts", "/internal-api/receipts"])
+def test_detail_endpoint_returns_the_full_text(http, session, path):
+    receipt = session.query(Receipt).first()
+
+    body = http.get(f"{path}/{receipt.id}").json()
+    assert body["ocr_text"].startswith("TOTAL TTC")
+
+    assert http.get(f"{path}/999999").status_code == 404
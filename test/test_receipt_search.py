@@ -0,0 +1,129 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import auth
+from app.database import get_async_db_session
+from app.main import app
+from app.models import Client, Receipt, User
+from app.search import POSTGRES_DDL, SEARCH_VECTOR, TEXT_SEARCH_CONFIG, search_terms, select_search
+
+
+@pytest.fixture
+def session(sqlite_engines):
+    session = sessionmaker(bind=sqlite_engines[0])()
+    yield session
+    session.close()
+
+
+def add_receipt(session, user, company_name=None, ocr_text=None):
+    receipt = Receipt(file="r.jpg", email_sent_to="factures@example.com", user=user, client=user.client,
+                      company_name=company_name, ocr_text=ocr_text)
+    session.add(receipt)
+    session.flush()
+    return receipt
+
+
+@pytest.fixture
+def user(session):
+    user = User(email="search@example.com", hashed_password="x", client=Client(name="Search Corp"))
+    other = User(email="other@example.com", hashed_password="x", client=Client(name="Other Corp"))
+    add_receipt(session, user, "Boulangerie Paul", "PAIN AU CHOCOLAT 1,20 TOTAL TTC 2,40")
+    add_receipt(session, user, "Station Total", "GAZOLE 45,00 L boulangerie voisine")
+    add_receipt(session, user, "L'Oréal", "SHAMPOOING 6,90")
+    add_receipt(session, other, "Boulangerie Paul", "BAGUETTE 1,10")
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def http(sqlite_engines, user):
+    sessions = async_sessionmaker(sqlite_engines[1], expire_on_commit=False)
+
+    async def override_get_async_db_session():
+        async with sessions() as db:
+            yield db
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update({get_async_db_session: override_get_async_db_session,
+                                     auth.get_current_user: lambda: user})
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+def search(session, client_id, q):
+    return [row.company_name for row in session.execute(select_search("sqlite", client_id, q, ["company_name"]))]
+
+
+def test_search_matches_prefixes_of_every_word_within_the_client(session, user):
+    assert search(session, user.client_id, "boul paul") == ["Boulangerie Paul"]
+    assert search(session, user.client_id, "gazol") == ["Station Total"]
+    # Accents ignorés, ponctuation et opérateurs FTS neutralisés
+    assert search(session, user.client_id, 'oreal" OR *') == ["L'Oréal"]
+    assert search(session, user.client_id, "croissant") == []
+
+
+def test_vendor_matches_rank_above_ocr_text_matches(session, user):
+    assert search(session, user.client_id, "boulangerie") == ["Boulangerie Paul", "Station Total"]
+
+
+def test_index_follows_orm_and_bulk_writes(session, user):
+    receipt = add_receipt(session, user, ocr_text="CAFE 2,00")
+    session.commit()
+    assert search(session, user.client_id, "cafe") == [None]
+
+    receipt.company_name = "Café de Flore"
+    session.commit()
+    assert search(session, user.client_id, "flore") == ["Café de Flore"]
+
+    session.bulk_update_mappings(Receipt, [{"id": receipt.id, "ocr_text": "THE 3,50"}])
+    session.commit()
+    assert search(session, user.client_id, "cafe") == ["Café de Flore"]
+    assert search(session, user.client_id, "the") == ["Café de Flore"]
+
+    session.delete(receipt)
+    session.commit()
+    assert search(session, user.client_id, "flore") == []
+
+
+def test_postgres_search_uses_the_tsvector_column():
+    sql = str(select_search("postgresql", 1, "Boul, Paul!", ["id", "company_name"])
+              .compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "receipts.search_vector @@ to_tsquery('receipts_search'::regconfig, 'boul:* & paul:*')" in sql
+    assert "ORDER BY ts_rank_cd(receipts.search_vector" in sql
+    assert search_terms("  ") == [] and select_search("postgresql", 1, "--") is None
+
+
+def test_accents_are_ignored_on_both_backends(session, user):
+    add_receipt(session, user, "Cafe de la Gare")
+    session.commit()
+    assert search(session, user.client_id, "café") == ["Cafe de la Gare"]
+    assert search(session, user.client_id, "OREAL") == ["L'Oréal"]
+
+    # Postgres : même repliement, dans la colonne indexée comme dans la requête
+    migration = Path(__file__).parent.parent / "app" / "migrations" / "versions" / "0005_receipt_search.py"
+    spec = importlib.util.spec_from_file_location("receipt_search_migration", migration)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.SEARCH_VECTOR == SEARCH_VECTOR
+    assert SEARCH_VECTOR.count(f"to_tsvector('{TEXT_SEARCH_CONFIG}'") == 2
+    for ddl in (" ".join(POSTGRES_DDL), module.CREATE_TEXT_SEARCH_CONFIG):
+        assert "WITH unaccent, simple" in " ".join(ddl.split())
+
+
+def test_search_endpoint_returns_ranked_projected_results(http, user):
+    response = http.get("/dashboard/receipts/search", params={"q": "boulangerie", "fields": "company_name"})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["company_name"] for item in items] == ["Boulangerie Paul", "Station Total"]
+    assert set(items[0]) == {"id", "created_at", "company_name"}
+
+    assert len(http.get("/dashboard/receipts/search", params={"q": "boulangerie", "limit": 1,
+                                                              "offset": 1}).json()["items"]) == 1
+    assert http.get("/dashboard/receipts/search", params={"q": "!!"}).status_code == 400
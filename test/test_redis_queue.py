@@ -0,0 +1,537 @@
+import os
+import time
+
+import fakeredis
+import pytest
+
+from app.queue.redis_queue import RedisQueue
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def queue(redis_client):
+    return RedisQueue(client=redis_client)
+
+
+def test_dequeue_marks_task_processing(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"type": "ocr_receipt", "receipt_id": 1})
+
+    task = queue.dequeue("ocr", wait=False)
+
+    assert task["id"] == task_id
+    assert task["status"] == "processing"
+    assert task["data"] == {"type": "ocr_receipt", "receipt_id": 1}
+    assert redis_client.lrange("processing:ocr", 0, -1) == [task_id]
+    assert redis_client.hget(f"task:{task_id}", "status") == "processing"
+
+
+def test_dequeue_empty_queue_returns_none(queue):
+    assert queue.dequeue("ocr", wait=False) is None
+    assert queue.dequeue("ocr", wait=True, timeout=1) is None
+
+
+def test_promote_delayed_moves_due_tasks_once(queue, redis_client):
+    task_id = queue.enqueue("email", {"type": "send_invoice_email"}, delay=1)
+    later_id = queue.enqueue("email", {"type": "send_invoice_email"}, delay=3600)
+    redis_client.zadd("delayed:email", {task_id: time.time() - 1})
+
+    assert queue.dequeue("email", wait=False) is None
+    moved, next_due = queue.promote_delayed("email")
+
+    assert moved == 1
+    assert next_due == redis_client.zscore("delayed:email", later_id)
+    assert queue.promote_delayed("email")[0] == 0
+    assert queue.dequeue("email", wait=False)["id"] == task_id
+    assert queue.dequeue("email", wait=False) is None
+
+
+def test_promote_delayed_respects_batch_limit(queue, redis_client):
+    task_ids = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(5)], delay=1)
+    redis_client.zadd("delayed:ocr", {t: time.time() - 1 for t in task_ids})
+
+    assert queue.process_delayed_tasks("ocr", limit=3) == 3
+    assert queue.get_queue_stats("ocr")["depth"] == 3
+    assert queue.promote_delayed("ocr", limit=3) == (2, None)
+
+
+def test_dequeue_skips_orphan_ids(queue, redis_client):
+    redis_client.lpush("queue:ocr", "ghost")
+    task_id = queue.enqueue("ocr", {"receipt_id": 2})
+
+    task = queue.dequeue("ocr", wait=False)
+
+    assert task["id"] == task_id
+    assert "ghost" not in redis_client.lrange("processing:ocr", 0, -1)
+
+
+
+def test_legacy_queue_items_leave_ready_tokens_alone(queue, redis_client):
+    redis_client.hset("task:legacy", mapping={"id": "legacy", "queue": "ocr", "status": "pending"})
+    redis_client.lpush("queue:ocr", "legacy")
+    # Jeton d'une tâche en sous-file dont l'enqueue est en cours
+    redis_client.lpush("ready:ocr", "1")
+
+    assert queue.dequeue("ocr", wait=False)["id"] == "legacy"
+    assert redis_client.llen("ready:ocr") == 1
+
+def test_complete_task_stores_result(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+
+    assert queue.complete_task("ocr", task_id, result={"price_ttc": "12.00"})
+
+    status = queue.get_task_status(task_id)
+    assert status["status"] == "completed"
+    assert status["result"] == {"price_ttc": "12.00"}
+    assert redis_client.llen("processing:ocr") == 0
+
+
+def test_complete_many_finishes_tasks_in_one_round_trip(queue, redis_client):
+    ids = queue.enqueue_many("ocr", [{"receipt_id": n} for n in range(3)])
+    queue.dequeue_many("ocr", 3, timeout=0)
+
+    assert queue.complete_many("ocr", {ids[0]: {"n": 0}, ids[1]: None, "missing": None}) == 2
+
+    assert queue.get_task_status(ids[0])["result"] == {"n": 0}
+    assert queue.get_task_status(ids[1])["status"] == "completed"
+    assert queue.get_task_status(ids[2])["status"] == "processing"
+    assert redis_client.llen("processing:ocr") == 1
+
+
+def test_fail_task_schedules_retry_with_backoff(queue, redis_client):
+    task_id = queue.enqueue("email", {"to": "a@b.c"})
+    queue.dequeue("email", wait=False)
+    before = time.time()
+
+    assert queue.fail_task("email", task_id, "SMTP down")
+
+    status = queue.get_task_status(task_id)
+    assert status["status"] == "retrying"
+    assert status["error"] == "SMTP down"
+    assert status["attempts"] == "1"
+    retry_at = redis_client.zscore("delayed:email", task_id)
+    assert before + queue.retry_base_delay / 2 <= retry_at <= time.time() + queue.retry_base_delay
+    assert float(status["retry_at"]) == pytest.approx(retry_at)
+    assert redis_client.llen("processing:email") == 0
+
+
+def test_backoff_grows_and_task_is_dead_lettered_after_max_attempts(redis_client):
+    queue = RedisQueue(client=redis_client, max_attempts=3, retry_base_delay=10, retry_max_delay=25)
+    task_id = queue.enqueue("email", {"to": "a@b.c"})
+    delays = []
+
+    for _ in range(3):
+        redis_client.zadd("delayed:email", {task_id: 0})
+        queue.process_delayed_tasks("email")
+        queue.dequeue("email", wait=False)
+        now = time.time()
+        queue.fail_task("email", task_id, "SMTP down")
+        if redis_client.zscore("delayed:email", task_id):
+            delays.append(redis_client.zscore("delayed:email", task_id) - now)
+
+    assert 5 <= delays[0] <= 10
+    assert 10 <= delays[1] <= 20
+    assert len(delays) == 2
+    assert queue.get_task_status(task_id)["status"] == "failed"
+    assert redis_client.lrange("dead:email", 0, -1) == [task_id]
+
+
+def test_non_retryable_failure_goes_straight_to_dead_letters(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": None})
+    queue.dequeue("ocr", wait=False)
+
+    queue.fail_task("ocr", task_id, "Missing receipt_id", retryable=False)
+
+    assert queue.get_task_status(task_id)["status"] == "failed"
+    assert redis_client.zcard("delayed:ocr") == 0
+    assert queue.count_dead_letters("ocr") == 1
+
+
+def test_dead_letter_inspect_replay_and_purge(queue, redis_client):
+    task_ids = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(3)])
+    for task in queue.dequeue_many("ocr", 3, timeout=0):
+        queue.fail_task("ocr", task["id"], "boom", retryable=False)
+
+    listed = queue.list_dead_letters("ocr")
+    assert [t["id"] for t in listed] == task_ids
+    assert [t["id"] for t in queue.list_dead_letters("ocr", start=1, count=1)] == [task_ids[1]]
+
+    assert queue.replay_dead_letters("ocr", task_ids=[task_ids[0]]) == 1
+    assert queue.replay_dead_letters("ocr", limit=1) == 1
+    queue.process_delayed_tasks("ocr")
+    replayed = queue.dequeue_many("ocr", 5, timeout=0)
+    assert sorted(t["id"] for t in replayed) == sorted(task_ids[:2])
+    assert all(t["attempts"] == "1" and "error" not in t for t in replayed)
+
+    assert queue.purge_dead_letters("ocr") == 1
+    assert queue.get_task_status(task_ids[2]) is None
+    assert queue.count_dead_letters("ocr") == 0
+
+
+def test_requeue_task_moves_back_to_queue(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+
+    assert queue.requeue_task("ocr", task_id)
+
+    assert redis_client.lrange("queue:ocr:normal:_", 0, -1) == [task_id]
+    assert redis_client.llen("processing:ocr") == 0
+    assert queue.dequeue("ocr", wait=False)["id"] == task_id
+
+
+def test_operations_on_unknown_task_return_false(queue):
+    assert queue.complete_task("ocr", "missing") is False
+    assert queue.fail_task("ocr", "missing", "boom") is False
+    assert queue.requeue_task("ocr", "missing") is False
+
+
+def test_enqueue_many_returns_ids_in_order(queue, redis_client):
+    payloads = [{"receipt_id": i} for i in range(5)]
+
+    task_ids = queue.enqueue_many("ocr", payloads)
+
+    assert len(task_ids) == 5
+    assert queue.get_queue_stats("ocr")["depth"] == 5
+    assert [queue.get_task_status(t)["data"] for t in task_ids] == payloads
+
+
+def test_enqueue_many_with_delay(queue, redis_client):
+    task_ids = queue.enqueue_many("email", [{"to": "a@b.c"}, {"to": "d@e.f"}], delay=60)
+
+    assert redis_client.zcard("delayed:email") == 2
+    assert queue.get_queue_stats("email")["depth"] == 0
+    assert queue.enqueue_many("email", []) == []
+    assert len(set(task_ids)) == 2
+
+
+def test_dequeue_many_claims_up_to_n_in_fifo_order(queue, redis_client):
+    task_ids = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(5)])
+
+    tasks = queue.dequeue_many("ocr", 3, timeout=0)
+
+    assert [t["id"] for t in tasks] == task_ids[:3]
+    assert all(t["status"] == "processing" for t in tasks)
+    assert redis_client.llen("processing:ocr") == 3
+    assert len(queue.dequeue_many("ocr", 10, timeout=0)) == 2
+    assert queue.dequeue_many("ocr", 10, timeout=0) == []
+
+
+def test_dequeue_many_with_task_types_leaves_other_types_in_place(queue, redis_client):
+    first = queue.enqueue("ocr", {"type": "a", "n": 0})
+    other = queue.enqueue("ocr", {"type": "b", "n": 1})
+    second = queue.enqueue("ocr", {"type": "a", "n": 2})
+    third = queue.enqueue("ocr", {"type": "a", "n": 3}, client_id="acme")
+
+    tasks = queue.dequeue_many("ocr", 5, timeout=0, task_types=["a"])
+
+    assert [t["id"] for t in tasks] == [first, second, third]
+    # La tâche de type "b" n'est pas réclamée : aucun essai, pas de jeton perdu
+    assert queue.get_task_status(other)["status"] == "pending"
+    assert "attempts" not in queue.get_task_status(other)
+    assert redis_client.llen("ready:ocr") == 1
+    assert queue.dequeue_many("ocr", 5, timeout=0, task_types=["a"]) == []
+    assert queue.dequeue("ocr", wait=False)["id"] == other
+
+
+def test_claim_sets_lease_and_completion_releases_it(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    before = time.time()
+
+    task = queue.dequeue("ocr", wait=False)
+
+    deadline = redis_client.zscore("leases:ocr", task_id)
+    assert float(task["claimed_at"]) >= before
+    assert deadline == pytest.approx(float(task["claimed_at"]) + queue.visibility_timeout)
+    queue.complete_task("ocr", task_id)
+    assert redis_client.zcard("leases:ocr") == 0
+
+
+def test_heartbeat_extends_lease_until_lost(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+
+    assert queue.heartbeat("ocr", task_id, extend=3600)
+    assert redis_client.zscore("leases:ocr", task_id) > time.time() + 3000
+
+    queue.complete_task("ocr", task_id)
+    assert queue.heartbeat("ocr", task_id) is False
+
+
+def test_reaper_requeues_then_dead_letters_expired_leases(redis_client):
+    queue = RedisQueue(client=redis_client, visibility_timeout=0, max_lease_expiries=2)
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+
+    queue.dequeue("ocr", wait=False)
+    assert queue.reap_expired("ocr") == (1, 0, None)
+    assert redis_client.llen("processing:ocr") == 0
+    assert queue.get_task_status(task_id)["status"] == "pending"
+
+    queue.dequeue("ocr", wait=False)
+    assert queue.reap_expired("ocr") == (0, 1, None)
+    status = queue.get_task_status(task_id)
+    assert status["status"] == "failed"
+    assert status["error"] == "Lease expired"
+    assert redis_client.lrange("dead:ocr", 0, -1) == [task_id]
+    assert queue.get_queue_stats("ocr")["depth"] == 0
+
+
+def test_reaper_leaves_live_leases_alone(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+
+    requeued, dead, next_expiry = queue.reap_expired("ocr")
+
+    assert (requeued, dead) == (0, 0)
+    assert next_expiry == redis_client.zscore("leases:ocr", task_id)
+    assert redis_client.lrange("processing:ocr", 0, -1) == [task_id]
+
+
+def test_keep_alive_heartbeats_in_background(redis_client):
+    queue = RedisQueue(client=redis_client, visibility_timeout=0.3)
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+
+    with queue.keep_alive("ocr", task_id, interval=0.05):
+        time.sleep(0.5)
+        assert queue.reap_expired("ocr")[:2] == (0, 0)
+
+    assert "heartbeat_at" in queue.get_task_status(task_id)
+
+
+def test_high_priority_is_served_before_normal_and_low(queue):
+    low = queue.enqueue("ocr", {"receipt_id": 1}, priority="low")
+    normal = queue.enqueue("ocr", {"receipt_id": 2})
+    high = queue.enqueue("ocr", {"receipt_id": 3}, priority="high")
+
+    assert [t["id"] for t in queue.dequeue_many("ocr", 3, timeout=0)] == [high, normal, low]
+
+    with pytest.raises(ValueError):
+        queue.enqueue("ocr", {"receipt_id": 4}, priority="urgent")
+
+
+def test_clients_are_served_round_robin(queue):
+    bulk = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(4)], client_id=1)
+    small = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(2)], client_id=2)
+
+    served = [t["id"] for t in queue.dequeue_many("ocr", 6, timeout=0)]
+
+    assert served == [bulk[0], small[0], bulk[1], small[1], bulk[2], bulk[3]]
+
+
+def test_client_weight_sets_share_per_round(queue):
+    queue.set_client_weight("ocr", 1, 2)
+    heavy = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(4)], client_id=1)
+    light = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(2)], client_id=2)
+
+    served = [t["id"] for t in queue.dequeue_many("ocr", 6, timeout=0)]
+
+    assert served == [heavy[0], heavy[1], light[0], heavy[2], heavy[3], light[1]]
+
+
+def test_blocking_dequeue_wakes_on_ready_token(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1}, client_id=7)
+    redis_client.delete("ready:ocr")
+    redis_client.rpush("ready:ocr", "1")
+    # Le jeton seul suffit : la tâche est déjà dans sa sous-file
+    assert queue.dequeue("ocr", wait=True, timeout=1)["id"] == task_id
+    assert redis_client.llen("ready:ocr") == 0
+
+
+def test_queue_stats_per_client(queue):
+    queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(3)], client_id=1)
+    queue.enqueue("ocr", {"receipt_id": 9}, client_id=2, priority="high")
+    queue.enqueue("ocr", {"receipt_id": 10}, delay=60)
+    queue.dequeue("ocr", wait=False)
+
+    stats = queue.get_queue_stats("ocr")
+
+    assert stats["depth"] == 3
+    assert stats["processing"] == 1
+    assert stats["delayed"] == 1
+    assert stats["clients"] == {"1": {"depth": 3, "oldest_wait": pytest.approx(0, abs=5)}}
+
+
+def test_dequeue_records_priority_and_client(queue):
+    queue.enqueue("ocr", {"receipt_id": 1}, priority="high", client_id=42)
+
+    task = queue.dequeue("ocr", wait=False)
+
+    assert (task["priority"], task["client"]) == ("high", "42")
+    assert float(task["enqueued_at"]) <= time.time()
+
+
+def test_finished_tasks_expire_after_ttl(redis_client):
+    queue = RedisQueue(client=redis_client, completed_ttl=60, failed_ttl=3600)
+    done_id, failed_id = queue.enqueue_many("ocr", [{"receipt_id": 1}, {"receipt_id": 2}])
+    queue.dequeue_many("ocr", 2, timeout=0)
+
+    queue.complete_task("ocr", done_id, result={"ok": True})
+    queue.fail_task("ocr", failed_id, "boom", retryable=False)
+
+    assert 0 < redis_client.ttl(f"task:{done_id}") <= 60
+    assert 60 < redis_client.ttl(f"task:{failed_id}") <= 3600
+
+    queue.replay_dead_letters("ocr")
+    assert redis_client.ttl(f"task:{failed_id}") == -1
+
+
+def test_large_payloads_are_stored_compressed(redis_client, tmp_path):
+    from app.queue.blob_store import LocalBlobStore
+    from app.queue.codec import PayloadCodec
+
+    codec = PayloadCodec(compress_threshold=100, blob_threshold=2000,
+                         blob_store=LocalBlobStore(str(tmp_path)))
+    queue = RedisQueue(client=redis_client, codec=codec)
+    text = {"text": "TVA 20% " * 500}
+    image = {"image": os.urandom(4000)}
+
+    text_id, image_id = queue.enqueue("ocr", text), queue.enqueue("ocr", image)
+
+    assert redis_client.hget(f"task:{text_id}", "data").startswith("z:")
+    assert redis_client.hget(f"task:{image_id}", "data") == f"blob:{image_id}/data"
+    assert [t["data"] for t in queue.dequeue_many("ocr", 2, timeout=0)] == [text, image]
+
+
+def test_compact_reencodes_and_expires_old_tasks(redis_client, tmp_path):
+    from app.queue.blob_store import LocalBlobStore
+    from app.queue.codec import PayloadCodec
+
+    legacy = RedisQueue(client=redis_client)
+    done_id = legacy.enqueue("ocr", {"receipt_id": 1})
+    running_id = legacy.enqueue("ocr", {"receipt_id": 2})
+    legacy.dequeue_many("ocr", 2, timeout=0)
+    legacy.complete_task("ocr", done_id, result={"text": "x" * 5000})
+    redis_client.lpush("dead:ocr", "expired-task")
+
+    store = LocalBlobStore(str(tmp_path))
+    store.put("gone/data", b"orphan")
+    os.utime(os.path.join(str(tmp_path), "gone"), (time.time() - 7200,) * 2)
+    queue = RedisQueue(client=redis_client, completed_ttl=60,
+                       codec=PayloadCodec(compress_threshold=100, blob_store=store))
+
+    stats = queue.compact(batch_size=1)
+
+    assert stats == {"scanned": 2, "compacted": 1, "dead_pruned": 1, "blobs_pruned": 1}
+    assert redis_client.hget(f"task:{done_id}", "result").startswith("z:")
+    assert queue.get_task_status(done_id)["result"] == {"text": "x" * 5000}
+    assert 0 < redis_client.ttl(f"task:{done_id}") <= 60
+    assert redis_client.ttl(f"task:{running_id}") == -1
+    assert list(store.task_ids()) == []
+
+
+def test_enqueue_with_dedup_key_returns_existing_task(queue, redis_client):
+    data = {"type": "ocr_receipt", "receipt_id": 1}
+    key = RedisQueue.make_dedup_key(data, client_id=3)
+
+    first = queue.enqueue("ocr", data, client_id=3, dedup_key=key)
+    assert queue.enqueue("ocr", dict(data), client_id=3, dedup_key=key) == first
+    assert queue.get_queue_stats("ocr")["depth"] == 1
+    assert 0 < redis_client.ttl(f"dedup:ocr:{key}") <= queue.dedup_ttl
+
+    queue.dequeue("ocr", wait=False)
+    assert queue.enqueue("ocr", data, client_id=3, dedup_key=key) == first
+    queue.complete_task("ocr", first)
+    assert queue.enqueue("ocr", data, client_id=3, dedup_key=key) == first
+
+    assert RedisQueue.make_dedup_key(data, client_id=4) != key
+
+
+
+def test_dedup_key_lives_as_long_as_its_task(redis_client):
+    queue = RedisQueue(client=redis_client, dedup_ttl=10, retry_base_delay=100, retry_max_delay=100)
+    key = "dedup:ocr:receipt-8"
+    task_id = queue.enqueue("ocr", {"receipt_id": 8}, delay=100, dedup_key="receipt-8")
+    assert 100 < redis_client.ttl(key) <= 110
+
+    # Chaque étape repart de dedup_ttl, quelle que soit l'attente précédente
+    redis_client.expire(key, 1)
+    redis_client.zadd("delayed:ocr", {task_id: time.time() - 1})
+    queue.promote_delayed("ocr")
+    assert 1 < redis_client.ttl(key) <= 10
+
+    redis_client.expire(key, 1)
+    queue.dequeue("ocr", wait=False)
+    assert 1 < redis_client.ttl(key) <= 10
+
+    queue.fail_task("ocr", task_id, "timeout")
+    assert redis_client.ttl(key) > 50
+
+    redis_client.zadd("delayed:ocr", {task_id: time.time() - 1})
+    queue.promote_delayed("ocr")
+    queue.dequeue("ocr", wait=False)
+    redis_client.expire(key, 1)
+    queue.complete_task("ocr", task_id)
+    assert 1 < redis_client.ttl(key) <= 10
+
+def test_dedup_key_is_released_when_task_fails_for_good(queue):
+    key = "receipt-7"
+    first = queue.enqueue("ocr", {"receipt_id": 7}, dedup_key=key)
+    queue.dequeue("ocr", wait=False)
+    queue.fail_task("ocr", first, "boom", retryable=False)
+
+    second = queue.enqueue("ocr", {"receipt_id": 7}, dedup_key=key)
+
+    assert second != first
+    assert queue.enqueue("ocr", {"receipt_id": 7}, dedup_key=key) == second
+
+
+def test_enqueue_many_deduplicates_within_and_across_batches(queue):
+    first = queue.enqueue("ocr", {"receipt_id": 1}, dedup_key="r1")
+
+    task_ids = queue.enqueue_many("ocr", [{"receipt_id": 1}, {"receipt_id": 2}, {"receipt_id": 2}],
+                                  dedup_keys=["r1", "r2", "r2"])
+
+    assert task_ids[0] == first
+    assert task_ids[1] == task_ids[2] != first
+    assert queue.get_queue_stats("ocr")["depth"] == 2
+
+
+def test_dequeue_any_rotates_between_queues(queue):
+    ocr_ids = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(3)])
+    email_ids = queue.enqueue_many("email", [{"to": "a@b.c"}, {"to": "d@e.f"}])
+
+    served = [queue.dequeue_any(["ocr", "email"], timeout=0)["id"] for _ in range(5)]
+
+    assert served == [email_ids[0], ocr_ids[0], email_ids[1], ocr_ids[1], ocr_ids[2]]
+    assert queue.dequeue_any(["ocr", "email"], timeout=0.1) is None
+
+
+def test_dequeue_any_blocks_until_a_task_arrives(queue, redis_client):
+    import threading
+
+    producer = RedisQueue(client=redis_client)
+    timer = threading.Timer(0.2, lambda: producer.enqueue("email", {"to": "a@b.c"}))
+    timer.start()
+    started = time.monotonic()
+
+    task = queue.dequeue_any(["ocr", "email"], timeout=2)
+
+    timer.join()
+    assert task["queue"] == "email"
+    assert time.monotonic() - started < 1.5
+
+
+def test_compact_keeps_the_blob_of_a_task_being_enqueued(redis_client, tmp_path):
+    from app.queue.blob_store import LocalBlobStore
+    from app.queue.codec import PayloadCodec
+
+    queue = RedisQueue(client=redis_client,
+                       codec=PayloadCodec(compress_threshold=0, blob_threshold=1,
+                                          blob_store=LocalBlobStore(str(tmp_path))))
+    add_task = queue._add_task_script
+
+    def compact_then_add(**kwargs):
+        # Compaction entre l'écriture du blob et la création du hash
+        assert len(os.listdir(str(tmp_path))) == 1
+        assert queue.compact()["blobs_pruned"] == 0
+        return add_task(**kwargs)
+
+    queue._add_task_script = compact_then_add
+    task_id = queue.enqueue("ocr", {"image": "x" * 100})
+
+    assert queue.dequeue("ocr", wait=False)["data"] == {"image": "x" * 100}
+    assert queue.get_task_status(task_id)["status"] == "processing"
@@ -0,0 +1,220 @@
+import time
+
+import fakeredis
+import pytest
+
+from app.config import get_settings
+from app.queue.redis_stream_queue import RedisStreamQueue
+from app.queue.factory import QueueFactory
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def queue(redis_client):
+    return RedisStreamQueue(client=redis_client, consumer="worker-1")
+
+
+def test_dequeue_reads_through_consumer_group(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"type": "ocr_receipt", "receipt_id": 1})
+
+    task = queue.dequeue("ocr", wait=False)
+
+    assert task["id"] == task_id
+    assert task["status"] == "processing"
+    assert task["consumer"] == "worker-1"
+    assert queue.get_pending_summary("ocr") == {"pending": 1, "consumers": {"worker-1": 1}}
+    assert queue.dequeue("ocr", wait=False) is None
+
+
+def test_complete_acknowledges_and_deletes_message(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+
+    assert queue.complete_task("ocr", task_id, result={"ok": True})
+
+    status = queue.get_task_status(task_id)
+    assert status["status"] == "completed"
+    assert status["result"] == {"ok": True}
+    assert "stream_id" not in status
+    assert queue.get_pending_summary("ocr")["pending"] == 0
+    assert redis_client.xlen("stream:ocr") == 0
+
+
+def test_complete_many_acknowledges_all_messages(queue, redis_client):
+    ids = queue.enqueue_many("ocr", [{"receipt_id": 1}, {"receipt_id": 2}])
+    queue.dequeue_many("ocr", 2, timeout=0)
+
+    assert queue.complete_many("ocr", {task_id: {"ok": True} for task_id in ids}) == 2
+
+    assert queue.get_task_status(ids[1])["result"] == {"ok": True}
+    assert queue.get_pending_summary("ocr")["pending"] == 0
+    assert redis_client.xlen("stream:ocr") == 0
+    assert queue.get_queue_stats("ocr")["completed"] == 2
+
+
+def test_fail_and_requeue(queue, redis_client):
+    failed_id, requeued_id = queue.enqueue_many("email", [{"to": "a@b.c"}, {"to": "d@e.f"}])
+    queue.dequeue_many("email", 2, timeout=0)
+
+    assert queue.fail_task("email", failed_id, "SMTP down")
+    assert queue.requeue_task("email", requeued_id)
+
+    assert queue.get_task_status(failed_id)["status"] == "retrying"
+    assert redis_client.zscore("delayed:email", failed_id) is not None
+    assert queue.get_pending_summary("email")["pending"] == 0
+    assert queue.dequeue("email", wait=False)["id"] == requeued_id
+
+
+def test_idle_tasks_are_reclaimed_by_another_consumer(redis_client):
+    dead = RedisStreamQueue(client=redis_client, consumer="dead", visibility_timeout=0.05)
+    alive = RedisStreamQueue(client=redis_client, consumer="alive", visibility_timeout=0.05, reclaim_interval=0)
+    task_id = dead.enqueue("ocr", {"receipt_id": 1})
+    dead.dequeue("ocr", wait=False)
+
+    time.sleep(0.1)
+    task = alive.dequeue("ocr", wait=False)
+
+    assert task["id"] == task_id
+    assert task["consumer"] == "alive"
+    assert alive.get_pending_summary("ocr")["consumers"] == {"alive": 1}
+
+
+def test_dequeue_any_reads_several_streams_fairly(queue):
+    ocr_ids = queue.enqueue_many("ocr", [{"receipt_id": i} for i in range(2)])
+    email_ids = queue.enqueue_many("email", [{"to": "a@b.c"}, {"to": "d@e.f"}])
+
+    served = [queue.dequeue_any(["ocr", "email"], timeout=0) for _ in range(4)]
+
+    assert sorted(t["id"] for t in served) == sorted(ocr_ids + email_ids)
+    assert [t["queue"] for t in served[:2]].count("ocr") == 1
+    assert queue.dequeue_any(["ocr", "email"], timeout=0) is None
+
+
+
+def test_dequeue_any_leaves_no_unleased_message_in_the_pel(queue):
+    queue.enqueue("ocr", {"receipt_id": 1})
+    queue.enqueue("email", {"to": "a@b.c"})
+
+    task = queue.dequeue_any(["ocr", "email"], timeout=0)
+    other = "email" if task["queue"] == "ocr" else "ocr"
+
+    assert queue.get_pending_summary(task["queue"])["pending"] == 1
+    assert queue.get_pending_summary(other)["pending"] == 0
+    assert queue.dequeue_any(["ocr", "email"], timeout=0)["queue"] == other
+
+
+def test_messages_of_a_multi_stream_read_not_served_are_released(queue):
+    email_id = queue.enqueue("email", {"to": "a@b.c"})
+    queue._ensure_group("email")
+    delivered = queue._read(["email"], 1, None)
+    assert queue.get_pending_summary("email")["pending"] == 1
+
+    queue._release("email", delivered["email"])
+
+    assert queue.get_pending_summary("email")["pending"] == 0
+    task = queue.dequeue("email", wait=False)
+    assert task["id"] == email_id and int(task["attempts"]) == 1
+
+
+
+def test_dequeue_many_with_task_types_releases_other_types_without_an_attempt(queue):
+    first = queue.enqueue("ocr", {"type": "a"})
+    other = queue.enqueue("ocr", {"type": "b"})
+    second = queue.enqueue("ocr", {"type": "a"})
+
+    tasks = queue.dequeue_many("ocr", 3, timeout=0, task_types=["a"])
+
+    assert [t["id"] for t in tasks] == [first, second]
+    assert queue.get_task_status(other)["status"] == "pending"
+    assert int(queue.get_task_status(other).get("attempts", 0)) == 0
+    assert queue.get_pending_summary("ocr")["pending"] == 2
+    assert queue.dequeue("ocr", wait=False)["id"] == other
+
+
+def test_stats_report_the_wait_of_the_oldest_undelivered_message(queue, redis_client):
+    assert queue.get_queue_stats("ocr")["oldest_wait"] == 0.0
+    redis_client.xadd("stream:ocr", {"id": "old"}, id=f"{int((time.time() - 30) * 1000)}-0")
+    queue.enqueue("ocr", {"receipt_id": 1})
+
+    assert 29 < queue.get_queue_stats("ocr")["oldest_wait"] < 60
+    queue._read(["ocr"], 1, None)
+    stats = queue.get_queue_stats("ocr")
+    assert stats["oldest_wait"] < 5 and stats["depth"] == 1 and stats["clients"] == {}
+
+
+def test_claim_and_completion_refresh_the_dedup_key(queue, redis_client):
+    task_id = queue.enqueue("ocr", {"receipt_id": 1}, dedup_key="receipt-1")
+    key = "dedup:ocr:receipt-1"
+
+    redis_client.expire(key, 1)
+    queue.dequeue("ocr", wait=False)
+    assert redis_client.ttl(key) > 1
+
+    redis_client.expire(key, 1)
+    queue.complete_task("ocr", task_id)
+    assert redis_client.ttl(key) > 1
+
+def test_promote_delayed_and_maxlen(redis_client):
+    queue = RedisStreamQueue(client=redis_client, maxlen=10)
+    task_id = queue.enqueue("ocr", {"receipt_id": 1}, delay=1)
+    redis_client.zadd("delayed:ocr", {task_id: time.time() - 1})
+
+    assert queue.promote_delayed("ocr") == (1, None)
+    assert queue.dequeue("ocr", wait=False)["id"] == task_id
+
+
+def test_factory_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        QueueFactory.create_queue(backend="rabbitmq")
+
+
+
+def test_factory_creates_the_blob_store_only_with_a_threshold(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "QUEUE_BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(settings, "QUEUE_BLOB_THRESHOLD", 0)
+    assert QueueFactory._queue_options()["codec"].blob_store is None
+    assert not (tmp_path / "blobs").exists()
+
+    monkeypatch.setattr(settings, "QUEUE_BLOB_THRESHOLD", 1024)
+    assert QueueFactory._queue_options()["codec"].blob_store.root == str(tmp_path / "blobs")
+
+def test_heartbeat_and_dead_letter_after_repeated_expiry(redis_client):
+    queue = RedisStreamQueue(client=redis_client, consumer="w", visibility_timeout=0.05,
+                             reclaim_interval=0, max_lease_expiries=1)
+    task_id = queue.enqueue("ocr", {"receipt_id": 1})
+    queue.dequeue("ocr", wait=False)
+    assert queue.heartbeat("ocr", task_id)
+    assert queue.heartbeat("ocr", task_id, extend=600)
+
+    time.sleep(0.1)
+    assert queue.dequeue("ocr", wait=False)["id"] == task_id  # reprise : 2e livraison
+    time.sleep(0.1)
+
+    assert queue.reap_expired("ocr") == (0, 1, None)
+    assert queue.get_task_status(task_id)["error"] == "Lease expired"
+    assert redis_client.lrange("dead:ocr", 0, -1) == [task_id]
+    assert queue.get_pending_summary("ocr")["pending"] == 0
+
+
+def test_final_failure_is_dead_lettered(redis_client):
+    queue = RedisStreamQueue(client=redis_client, max_attempts=1)
+    task_id = queue.enqueue("email", {"to": "a@b.c"})
+    queue.dequeue("email", wait=False)
+
+    assert queue.fail_task("email", task_id, "SMTP down")
+
+    assert queue.get_task_status(task_id)["status"] == "failed"
+    assert queue.list_dead_letters("email")[0]["id"] == task_id
+    assert queue.get_pending_summary("email")["pending"] == 0
+
+
+def test_stream_enqueue_with_dedup_key(queue):
+    first = queue.enqueue("ocr", {"receipt_id": 1}, dedup_key="r1")
+
+    assert queue.enqueue("ocr", {"receipt_id": 1}, dedup_key="r1") == first
+    assert queue.redis.xlen("stream:ocr") == 1
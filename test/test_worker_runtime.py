@@ -0,0 +1,258 @@
+import os
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from app.queue.redis_queue import RedisQueue
+from app.tasks.registry import TaskRegistry
+from app.tasks.runtime import CPU, IO, PermanentTaskError, QueuePolicy, WorkerRuntime, parse_queue_map
+
+registry = TaskRegistry()
+
+
+@registry.task("io_job", queue="email", resource=IO, max_attempts=5, retry_on=(RuntimeError,))
+def handle(data):
+    if data.get("sleep"):
+        time.sleep(data["sleep"])
+    if data.get("permanent"):
+        raise PermanentTaskError("bad input")
+    if data.get("boom"):
+        raise RuntimeError("transient")
+    if data.get("invalid"):
+        raise KeyError("not retryable")
+    return {"pid": os.getpid()}
+
+
+@registry.task("cpu_job", queue="ocr", resource=CPU)
+def handle_cpu(data):
+    return handle(data)
+
+
+@registry.task("slow_job", queue="email", timeout=0.2, max_attempts=1)
+def handle_slow(data):
+    return handle(data)
+
+
+batches = []
+
+
+@registry.task("batch_job", queue="backfill")
+def handle_one(data):
+    return handle_batch([data])[0]
+
+
+@registry.batch("batch_job", size=3)
+def handle_batch(items):
+    batches.append(len(items))
+    return [ValueError("bad") if data.get("bad") else {"n": data["n"]} for data in items]
+
+
+@registry.task("single_job", queue="backfill")
+def handle_single(data):
+    return {"n": data["n"]}
+
+
+def job(**data):
+    return {"type": "io_job", **data}
+
+
+@pytest.fixture
+def queue():
+    return RedisQueue(client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def run_until(runtime, condition, timeout=10):
+    thread = threading.Thread(target=runtime.run)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    runtime.stop()
+    thread.join(timeout)
+    assert not thread.is_alive()
+
+
+def test_parse_queue_map():
+    assert parse_queue_map("ocr=4, email=0.5") == {"ocr": 4.0, "email": 0.5}
+    assert parse_queue_map("") == {}
+
+
+def test_io_tasks_complete_and_fail_with_retry_policy(queue):
+    ok, permanent, transient, invalid, unknown = queue.enqueue_many(
+        "email", [job(), job(permanent=True), job(boom=True), job(invalid=True), {"type": "nope"}])
+    runtime = WorkerRuntime(queue, {"email": QueuePolicy(concurrency=4)}, registry, poll_timeout=0.1)
+
+    run_until(runtime, lambda: runtime.in_flight() == 0 and queue.get_queue_stats("email")["depth"] == 0
+              and queue.get_task_status(transient)["status"] != "processing")
+
+    assert queue.get_task_status(ok)["result"] == {"pid": os.getpid()}
+    assert queue.get_task_status(permanent)["status"] == "failed"
+    assert queue.get_task_status(transient)["status"] == "retrying"
+    assert queue.get_task_status(invalid)["status"] == "failed"
+    assert queue.get_task_status(unknown)["status"] == "failed"
+
+
+def test_cpu_tasks_run_in_worker_processes(queue):
+    task_id = registry.enqueue(queue, "cpu_job")
+    runtime = WorkerRuntime(queue, {"ocr": QueuePolicy(concurrency=1)}, registry,
+                            cpu_workers=1, poll_timeout=0.1)
+
+    run_until(runtime, lambda: queue.get_task_status(task_id)["status"] == "completed")
+
+    assert queue.get_task_status(task_id)["result"]["pid"] != os.getpid()
+
+
+def test_start_pools_forks_all_cpu_processes_upfront(queue):
+    runtime = WorkerRuntime(queue, {"ocr": QueuePolicy(concurrency=2)}, registry, cpu_workers=2)
+
+    runtime.start_pools()
+    processes = dict(runtime._pools[CPU]._processes)
+    runtime.start_pools()
+
+    assert len(processes) == 2
+    assert runtime._pools[CPU]._processes == processes
+    runtime._pools[CPU].shutdown()
+
+
+def test_concurrency_limit_per_queue(queue):
+    queue.enqueue_many("email", [job(sleep=0.3) for _ in range(6)])
+    runtime = WorkerRuntime(queue, {"email": QueuePolicy(concurrency=2)}, registry, poll_timeout=0.05)
+    peak = []
+
+    def sample():
+        peak.append(runtime.in_flight("email"))
+        return queue.get_queue_stats("email")["processing"] == 0 and queue.get_queue_stats("email")["depth"] == 0
+
+    run_until(runtime, sample)
+
+    assert max(peak) == 2
+
+
+def test_drain_requeues_tasks_not_finished_before_deadline(queue):
+    quick, slow = queue.enqueue_many("email", [job(sleep=0.05), job(sleep=5)])
+    runtime = WorkerRuntime(queue, {"email": QueuePolicy(concurrency=2)}, registry,
+                            poll_timeout=0.05, drain_timeout=0.3)
+
+    run_until(runtime, lambda: queue.get_task_status(quick)["status"] == "completed")
+
+    assert queue.get_task_status(slow)["status"] == "pending"
+    assert queue.get_queue_stats("email")["depth"] == 1
+
+
+def test_task_exceeding_its_timeout_is_failed(queue):
+    task_id = registry.enqueue(queue, "slow_job", {"sleep": 1.5})
+    runtime = WorkerRuntime(queue, {"email": QueuePolicy(concurrency=1)}, registry,
+                            poll_timeout=0.05, heartbeat_interval=0.1)
+
+    run_until(runtime, lambda: queue.get_task_status(task_id)["status"] == "failed", timeout=5)
+
+    assert "Timeout" in queue.get_task_status(task_id)["error"]
+
+
+def test_batch_tasks_are_processed_and_completed_together(queue):
+    batches.clear()
+    ids = [registry.enqueue(queue, "batch_job", {"n": n, "bad": n == 1}) for n in range(5)]
+    runtime = WorkerRuntime(queue, {"backfill": QueuePolicy(concurrency=1)}, registry, poll_timeout=0.05)
+
+    run_until(runtime, lambda: all(queue.get_task_status(task_id)["status"] in ("completed", "retrying")
+                                   for task_id in ids))
+
+    assert batches == [3, 2]
+    assert queue.get_task_status(ids[0])["result"] == {"n": 0}
+    assert queue.get_task_status(ids[1])["status"] == "retrying"
+    assert queue.get_task_status(ids[4])["result"] == {"n": 4}
+
+
+def test_tasks_of_another_type_are_not_claimed_with_a_batch(queue, monkeypatch):
+    first = registry.enqueue(queue, "batch_job", {"n": 0})
+    single = registry.enqueue(queue, "single_job", {"n": 1})
+    second = registry.enqueue(queue, "batch_job", {"n": 2})
+    runtime = WorkerRuntime(queue, {"backfill": QueuePolicy(concurrency=1)}, registry)
+    started = []
+    monkeypatch.setattr(runtime, "_start", lambda queue_name, spec, tasks: started.append(
+        (spec.name, [task["id"] for task in tasks])))
+
+    runtime._submit(queue.dequeue("backfill", wait=False))
+
+    assert started == [("batch_job", [first, second])]
+    # Jamais réclamée : aucun essai consommé, toujours en tête de la file
+    status = queue.get_task_status(single)
+    assert status["status"] == "pending"
+    assert int(status.get("attempts", 0)) == 0
+    assert queue.dequeue("backfill", wait=False)["id"] == single
+
+
+def test_registry_declares_queue_and_rejects_duplicates(queue):
+    specs = registry.queues()
+    assert {spec.name for spec in specs["email"]} == {"io_job", "slow_job"}
+    assert registry.get("batch_job").batch_size == 3
+    assert registry.get("cpu_job").resource == CPU
+
+    task_id = registry.enqueue(queue, "io_job", {"x": 1})
+    assert queue.get_queue_stats("email")["depth"] == 1
+    assert queue.get_task_status(task_id)["data"] == {"x": 1, "type": "io_job"}
+
+    with pytest.raises(ValueError):
+        registry.task("io_job", queue="other")(handle)
+    with pytest.raises(ValueError):
+        registry.enqueue(queue, "nope")
+
+
+def test_handlers_route_by_type_and_reject_invalid_input(monkeypatch):
+    from app.tasks import handlers
+
+    sent = []
+    monkeypatch.setattr(handlers, "send_email", lambda **kwargs: sent.append(kwargs))
+
+    assert handlers.execute_task({"id": "1", "data": {"type": "send_invoice_email", "to": "a@example.com"}}) == \
+        {"to": "a@example.com"}
+    assert sent[0]["to_addresses"] == "a@example.com"
+
+    with pytest.raises(PermanentTaskError):
+        handlers.execute_task({"id": "2", "data": {"type": "send_invoice_email", "to": "not-an-email"}})
+    with pytest.raises(PermanentTaskError):
+        handlers.execute_task({"id": "3", "data": {"type": "ocr_receipt"}})
+    with pytest.raises(PermanentTaskError):
+        handlers.execute_task({"id": "4", "data": {"type": "unknown"}})
+
+    # Anciens noms des types (ancien app/tasks/worker.py)
+    assert handlers.registry.get("send_email").func is handlers.send_invoice_email
+    assert handlers.registry.get("ocr").queue == "ocr"
+
+
+def test_ocr_batch_writes_receipts_in_one_transaction(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from app.database import Base
+    from app.models import Receipt
+    from app.tasks import handlers
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(handlers, "SessionLocal", Session)
+    with Session() as session:
+        session.add_all([
+            Receipt(id=1, file="a.jpg", email_sent_to="", user_id=1, client_id=1, ocr_text="Total TTC: 12,00"),
+            Receipt(id=2, file="b.jpg", email_sent_to="", user_id=1, client_id=1, ocr_text=""),
+        ])
+        session.commit()
+
+    outcomes = handlers.process_ocr_receipts([
+        {"receipt_id": 1}, {"receipt_id": 2}, {"receipt_id": 3}, {"receipt_id": "x"},
+        {"receipt_id": "2", "text": "Montant HT: 10 TTC: 12"},
+    ])
+
+    assert outcomes[0] == {"price_ttc": "12.00"}
+    assert outcomes[1] == {"warning": "Empty OCR text"}
+    assert isinstance(outcomes[2], ValueError)
+    assert isinstance(outcomes[3], PermanentTaskError)
+    assert outcomes[4]["price_ht"] == "10"
+    with Session() as session:
+        assert session.get(Receipt, 1).price_ttc == 12.0
+        assert session.get(Receipt, 2).price_ht == 10.0
+    assert handlers.registry.get("ocr_receipt").batch_func is handlers.process_ocr_receipts
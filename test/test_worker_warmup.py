@@ -0,0 +1,70 @@
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+
+from app.queue.redis_queue import RedisQueue
+from app.tasks import warmup
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def queue(redis_client):
+    return RedisQueue(client=redis_client)
+
+
+def test_warm_up_opens_connections_and_loads_scripts(queue, redis_client, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/warm.db")
+
+    durations = warmup.warm_up(queue, engine=engine, ocr=False)
+
+    assert set(durations) == {"database", "redis"}
+    assert all(duration is not None for duration in durations.values())
+    assert all(redis_client.script_exists(queue._dequeue_script.sha, queue._complete_script.sha))
+    assert engine.pool.checkedin() == engine.pool.size()
+
+
+def test_failed_step_does_not_block_the_others(queue, monkeypatch):
+    def broken():
+        raise RuntimeError("tesseract not installed")
+
+    monkeypatch.setattr(warmup, "preload_ocr", broken)
+
+    durations = warmup.warm_up(queue, engine=create_engine("sqlite://"))
+
+    assert durations["ocr"] is None
+    assert durations["redis"] is not None
+
+
+def test_readiness_file_and_gauge(tmp_path):
+    path = tmp_path / "worker.ready"
+
+    warmup.mark_ready(str(path))
+    assert path.exists()
+    assert warmup.WORKER_READY._value.get() == 1
+
+    warmup.mark_not_ready(str(path))
+    assert not path.exists()
+    assert warmup.WORKER_READY._value.get() == 0
+
+
+def test_worker_metrics_are_served_over_http(monkeypatch):
+    import socket
+    import urllib.request
+
+    from app.metrics.exporter import start_metrics_server
+
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    start_metrics_server(port, addr="127.0.0.1")
+    warmup.WORKER_READY.set(1)
+
+    body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+
+    assert "worker_ready 1.0" in body
+    assert "queue_lease_expired_total" in body